@@ -25,6 +25,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # Debe ir aquí
+    'inventario.instrumentacion.InstrumentacionMiddleware', # Tiempos y consultas por vista
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -39,8 +40,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Plantillas compiladas una vez por proceso (también en DEBUG)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -52,14 +59,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# ASGI=True sirve la app con gunicorn + uvicorn (ver gunicorn.conf.py): las vistas
+# async atienden varias peticiones por worker mientras esperan BD o PDF
+ASGI = os.environ.get('ASGI', 'False') == 'True'
+
+# Procesos de WeasyPrint por worker (render de PDF en paralelo, también por lotes)
+PDF_PROCESOS = int(os.environ.get('PDF_PROCESOS', '2'))
+
+# Meses completos que se quedan en las tablas de movimientos; los anteriores
+# se pasan al archivo comprimido con `manage.py archivar`. No corre en el deploy:
+# se ejecuta a mano o como tarea programada (Cron Job de Render)
+ARCHIVO_MESES = int(os.environ.get('ARCHIVO_MESES', '12'))
+
+# Medición de tiempos por vista (Server-Timing, log y página de estadísticas)
+INSTRUMENTACION = os.environ.get('INSTRUMENTACION', 'True') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'inventario': {'handlers': ['console'], 'level': os.environ.get('INVENTARIO_LOG_LEVEL', 'INFO')},
+    },
+}
+
 # Configuración de Base de Datos Permanente (Postgres)
 DATABASES = {
     'default': dj_database_url.config(
         default=f'sqlite:///{os.path.join(BASE_DIR, "db.sqlite3")}',
-        conn_max_age=600
+        # Bajo ASGI cada petición usa su propio hilo: las conexiones persistentes quedarían abiertas
+        conn_max_age=0 if ASGI else 600
     )
 }
 
+# Caché en disco: la comparten todos los workers de gunicorn sin servicios externos
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -68,15 +108,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 LANGUAGE_CODE = 'es-es'
-TIME_ZONE = 'UTC'
+TIME_ZONE = 'America/La_Paz'
 USE_I18N = True
 USE_TZ = True
 
 # Archivos Estáticos
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-STATICFILES_DIRS = [BASE_DIR / 'inventario' / 'static']
+# Nombres con hash y variantes gzip/brotli: WhiteNoise los sirve con caché de larga duración
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Archivos generados (PDF de cierres pre-renderizados)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,11 @@
+# Configuración de gunicorn (se carga sola desde la carpeta del proyecto).
+# Por defecto WSGI con workers síncronos; con ASGI=True, workers uvicorn que
+# atienden varias peticiones a la vez mientras las vistas async esperan.
+# Puerto y número de workers: variables PORT y WEB_CONCURRENCY, como siempre.
+import os
+
+if os.environ.get('ASGI', 'False') == 'True':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
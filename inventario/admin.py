@@ -1,10 +1,34 @@
 from django.contrib import admin
-from .models import Categoria, Producto, RegistroDiario, CajaDiaria, Gasto, Sucursal
+from .models import ArchivoMes, Categoria, Producto, PrecioProducto, RegistroDiario, CajaDiaria, Gasto, Sucursal
 
 
-admin.site.register(Categoria)
+@admin.register(Categoria)
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'grupo', 'orden')
+    list_editable = ('grupo', 'orden')
+    ordering = ('orden', 'nombre')
+
 admin.site.register(Producto)
+admin.site.register(PrecioProducto)
 admin.site.register(RegistroDiario)
 admin.site.register(CajaDiaria)
 admin.site.register(Gasto)
-admin.site.register(Sucursal)
\ No newline at end of file
+admin.site.register(Sucursal)
+
+
+@admin.register(ArchivoMes)
+class ArchivoMesAdmin(admin.ModelAdmin):
+    # Solo consulta: se archiva y restaura con `manage.py archivar`
+    list_display = ('sucursal', 'mes', 'registros', 'ventas', 'gastos', 'archivado')
+    list_filter = ('sucursal',)
+    exclude = ('datos',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    # Es la única copia de los movimientos de ese mes
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from django.conf import settings
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'INSTRUMENTACION', False):
+            from django.db.backends.signals import connection_created
+            from .instrumentacion import instalar_contador_consultas, instalar_medicion_plantillas
+            instalar_medicion_plantillas()
+            connection_created.connect(instalar_contador_consultas, dispatch_uid='inventario_contador_consultas')
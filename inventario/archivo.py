@@ -0,0 +1,210 @@
+"""Archivo de los meses antiguos.
+
+Los registros, ventas y gastos de los meses anteriores al horizonte
+(settings.ARCHIVO_MESES) pasan a una fila comprimida por sucursal y mes
+(ArchivoMes) y se borran de sus tablas. Los cierres (CajaDiaria), el resumen
+diario y una foto del stock al final de cada mes se quedan, así los reportes por
+rango no cambian; la planilla, el PDF y el API de un cierre archivado leen sus
+movimientos del archivo.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .importar import fechas_manuales
+from .models import ArchivoMes, GastoExtra, RegistroDiario, Traspaso, VentaSalteña
+from .stock import tomar_snapshot
+
+# Tabla del archivo -> (modelo, columnas guardadas); la sucursal y el mes son los de la fila
+TABLAS = {
+    'registros': (RegistroDiario, ['id', 'producto_id', 'fecha', 'fecha_creacion', 'produccion', 'entrada',
+                                   'baja', 'traspaso', 'traspaso_destino', 'salida', 'precio_unitario']),
+    'ventas': (VentaSalteña, ['id', 'producto', 'venta', 'precio_unitario', 'fecha']),
+    'gastos': (GastoExtra, ['id', 'descripcion', 'monto', 'fecha']),
+}
+
+CAMPOS_DECIMALES = {'precio_unitario', 'monto'}
+
+
+def _mes_siguiente(mes):
+    return (mes.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+def fin_de_mes(mes):
+    return _mes_siguiente(mes) - datetime.timedelta(days=1)
+
+def limite_archivo(hoy=None, meses=None):
+    """Primer día que se queda en las tablas: los meses anteriores se pueden archivar."""
+    hoy = hoy or timezone.localdate()
+    # El mes en curso nunca se archiva
+    meses = max(settings.ARCHIVO_MESES if meses is None else meses, 1)
+    total = hoy.year * 12 + hoy.month - 1 - meses
+    return datetime.date(total // 12, total % 12 + 1, 1)
+
+
+# --- 1. ARCHIVAR ---
+
+def meses_pendientes(limite, sucursal_ids=None):
+    """(sucursal_id, mes) con movimientos en las tablas anteriores a 'limite', del más antiguo al más nuevo."""
+    pendientes = set()
+    for modelo, _ in TABLAS.values():
+        filas = modelo.objects.filter(fecha__lt=limite)
+        if sucursal_ids:
+            filas = filas.filter(sucursal_id__in=sucursal_ids)
+        pendientes.update(filas.annotate(mes=TruncMonth('fecha')).values_list('sucursal_id', 'mes').distinct().order_by())
+    return sorted(pendientes, key=lambda p: (p[1], p[0]))
+
+def archivar_mes(sucursal_id, mes):
+    """Mueve los movimientos de un mes de la sucursal a su ArchivoMes (se suman si ya existe)."""
+    rango = {'sucursal_id': sucursal_id, 'fecha__gte': mes, 'fecha__lt': _mes_siguiente(mes)}
+    with transaction.atomic():
+        # La foto al final del mes reemplaza a sus registros en las consultas de stock
+        tomar_snapshot(sucursal_id, fin_de_mes(mes))
+
+        archivo = (ArchivoMes.objects.select_for_update().filter(sucursal_id=sucursal_id, mes=mes).first()
+                   or ArchivoMes(sucursal_id=sucursal_id, mes=mes))
+        contenido = archivo.contenido() if archivo.pk else {tabla: [] for tabla in TABLAS}
+        for tabla, (modelo, campos) in TABLAS.items():
+            contenido[tabla].extend(modelo.objects.filter(**rango).order_by('id').values(*campos))
+
+        gastos_por_dia = defaultdict(Decimal)
+        for g in contenido['gastos']:
+            gastos_por_dia[str(g['fecha'])] += Decimal(str(g['monto']))
+        archivo.gastos_por_dia = {dia: str(total) for dia, total in sorted(gastos_por_dia.items())}
+        archivo.guardar_contenido(contenido)
+        archivo.save()
+
+        registros = RegistroDiario.objects.filter(**rango)
+        Traspaso.objects.filter(registro_origen__in=registros).update(registro_origen=None)
+        Traspaso.objects.filter(registro_destino__in=registros).update(registro_destino=None)
+        for modelo, _ in TABLAS.values():
+            _borrar_mes(modelo, sucursal_id, mes)
+    return archivo
+
+def _borrar_mes(modelo, sucursal_id, mes):
+    """Borra el mes de la sucursal con un DELETE en SQL.
+
+    Con .delete() las señales de post_delete descontarían el stock y rehacerían
+    el resumen de cada día, que ya cuentan estos movimientos; lo único que apunta
+    a estas filas (los traspasos) ya se desvinculó.
+    """
+    opciones = modelo._meta
+    tabla, sucursal, fecha = (connection.ops.quote_name(nombre) for nombre in (
+        opciones.db_table, opciones.get_field('sucursal').column, opciones.get_field('fecha').column))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {tabla} WHERE {sucursal} = %s AND {fecha} >= %s AND {fecha} < %s",
+            [sucursal_id, mes, _mes_siguiente(mes)],
+        )
+
+def archivar(limite=None, sucursal_ids=None):
+    """Archiva todos los meses anteriores a 'limite' (por defecto, el horizonte configurado)."""
+    return [archivar_mes(sucursal_id, mes) for sucursal_id, mes in meses_pendientes(limite or limite_archivo(), sucursal_ids)]
+
+def restaurar_mes(sucursal_id, mes):
+    """Devuelve un mes archivado a las tablas (con sus ids) y borra su archivo."""
+    archivo = ArchivoMes.objects.filter(sucursal_id=sucursal_id, mes=mes).first()
+    if not archivo:
+        return None
+    contenido = archivo.contenido()
+    with transaction.atomic(), fechas_manuales(RegistroDiario._meta.get_field('fecha_creacion')):
+        for tabla, (modelo, _) in TABLAS.items():
+            modelo.objects.bulk_create(
+                [modelo(sucursal_id=sucursal_id, **_convertir(fila)) for fila in contenido[tabla]], batch_size=1000
+            )
+        archivo.delete()
+    return archivo
+
+
+# --- 2. LECTURA ---
+
+def _convertir(fila):
+    """Fila del JSON con sus tipos originales (fechas y Decimal)."""
+    fila = dict(fila)
+    for campo, valor in fila.items():
+        if valor is None:
+            continue
+        if campo == 'fecha':
+            fila[campo] = parse_date(valor)
+        elif campo == 'fecha_creacion':
+            fila[campo] = parse_datetime(valor)
+        elif campo in CAMPOS_DECIMALES:
+            fila[campo] = Decimal(valor)
+    return fila
+
+def _archivos(dias):
+    """ArchivoMes de los meses que contienen los (sucursal_id, fecha) pedidos, en una consulta."""
+    meses = {(sucursal_id, fecha.replace(day=1)) for sucursal_id, fecha in dias}
+    condicion = Q()
+    for sucursal_id, mes in meses:
+        condicion |= Q(sucursal_id=sucursal_id, mes=mes)
+    return ArchivoMes.objects.filter(condicion)
+
+def movimientos_archivados(dias):
+    """{(sucursal_id, fecha): {'registros': [...], 'gastos': [...]}} de los días pedidos que están archivados."""
+    if not dias:
+        return {}
+    resultado = {}
+    for archivo in _archivos(dias):
+        contenido = archivo.contenido()
+        for tabla in ('registros', 'gastos'):
+            for fila in contenido[tabla]:
+                fila = _convertir(fila)
+                clave = (archivo.sucursal_id, fila['fecha'])
+                if clave in dias:
+                    resultado.setdefault(clave, {'registros': [], 'gastos': []})[tabla].append(fila)
+    return resultado
+
+def registros_por_producto(registros):
+    """Suma los registros archivados de un día por producto, igual que la consulta de contexto_cierre."""
+    totales = {}
+    for r in registros:
+        t = totales.setdefault(r['producto_id'], {
+            'entrada': 0, 'baja': 0, 'traspaso': 0, 'traspaso_destino': None, 'salida': 0, 'ventas_bs': 0,
+        })
+        for campo in ('entrada', 'baja', 'traspaso', 'salida'):
+            t[campo] += r[campo]
+        if r['traspaso_destino']:
+            t['traspaso_destino'] = max(t['traspaso_destino'] or '', r['traspaso_destino'])
+        if r['precio_unitario'] is not None:
+            t['ventas_bs'] += r['salida'] * r['precio_unitario']
+    return totales
+
+def gastos_archivados(desde, hasta, sucursal_ids):
+    """[(sucursal_id, fecha, total)] de los días archivados del rango, sin descomprimir nada."""
+    archivos = ArchivoMes.objects.filter(
+        sucursal_id__in=sucursal_ids, mes__gte=desde.replace(day=1), mes__lte=hasta
+    ).values_list('sucursal_id', 'gastos_por_dia')
+    return [
+        (sucursal_id, fecha, Decimal(total))
+        for sucursal_id, por_dia in archivos
+        for fecha, total in ((parse_date(dia), total) for dia, total in por_dia.items())
+        if desde <= fecha <= hasta
+    ]
+
+def filas_archivadas(tabla, desde=None, hasta=None, sucursal_ids=None):
+    """Filas archivadas de una tabla (con su 'sucursal_id') ordenadas por fecha e id, un mes a la vez."""
+    archivos = ArchivoMes.objects.order_by('mes', 'sucursal_id')
+    if desde:
+        archivos = archivos.filter(mes__gte=desde.replace(day=1))
+    if hasta:
+        archivos = archivos.filter(mes__lte=hasta)
+    if sucursal_ids:
+        archivos = archivos.filter(sucursal_id__in=sucursal_ids)
+
+    mes, filas = None, []
+    for archivo in archivos.iterator(chunk_size=1):
+        if archivo.mes != mes:
+            yield from sorted(filas, key=lambda f: (f['fecha'], f['id']))
+            mes, filas = archivo.mes, []
+        for fila in archivo.contenido()[tabla]:
+            fila = _convertir(fila)
+            if (not desde or fila['fecha'] >= desde) and (not hasta or fila['fecha'] <= hasta):
+                filas.append({**fila, 'sucursal_id': archivo.sucursal_id})
+    yield from sorted(filas, key=lambda f: (f['fecha'], f['id']))
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from .models import Categoria, Producto, Sucursal
+
+# Sucursales y catálogo del cuaderno Cardelfi (carga inicial y datos de prueba)
+SUCURSALES_INICIALES = ['CALACOTO', 'MENDEZ ARCOS', 'SAN PEDRO']
+
+CATALOGO_INICIAL = {
+    'SALTEÑAS': [
+        ('CARNE', 8.00), ('POLLO', 8.00), ('MIXTAS', 8.00), 
+        ('SANTA CLARA', 8.00), ('SALTEÑAS HOJA', 8.00), ('QUESO', 8.00), ('FRICASE', 9.00)
+    ],
+    'BEBIDAS': [
+        ('REFRESCO 190 ml', 3.00), ('REFRESCO 300 ml', 5.00), ('REFRESCO 500 ml', 7.00),
+        ('REFRESCO 600 ml', 8.00), ('REFRESCO 2.5 lt', 15.00), ('AGUA 500 ml', 5.00),
+        ('AGUA 3 lt', 12.00), ('LECHE', 6.00)
+    ],
+    'JUGOS': [
+        ('PLÁTANO/PAPAYA', 12.00), ('BATIDO DE LIMON', 10.00), 
+        ('FRUT/ARAND/MORA', 15.00), ('TROPICAL/FRUTO ROJOS', 15.00)
+    ],
+    'BEBIDAS CALIENTES': [
+        ('TE O MATE', 5.00), ('LINAZA', 6.00), ('CAFÉ/COCOA', 7.00)
+    ]
+}
+
+# Orden de cada grupo en la planilla para las categorías que se crean sin uno
+ORDEN_POR_GRUPO = {
+    Categoria.Grupo.SALTENA: 10,
+    Categoria.Grupo.BEBIDA: 20,
+    Categoria.Grupo.CALIENTE: 30,
+    Categoria.Grupo.JUGO: 40,
+    Categoria.Grupo.OTRO: 100,
+}
+
+
+def datos_categoria(nombre):
+    """Grupo y orden de una categoría nueva deducidos del nombre (se pueden cambiar en el admin)."""
+    nombre_upper = nombre.upper()
+    if 'SALTE' in nombre_upper:
+        grupo = Categoria.Grupo.SALTENA
+    elif 'JUGO' in nombre_upper:
+        grupo = Categoria.Grupo.JUGO
+    elif 'CALIENTE' in nombre_upper:
+        grupo = Categoria.Grupo.CALIENTE
+    elif 'BEBIDA' in nombre_upper:
+        grupo = Categoria.Grupo.BEBIDA
+    else:
+        grupo = Categoria.Grupo.OTRO
+    return {'grupo': grupo, 'orden': ORDEN_POR_GRUPO[grupo]}
+
+# Se invalida por señales; el vencimiento es solo una red de seguridad
+CATALOGO_TIMEOUT = 60 * 60 * 24
+
+
+def _clave(sucursal_id):
+    return f"catalogo:sucursal:{sucursal_id}"
+
+def catalogo_sucursal(sucursal_id):
+    """Lista ordenada de productos de la sucursal (por el orden de su categoría), cacheada."""
+    productos = cache.get(_clave(sucursal_id))
+    if productos is None:
+        productos = list(Producto.objects.filter(sucursal=sucursal_id).select_related('categoria').order_by(
+            'categoria__orden', 'categoria__nombre', 'nombre'
+        ))
+        cache.set(_clave(sucursal_id), productos, CATALOGO_TIMEOUT)
+    return productos
+
+def invalidar_catalogo():
+    """Descarta el catálogo cacheado de todas las sucursales."""
+    cache.delete_many([_clave(s) for s in Sucursal.objects.values_list('id', flat=True)])
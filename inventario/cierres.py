@@ -0,0 +1,227 @@
+import datetime
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .catalogo import catalogo_sucursal
+from .models import RegistroDiario, Sucursal, CajaDiaria, VentaSalteña, GastoExtra, Traspaso
+from .precios import HistorialPrecios
+from .reportes import encolar_reporte, invalidar_reportes
+from .resumen import actualizar_resumen
+from .stock import aplicar_movimientos
+
+LARGO_CLAVE = 64
+
+# Días hacia atrás que puede tener un cierre guardado sin conexión
+DIAS_ATRASO_MAXIMO = 7
+
+# Campos del formulario que no son datos del cierre
+CAMPOS_SIN_HASH = {'csrfmiddlewaretoken', 'clave_idempotencia'}
+
+
+class ClaveEnConflicto(Exception):
+    """La clave ya se usó para un cierre con otros datos."""
+
+
+def limpiar_clave(valor):
+    """Clave de idempotencia enviada por el cliente; None si no viene o es inválida."""
+    valor = (valor or '').strip()
+    return valor if 0 < len(valor) <= LARGO_CLAVE else None
+
+def hash_datos(datos):
+    """Hash de los campos del formulario, sin importar su orden."""
+    campos = sorted((k, v) for k in datos if k not in CAMPOS_SIN_HASH for v in datos.getlist(k))
+    return hashlib.sha256(json.dumps(campos, ensure_ascii=False).encode()).hexdigest()
+
+def fecha_de_cierre(valor, hoy=None):
+    """Fecha de negocio enviada con un cierre encolado: hoy o hasta DIAS_ATRASO_MAXIMO días antes."""
+    hoy = hoy or timezone.localdate()
+    if not valor:
+        return hoy
+    try:
+        fecha = datetime.date.fromisoformat(str(valor))
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {valor}")
+    if not hoy - datetime.timedelta(days=DIAS_ATRASO_MAXIMO) <= fecha <= hoy:
+        raise ValueError(f"La fecha {fecha} está fuera de los últimos {DIAS_ATRASO_MAXIMO} días")
+    return fecha
+
+def _entero(datos, campo):
+    valor = datos.get(campo) or 0
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{campo}' no es un número entero ({valor!r})")
+
+def _monto(valor, campo):
+    try:
+        monto = Decimal(str(valor or 0))
+    except InvalidOperation:
+        monto = None
+    if monto is None or not monto.is_finite():
+        raise ValueError(f"'{campo}' no es un monto válido ({valor!r})")
+    return monto.quantize(Decimal('0.01'))
+
+def cierre_existente(clave, hash_actual):
+    """Id de la caja ya guardada con esa clave, o None; ClaveEnConflicto si sus datos eran otros."""
+    if not clave:
+        return None
+    existente = CajaDiaria.objects.filter(clave_idempotencia=clave).values_list('id', 'hash_datos').first()
+    if not existente:
+        return None
+    # Los cierres anteriores al hash no tienen con qué comparar
+    if existente[1] and existente[1] != hash_actual:
+        raise ClaveEnConflicto(clave)
+    return existente[0]
+
+def marcar_modificados(sucursal_id, fecha):
+    """Los cierres del día cambiaron: se descarta su PDF y se actualiza su marca de tiempo."""
+    invalidar_reportes(sucursal_id, fecha)
+    CajaDiaria.objects.filter(sucursal_id=sucursal_id, fecha=fecha).update(actualizado=timezone.now())
+
+def registrar_cierre(suc_obj, datos, clave=None, fecha=None):
+    """Guarda Inventario, Ventas, Personal, Traspasos y Gastos en una sola transacción.
+
+    'datos' es el formulario de la planilla (QueryDict) y 'fecha' el día del cierre
+    (por defecto, hoy). Devuelve (caja_id, repetido): si la clave ya se usó con los
+    mismos datos, no se escribe nada y se devuelve la caja original; con otros datos
+    se lanza ClaveEnConflicto. Un número inválido lanza ValueError.
+    """
+    fecha = fecha or timezone.localdate()
+    hash_actual = hash_datos(datos)
+    existente = cierre_existente(clave, hash_actual)
+    if existente:
+        return existente, True
+
+    # Captura de personal de turno (Checkboxes)
+    personal_seleccionado = datos.getlist('personal_turno')
+    nombres_personal = ", ".join(personal_seleccionado)
+
+    # Se arman todas las filas en memoria antes de tocar la base de datos,
+    # así el cierre cuesta el mismo número de consultas con 5 o 50 productos.
+    productos = catalogo_sucursal(suc_obj.id)
+    # Un cierre de otro día (guardado sin conexión) lleva los precios de ese día, no los de hoy
+    historial = HistorialPrecios([p.id for p in productos]) if fecha != timezone.localdate() else None
+    destinos = {s.id: s for s in Sucursal.objects.exclude(id=suc_obj.id)}
+    registros = []
+    ventas = []
+    traspasos = []
+    for p in productos:
+        precio = historial.precio(p.id, fecha) if historial else p.precio_unitario
+        v_cant = _entero(datos, f's_{p.id}')
+        t_suc = datos.get(f't_suc_{p.id}', '')
+
+        if v_cant > 0:
+            ventas.append(VentaSalteña(
+                producto=p.nombre, 
+                venta=v_cant,
+                precio_unitario=precio,
+                sucursal=suc_obj,
+                fecha=fecha,
+            ))
+
+        # La planilla envía el id de la sucursal destino
+        destino = destinos.get(int(t_suc)) if t_suc.isdigit() else None
+
+        # Registro diario detallado
+        reg = RegistroDiario(
+            producto=p,
+            sucursal=suc_obj,
+            fecha=fecha,
+            entrada=_entero(datos, f'e_{p.id}'),
+            baja=_entero(datos, f'b_{p.id}'),
+            traspaso=_entero(datos, f't_cant_{p.id}'),
+            traspaso_destino=destino.nombre if destino else t_suc, # Nombre completo de la sucursal
+            salida=v_cant,
+            precio_unitario=precio,
+        )
+        registros.append(reg)
+        if destino and reg.traspaso > 0:
+            traspasos.append(Traspaso(producto=p, origen=suc_obj, destino=destino, cantidad=reg.traspaso, registro_origen=reg))
+
+    # Gastos Extras
+    descs = datos.getlist('gasto_desc[]')
+    montos = datos.getlist('gasto_monto[]')
+    gastos = [
+        GastoExtra(descripcion=d, monto=_monto(m, 'gasto_monto[]'), sucursal=suc_obj, fecha=fecha)
+        for d, m in zip(descs, montos) if d and m
+    ]
+
+    montos_caja = {campo: _monto(datos.get(f'caja_{nombre}'), f'caja_{nombre}')
+                   for campo, nombre in (('efectivo', 'efectivo'), ('qr', 'qr'), ('tarjetero', 'tarjeta'))}
+
+    # Todo el cierre se guarda o nada: un timeout ya no deja cierres a medias
+    try:
+        with transaction.atomic():
+            caja = _guardar_filas(suc_obj, fecha, montos_caja, nombres_personal, clave, hash_actual, registros, traspasos, ventas, gastos)
+    except IntegrityError:
+        # Dos reintentos simultáneos con la misma clave: gana el primero
+        existente = cierre_existente(clave, hash_actual)
+        if existente:
+            return existente, True
+        raise
+    return caja.id, False
+
+def _guardar_filas(suc_obj, fecha, montos_caja, nombres_personal, clave, hash_actual, registros, traspasos, ventas, gastos):
+    # 1. Cierre financiero (Caja)
+    caja = CajaDiaria.objects.create(
+        sucursal=suc_obj,
+        fecha=fecha,
+        **montos_caja,
+        personal_turno=nombres_personal,
+        clave_idempotencia=clave,
+        hash_datos=hash_actual if clave else '',
+    )
+    # 2. Movimientos por producto, ventas y gastos en inserciones masivas
+    RegistroDiario.objects.bulk_create(registros)
+
+    # 3. Cada traspaso genera su entrada en la sucursal destino (la planilla
+    # destino la muestra en TRASPASOS RECIBIDOS y no se carga en ENT)
+    entradas = [
+        RegistroDiario(producto=t.producto, sucursal=t.destino, fecha=caja.fecha, entrada=t.cantidad,
+                       precio_unitario=t.registro_origen.precio_unitario)
+        for t in traspasos
+    ]
+    RegistroDiario.objects.bulk_create(entradas)
+    for t, entrada in zip(traspasos, entradas):
+        t.fecha = caja.fecha
+        t.registro_origen_id = t.registro_origen.pk
+        t.registro_destino_id = entrada.pk
+    Traspaso.objects.bulk_create(traspasos)
+    for destino_id in {t.destino_id for t in traspasos}:
+        marcar_modificados(destino_id, caja.fecha)
+
+    aplicar_movimientos(registros + entradas)
+    for sucursal_id in {suc_obj.id} | {t.destino_id for t in traspasos}:
+        actualizar_resumen(sucursal_id, caja.fecha)
+    VentaSalteña.objects.bulk_create(ventas)
+    GastoExtra.objects.bulk_create(gastos)
+    # El PDF se pre-genera cuando el cierre ya está confirmado
+    transaction.on_commit(lambda: encolar_reporte(caja.id))
+    return caja
+
+def recibir_traspaso(traspaso_id):
+    """La sucursal destino confirma que le llegó la mercadería.
+
+    La entrada ya se registró al guardar el cierre de origen; confirmar solo deja
+    constancia de la recepción. Confirmar dos veces no cambia nada.
+    """
+    with transaction.atomic():
+        traspaso = Traspaso.objects.select_for_update().get(id=traspaso_id)
+        if traspaso.recibido:
+            return traspaso
+        # Traspasos que se guardaron sin su entrada: se registra en el día del envío
+        # (los archivados tampoco tienen registro de origen y no se tocan)
+        if traspaso.registro_destino_id is None and traspaso.registro_origen_id is not None:
+            # Las señales actualizan el saldo, las fotos semanales y el resumen del día
+            traspaso.registro_destino = RegistroDiario.objects.create(
+                producto_id=traspaso.producto_id, sucursal_id=traspaso.destino_id,
+                fecha=traspaso.fecha, entrada=traspaso.cantidad,
+            )
+        traspaso.recibido = True
+        traspaso.fecha_recepcion = timezone.now()
+        traspaso.save(update_fields=['registro_destino', 'recibido', 'fecha_recepcion'])
+    return traspaso
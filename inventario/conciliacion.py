@@ -0,0 +1,202 @@
+"""Conciliación de caja: diferencia diaria por sucursal y días o equipos anómalos.
+
+Todo el rango se carga con tres consultas agrupadas en matrices NumPy
+(sucursal x día), más el total diario de gastos de los meses archivados; las
+ventanas móviles, los z-scores y las rachas de faltantes se calculan sobre las
+matrices completas, sin recorrer cierres en Python.
+"""
+import datetime
+
+import numpy as np
+from django.db.models import F, Sum
+
+from .archivo import gastos_archivados
+from .models import CajaDiaria, GastoExtra, ResumenDiario, Sucursal
+
+# Días de calendario anteriores con los que se compara cada cierre
+VENTANA_DIAS = 28
+# Cierres mínimos dentro de la ventana para calcular el z-score
+MIN_CIERRES_VENTANA = 7
+# |z| desde el que un día es anómalo
+UMBRAL_Z = 3.0
+# Diferencias menores (en Bs) no se marcan: cambio y redondeos
+MONTO_MINIMO = 20.0
+# Faltantes seguidos (sin un cierre cuadrado entre medio) que se marcan
+RACHA_FALTANTES = 3
+# Un equipo de turno se evalúa desde este número de cierres...
+MIN_CIERRES_EQUIPO = 5
+# ...y se marca si falta dinero en esta proporción de sus cierres o si su z medio es este o menor
+PROPORCION_FALTANTES_EQUIPO = 0.5
+Z_MEDIO_EQUIPO = -1.0
+
+SIN_EQUIPO = 'Sin registrar'
+
+
+def _equipo(personal_turno):
+    """Mismo equipo aunque los nombres se hayan marcado en otro orden."""
+    nombres = sorted(n.strip() for n in (personal_turno or '').split(',') if n.strip())
+    return ', '.join(nombres) or SIN_EQUIPO
+
+
+def _indices(filas, ids, inicio):
+    """(sucursal_id, fecha, ...) -> índices de fila y columna de las matrices."""
+    columnas = list(zip(*filas))
+    s = np.searchsorted(ids, np.array(columnas[0], dtype=np.int64))
+    d = (np.array(columnas[1], dtype='datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64)
+    return s, d, columnas
+
+
+def _sumar(matriz, filas, ids, inicio):
+    """Suma cada fila (sucursal_id, fecha, valor) en la celda de su sucursal y día."""
+    if filas:
+        s, d, columnas = _indices(filas, ids, inicio)
+        np.add.at(matriz, (s, d), np.array(columnas[2], dtype=float))
+
+
+def _previos(matriz):
+    """Suma de los VENTANA_DIAS días anteriores a cada día (sin incluirlo)."""
+    acumulado = np.zeros((matriz.shape[0], matriz.shape[1] + 1))
+    np.cumsum(matriz, axis=1, out=acumulado[:, 1:])
+    d = np.arange(matriz.shape[1])
+    return acumulado[:, d] - acumulado[:, np.maximum(d - VENTANA_DIAS, 0)]
+
+
+def detectar_anomalias(desde, hasta, sucursal_ids=None):
+    """Días con diferencia de caja fuera de lo normal para su sucursal y equipos
+    de turno con faltantes repetidos, entre 'desde' y 'hasta'."""
+    sucursales = Sucursal.objects.order_by('id')
+    if sucursal_ids:
+        sucursales = sucursales.filter(id__in=sucursal_ids)
+    sucursales = list(sucursales.values_list('id', 'nombre'))
+    ids = np.array([s[0] for s in sucursales], dtype=np.int64)
+    nombres = [s[1] for s in sucursales]
+
+    hasta = max(hasta, desde)
+    # La ventana del primer día necesita los cierres anteriores a 'desde'
+    inicio = desde - datetime.timedelta(days=VENTANA_DIAS)
+    forma = (len(ids), (hasta - inicio).days + 1)
+    rango = {'fecha__gte': inicio, 'fecha__lte': hasta, 'sucursal_id__in': ids.tolist()}
+
+    # 1. Tres consultas, una matriz sucursal x día por cada una
+    ventas, gastos, caja = np.zeros(forma), np.zeros(forma), np.zeros(forma)
+    _sumar(ventas, list(ResumenDiario.objects.filter(**rango).values_list(
+        'sucursal_id', 'fecha').annotate(total=Sum('ventas_bs')).order_by()), ids, inicio)
+    _sumar(gastos, list(GastoExtra.objects.filter(**rango).values_list(
+        'sucursal_id', 'fecha').annotate(total=Sum('monto')).order_by()), ids, inicio)
+    _sumar(gastos, gastos_archivados(inicio, hasta, ids.tolist()), ids, inicio)
+    cierres = list(CajaDiaria.objects.filter(**rango).annotate(
+        total=F('efectivo') + F('qr') + F('tarjetero')
+    ).values_list('sucursal_id', 'fecha', 'personal_turno', 'total').order_by('id'))
+
+    cerrado = np.zeros(forma, dtype=bool)
+    equipos = np.full(forma, SIN_EQUIPO, dtype=object)
+    if cierres:
+        s, d, columnas = _indices(cierres, ids, inicio)
+        np.add.at(caja, (s, d), np.array(columnas[3], dtype=float))
+        cerrado[s, d] = True
+        # Con dos cierres el mismo día queda el equipo del último
+        equipos[s, d] = [_equipo(p) for p in columnas[2]]
+
+    diferencia = np.where(cerrado, caja - (ventas - gastos), np.nan)
+
+    # 2. Media y desvío de los cierres de la ventana previa, con sumas acumuladas
+    x = np.where(cerrado, diferencia, 0.0)
+    n, s1, s2 = _previos(cerrado.astype(float)), _previos(x), _previos(x * x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = s1 / n
+        desvio = np.sqrt(np.maximum(s2 / n - media ** 2, 0.0) * n / (n - 1))
+        z = (diferencia - media) / desvio
+    z[(n < MIN_CIERRES_VENTANA) | ~(desvio > 0) | ~cerrado] = np.nan
+    atipico = (np.abs(z) >= UMBRAL_Z) & (np.abs(diferencia - media) >= MONTO_MINIMO)
+
+    # 3. Rachas de faltantes: los días sin cierre no cortan ni suman
+    faltante = cerrado & (diferencia <= -MONTO_MINIMO)
+    contados = np.cumsum(faltante, axis=1)
+    cortes = np.maximum.accumulate(np.where(cerrado & ~faltante, contados, 0), axis=1)
+    racha = contados - cortes
+    en_racha = faltante & (racha >= RACHA_FALTANTES)
+
+    # 4. Solo se informa el rango pedido
+    visible = slice(VENTANA_DIAS, None)
+    cerrado, diferencia, media, z, racha = (m[:, visible] for m in (cerrado, diferencia, media, z, racha))
+    caja, ventas, gastos, equipos = (m[:, visible] for m in (caja, ventas, gastos, equipos))
+    atipico, faltante, en_racha = atipico[:, visible], faltante[:, visible], en_racha[:, visible]
+    anomalo = atipico | en_racha
+
+    dias = []
+    for s, d in sorted(zip(*np.nonzero(anomalo)), key=lambda c: (c[1], nombres[c[0]])):
+        motivos = []
+        if atipico[s, d]:
+            motivos.append(f"z = {z[s, d]:.1f}")
+        if en_racha[s, d]:
+            motivos.append(f"{racha[s, d]} faltantes seguidos")
+        dias.append({
+            'fecha': desde + datetime.timedelta(days=int(d)),
+            'sucursal': nombres[s],
+            'personal': equipos[s, d],
+            'caja': round(float(caja[s, d]), 2),
+            'ventas': round(float(ventas[s, d]), 2),
+            'gastos': round(float(gastos[s, d]), 2),
+            'diferencia': round(float(diferencia[s, d]), 2),
+            'media_previa': None if np.isnan(media[s, d]) else round(float(media[s, d]), 2),
+            'z': None if np.isnan(z[s, d]) else round(float(z[s, d]), 2),
+            'racha': int(racha[s, d]),
+            'motivos': motivos,
+        })
+
+    por_sucursal = []
+    total_cierres = cerrado.sum(axis=1)
+    suma = np.nansum(diferencia, axis=1)
+    for i, nombre in enumerate(nombres):
+        por_sucursal.append({
+            'sucursal': nombre,
+            'cierres': int(total_cierres[i]),
+            'diferencia': round(float(suma[i]), 2),
+            'promedio': round(float(suma[i] / total_cierres[i]), 2) if total_cierres[i] else 0.0,
+            'peor': round(float(np.nanmin(diferencia[i])), 2) if total_cierres[i] else 0.0,
+            'faltantes': int(faltante[i].sum()),
+            'dias_anomalos': int(anomalo[i].sum()),
+        })
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'sucursales': nombres,
+        'dias': dias,
+        'por_sucursal': por_sucursal,
+        'equipos': _por_equipo(equipos[cerrado], diferencia[cerrado], z[cerrado], faltante[cerrado], anomalo[cerrado]),
+    }
+
+
+def _por_equipo(equipos, diferencia, z, faltante, anomalo):
+    """Totales por equipo de turno con bincount (una pasada por arreglo)."""
+    if not len(equipos):
+        return []
+    nombres, grupo = np.unique(equipos.astype(str), return_inverse=True)
+    cierres = np.bincount(grupo)
+    suma = np.bincount(grupo, weights=diferencia)
+    faltantes = np.bincount(grupo, weights=faltante)
+    anomalos = np.bincount(grupo, weights=anomalo)
+    con_z = ~np.isnan(z)
+    n_z = np.bincount(grupo, weights=con_z)
+    # Recortado a ±UMBRAL_Z: un solo día muy malo no marca al equipo por sí solo
+    recortado = np.where(con_z, np.clip(z, -UMBRAL_Z, UMBRAL_Z), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_medio = np.bincount(grupo, weights=recortado) / n_z
+
+    filas = []
+    for i in np.argsort(suma):
+        sospechoso = bool(cierres[i] >= MIN_CIERRES_EQUIPO and (
+            faltantes[i] / cierres[i] >= PROPORCION_FALTANTES_EQUIPO or z_medio[i] <= Z_MEDIO_EQUIPO
+        ))
+        filas.append({
+            'personal': str(nombres[i]),
+            'cierres': int(cierres[i]),
+            'diferencia': round(float(suma[i]), 2),
+            'promedio': round(float(suma[i] / cierres[i]), 2),
+            'faltantes': int(faltantes[i]),
+            'dias_anomalos': int(anomalos[i]),
+            'z_medio': None if np.isnan(z_medio[i]) else round(float(z_medio[i]), 2),
+            'sospechoso': sospechoso,
+        })
+    return filas
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .archivo import gastos_archivados
+from .models import CajaDiaria, GastoExtra, ResumenDiario, Sucursal
+
+CERO = Decimal('0.00')
+
+
+def reporte_consolidado(desde, hasta, sucursal_ids=None):
+    """Ventas, gastos, caja y diferencia de varias sucursales en un rango, agregados en SQL."""
+    sucursales = Sucursal.objects.order_by('nombre')
+    if sucursal_ids:
+        sucursales = sucursales.filter(id__in=sucursal_ids)
+    sucursales = list(sucursales)
+    ids = [s.id for s in sucursales]
+
+    rango = {'fecha__gte': desde, 'fecha__lte': hasta, 'sucursal_id__in': ids}
+
+    # 1. Tres consultas agrupadas por (sucursal, día), más los gastos de los meses archivados
+    ventas = ResumenDiario.objects.filter(**rango).values('sucursal_id', 'fecha').annotate(
+        total=Sum('ventas_bs'), unidades=Sum('salida')).order_by()
+    gastos = GastoExtra.objects.filter(**rango).values('sucursal_id', 'fecha').annotate(
+        total=Sum('monto')).order_by()
+    cajas = CajaDiaria.objects.filter(**rango).values('sucursal_id', 'fecha').annotate(
+        total=Sum(F('efectivo') + F('qr') + F('tarjetero'))).order_by()
+
+    dias = defaultdict(lambda: {'ventas': CERO, 'unidades': 0, 'gastos': CERO, 'caja': CERO})
+    for v in ventas:
+        dia = dias[(v['sucursal_id'], v['fecha'])]
+        dia['ventas'] = v['total'] or CERO
+        dia['unidades'] = v['unidades'] or 0
+    for g in gastos:
+        dias[(g['sucursal_id'], g['fecha'])]['gastos'] += g['total'] or CERO
+    # Los meses archivados guardan el total de gastos de cada día
+    for sucursal_id, fecha, total in gastos_archivados(desde, hasta, ids):
+        dias[(sucursal_id, fecha)]['gastos'] += total
+    for c in cajas:
+        dias[(c['sucursal_id'], c['fecha'])]['caja'] = c['total'] or CERO
+
+    # 2. Totales por día y por sucursal (cientos de filas, no miles de movimientos)
+    nombres = {s.id: s.nombre for s in sucursales}
+    por_dia = []
+    por_sucursal = {s.id: {'sucursal': s.nombre, 'ventas': CERO, 'unidades': 0, 'gastos': CERO, 'caja': CERO} for s in sucursales}
+    for (sucursal_id, fecha), dia in sorted(dias.items(), key=lambda d: (d[0][1], nombres[d[0][0]])):
+        dia['diferencia'] = dia['caja'] - (dia['ventas'] - dia['gastos'])
+        por_dia.append({'fecha': fecha, 'sucursal': nombres[sucursal_id], **dia})
+        acumulado = por_sucursal[sucursal_id]
+        for clave in ('ventas', 'unidades', 'gastos', 'caja'):
+            acumulado[clave] += dia[clave]
+    for acumulado in por_sucursal.values():
+        acumulado['diferencia'] = acumulado['caja'] - (acumulado['ventas'] - acumulado['gastos'])
+
+    # 3. Por categoría
+    por_categoria = [
+        {'categoria': c['categoria__nombre'], 'unidades': c['unidades'] or 0, 'ventas': c['total'] or CERO}
+        for c in ResumenDiario.objects.filter(**rango).values('categoria__orden', 'categoria__nombre').annotate(
+            unidades=Sum('salida'), total=Sum('ventas_bs')).order_by('categoria__orden', 'categoria__nombre')
+    ]
+
+    totales = {
+        clave: sum((s[clave] for s in por_sucursal.values()), CERO if clave != 'unidades' else 0)
+        for clave in ('ventas', 'unidades', 'gastos', 'caja')
+    }
+    totales['diferencia'] = totales['caja'] - (totales['ventas'] - totales['gastos'])
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'sucursales': sucursales,
+        'por_dia': por_dia,
+        'por_sucursal': list(por_sucursal.values()),
+        'por_categoria': por_categoria,
+        'totales': totales,
+    }
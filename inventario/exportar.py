@@ -0,0 +1,76 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .archivo import TABLAS, filas_archivadas
+from .models import CajaDiaria, RegistroDiario, VentaSalteña, GastoExtra, Producto, Sucursal
+
+# Filas que se leen de la base de datos por consulta
+TAMANO_LOTE = 2000
+# Líneas que se envían juntas bajo ASGI (un salto al hilo síncrono por bloque)
+LINEAS_POR_BLOQUE = 500
+
+# Tabla -> (modelo, columnas en orden)
+TABLAS_EXPORTABLES = {
+    'cierres': (CajaDiaria, ['id', 'fecha', 'sucursal__nombre', 'efectivo', 'qr', 'tarjetero', 'personal_turno']),
+    'registros': (RegistroDiario, ['id', 'fecha', 'sucursal__nombre', 'producto__nombre', 'produccion',
+                                   'entrada', 'baja', 'traspaso', 'traspaso_destino', 'salida', 'precio_unitario']),
+    'ventas': (VentaSalteña, ['id', 'fecha', 'sucursal__nombre', 'producto', 'venta', 'precio_unitario']),
+    'gastos': (GastoExtra, ['id', 'fecha', 'sucursal__nombre', 'descripcion', 'monto']),
+}
+
+
+class _Eco:
+    """Archivo falso: csv.writer devuelve la línea en lugar de guardarla."""
+    def write(self, valor):
+        return valor
+
+def lineas_csv(tabla, desde=None, hasta=None, sucursal_ids=None):
+    """Genera el CSV línea por línea recorriendo la tabla con un cursor por lotes (incluye los meses archivados)."""
+    modelo, columnas = TABLAS_EXPORTABLES[tabla]
+    filas = modelo.objects.order_by('fecha', 'id')
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+    if sucursal_ids:
+        filas = filas.filter(sucursal_id__in=sucursal_ids)
+
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca los acentos al abrir el archivo
+    yield '﻿' + escritor.writerow([c.replace('__nombre', '') for c in columnas])
+    if tabla in TABLAS:
+        # Los meses archivados van primero: son siempre anteriores a los que siguen en la tabla
+        for fila in _filas_del_archivo(tabla, columnas, desde, hasta, sucursal_ids):
+            yield escritor.writerow(fila)
+    for fila in filas.values_list(*columnas).iterator(chunk_size=TAMANO_LOTE):
+        yield escritor.writerow(fila)
+
+def _filas_del_archivo(tabla, columnas, desde, hasta, sucursal_ids):
+    """Filas de los meses archivados con las mismas columnas que la consulta a la tabla."""
+    nombres = {
+        'sucursal__nombre': dict(Sucursal.objects.values_list('id', 'nombre')),
+        'producto__nombre': dict(Producto.objects.values_list('id', 'nombre')) if tabla == 'registros' else {},
+    }
+    for fila in filas_archivadas(tabla, desde, hasta, sucursal_ids):
+        yield [
+            nombres[c].get(fila[c.replace('__nombre', '_id')]) if c in nombres else fila[c]
+            for c in columnas
+        ]
+
+async def lineas_csv_async(tabla, desde=None, hasta=None, sucursal_ids=None):
+    """lineas_csv para ASGI, por bloques de líneas.
+
+    Con un generador síncrono Django junta todo el CSV en memoria antes de
+    enviarlo; así cada bloque sale apenas se lee. Todos los bloques se piden en
+    el mismo hilo, el del cursor de la consulta.
+    """
+    lineas = lineas_csv(tabla, desde, hasta, sucursal_ids)
+    siguiente = sync_to_async(lambda: list(islice(lineas, LINEAS_POR_BLOQUE)))
+    try:
+        while bloque := await siguiente():
+            yield ''.join(bloque)
+    finally:
+        # Si el cliente corta la descarga, el cursor se cierra en su hilo
+        await sync_to_async(lineas.close)()
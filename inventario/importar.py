@@ -0,0 +1,289 @@
+import csv
+import datetime
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .catalogo import datos_categoria, invalidar_catalogo
+from .models import (
+    Sucursal, Categoria, Producto, PrecioProducto, RegistroDiario, CajaDiaria, VentaSalteña, GastoExtra, ArchivoMes
+)
+from .precios import HistorialPrecios
+from .resumen import reconstruir_resumen
+from .stock import recalcular_sucursal
+
+# Filas por sentencia INSERT/UPDATE
+TAMANO_LOTE = 2000
+
+# Hora a la que se registran los cierres importados (hora de La Paz)
+HORA_CIERRE = datetime.time(20, 0)
+
+
+# --- 1. LECTURA DEL ARCHIVO ---
+
+def leer_archivo(ruta):
+    """Lee un CSV (con o sin BOM, como los de exportar_datos) o un JSON con una lista de objetos."""
+    if ruta.lower().endswith('.json'):
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        if isinstance(datos, dict):
+            datos = datos.get('filas', [])
+        if not isinstance(datos, list):
+            raise ValueError("El JSON debe ser una lista de objetos o {\"filas\": [...]}")
+        return datos
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        return list(csv.DictReader(archivo))
+
+def _texto(fila, campo):
+    return str(fila.get(campo) or '').strip()
+
+def _entero(fila, campo, n):
+    try:
+        return int(fila.get(campo) or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Fila {n}: '{campo}' no es un número entero ({fila.get(campo)!r})")
+
+def _decimal(fila, campo, n):
+    try:
+        return Decimal(str(fila.get(campo) or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"Fila {n}: '{campo}' no es un monto válido ({fila.get(campo)!r})")
+
+def _fecha(fila, n):
+    valor = _texto(fila, 'fecha')[:10]
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if not fecha:
+        raise ValueError(f"Fila {n}: fecha inválida ({fila.get('fecha')!r}), se espera AAAA-MM-DD")
+    return fecha
+
+def _sucursal(fila, sucursales, n):
+    nombre = _texto(fila, 'sucursal')
+    if nombre not in sucursales:
+        raise ValueError(f"Fila {n}: la sucursal '{nombre}' no existe; importe antes el catálogo")
+    return sucursales[nombre]
+
+@contextmanager
+def fechas_manuales(*campos):
+    """Desactiva auto_now_add para poder insertar días pasados."""
+    originales = [(campo, campo.auto_now_add) for campo in campos]
+    for campo, _ in originales:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, valor in originales:
+            campo.auto_now_add = valor
+
+
+# --- 2. CATÁLOGO (sucursal, categoria, producto, precio_unitario) ---
+
+def importar_catalogo(filas, aplicar=True, solo_nuevos=False):
+    """Crea o actualiza sucursales, categorías, productos y sus asignaciones en bloque.
+
+    Devuelve las diferencias con la base; con aplicar=False no se escribe nada.
+    Con solo_nuevos=True los productos existentes conservan su precio (carga inicial).
+    """
+    sucursales = {s.nombre: s.id for s in Sucursal.objects.all()}
+    categorias = {}
+    for c in Categoria.objects.order_by('-id'):
+        categorias[c.nombre] = c.id  # con nombres repetidos gana la más antigua
+    productos = {(p.nombre, p.categoria_id): p for p in Producto.objects.all()}
+    asignados = set(Producto.sucursal.through.objects.values_list('producto_id', 'sucursal_id'))
+
+    precios, pares = {}, set()
+    for n, fila in enumerate(filas, start=1):
+        categoria, producto = _texto(fila, 'categoria'), _texto(fila, 'producto')
+        if not categoria or not producto:
+            raise ValueError(f"Fila {n}: faltan 'categoria' o 'producto'")
+        precios[(producto, categoria)] = _decimal(fila, 'precio_unitario', n)
+        if _texto(fila, 'sucursal'):
+            pares.add((producto, categoria, _texto(fila, 'sucursal')))
+
+    def existente(producto, categoria):
+        return productos.get((producto, categorias.get(categoria)))
+
+    diferencias = {
+        'sucursales_nuevas': sorted({s for _, _, s in pares} - set(sucursales)),
+        'categorias_nuevas': sorted({c for _, c in precios} - set(categorias)),
+        'productos_nuevos': sorted(f"{c} / {p}" for p, c in precios if not existente(p, c)),
+        'precios_cambiados': sorted(
+            f"{c} / {p}: {existente(p, c).precio_unitario} -> {precio}"
+            for (p, c), precio in precios.items()
+            if not solo_nuevos and existente(p, c) and existente(p, c).precio_unitario != precio
+        ),
+        'asignaciones_nuevas': sum(
+            1 for p, c, s in pares
+            if not existente(p, c) or s not in sucursales or (existente(p, c).id, sucursales[s]) not in asignados
+        ),
+    }
+    if not aplicar:
+        return diferencias
+
+    with transaction.atomic():
+        Sucursal.objects.bulk_create([Sucursal(nombre=s) for s in diferencias['sucursales_nuevas']])
+        Categoria.objects.bulk_create([Categoria(nombre=c, **datos_categoria(c)) for c in diferencias['categorias_nuevas']])
+        # Se vuelven a leer para tener los ids en cualquier motor de base de datos
+        sucursales = {s.nombre: s.id for s in Sucursal.objects.all()}
+        categorias = {}
+        for c in Categoria.objects.order_by('-id'):
+            categorias[c.nombre] = c.id
+
+        nuevos, cambiados = [], []
+        for (p, c), precio in precios.items():
+            actual = existente(p, c)
+            if actual is None:
+                nuevos.append(Producto(nombre=p, categoria_id=categorias[c], precio_unitario=precio))
+            elif not solo_nuevos and actual.precio_unitario != precio:
+                actual.precio_unitario = precio
+                cambiados.append(actual)
+        Producto.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+        Producto.objects.bulk_update(cambiados, ['precio_unitario'], batch_size=TAMANO_LOTE)
+        productos = {(p.nombre, p.categoria_id): p for p in Producto.objects.all()}
+
+        # Asignaciones directas en la tabla intermedia, sin un .set() por producto
+        Asignacion = Producto.sucursal.through
+        Asignacion.objects.bulk_create([
+            Asignacion(producto_id=existente(p, c).id, sucursal_id=sucursales[s]) for p, c, s in pares
+        ], batch_size=TAMANO_LOTE, ignore_conflicts=True)
+
+        # Las inserciones en bloque no disparan señales: el historial de precios
+        # y el catálogo cacheado se actualizan a mano
+        hoy = timezone.localdate()
+        precios_nuevos = [productos[(p.nombre, p.categoria_id)] for p in nuevos + cambiados]
+        PrecioProducto.objects.bulk_create([
+            PrecioProducto(producto_id=p.id, precio_unitario=p.precio_unitario, vigente_desde=hoy) for p in precios_nuevos
+        ], batch_size=TAMANO_LOTE, update_conflicts=True,
+            unique_fields=['producto', 'vigente_desde'], update_fields=['precio_unitario'])
+        transaction.on_commit(invalidar_catalogo)
+    return diferencias
+
+
+# --- 3. HISTORIAL (cierres, registros y gastos por día) ---
+
+def _dias_existentes(modelo, dias):
+    """(sucursal_id, fecha) de 'dias' que ya tienen filas en la tabla."""
+    if not dias:
+        return set()
+    fechas = [f for _, f in dias]
+    return set(modelo.objects.filter(
+        sucursal_id__in={s for s, _ in dias}, fecha__gte=min(fechas), fecha__lte=max(fechas)
+    ).values_list('sucursal_id', 'fecha').distinct()) & dias
+
+def _dias_archivados(dias):
+    """(sucursal_id, fecha) de 'dias' cuyo mes ya está en el archivo (ver archivo.py)."""
+    if not dias:
+        return set()
+    fechas = [f for _, f in dias]
+    meses = set(ArchivoMes.objects.filter(
+        sucursal_id__in={s for s, _ in dias}, mes__gte=min(fechas).replace(day=1), mes__lte=max(fechas)
+    ).values_list('sucursal_id', 'mes'))
+    return {(s, f) for s, f in dias if (s, f.replace(day=1)) in meses}
+
+def _fecha_hora_cierre(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, HORA_CIERRE))
+
+def _cierres(filas, sucursales):
+    objetos = []
+    for n, fila in enumerate(filas, start=1):
+        fecha = _fecha(fila, n)
+        objetos.append(CajaDiaria(
+            sucursal_id=_sucursal(fila, sucursales, n), fecha=fecha,
+            efectivo=_decimal(fila, 'efectivo', n), qr=_decimal(fila, 'qr', n),
+            tarjetero=_decimal(fila, 'tarjetero', n), personal_turno=_texto(fila, 'personal_turno'),
+        ))
+    return objetos
+
+def _gastos(filas, sucursales):
+    return [
+        GastoExtra(
+            sucursal_id=_sucursal(fila, sucursales, n), fecha=_fecha(fila, n),
+            descripcion=_texto(fila, 'descripcion'), monto=_decimal(fila, 'monto', n),
+        )
+        for n, fila in enumerate(filas, start=1)
+    ]
+
+def _registros(filas, sucursales):
+    por_nombre = defaultdict(list)
+    for p in Producto.objects.select_related('categoria'):
+        por_nombre[p.nombre].append(p)
+    historial = HistorialPrecios([p.id for lista in por_nombre.values() for p in lista])
+
+    objetos = []
+    for n, fila in enumerate(filas, start=1):
+        candidatos = por_nombre.get(_texto(fila, 'producto'), [])
+        if _texto(fila, 'categoria'):
+            candidatos = [p for p in candidatos if p.categoria.nombre == _texto(fila, 'categoria')]
+        if len(candidatos) != 1:
+            motivo = "no existe" if not candidatos else "es ambiguo; indique la columna 'categoria'"
+            raise ValueError(f"Fila {n}: el producto '{_texto(fila, 'producto')}' {motivo}")
+        fecha = _fecha(fila, n)
+        # Sin la columna 'precio_unitario' se usa el precio vigente en esa fecha
+        precio = _decimal(fila, 'precio_unitario', n) if _texto(fila, 'precio_unitario') else historial.precio(candidatos[0].id, fecha)
+        objetos.append(RegistroDiario(
+            producto=candidatos[0], sucursal_id=_sucursal(fila, sucursales, n), precio_unitario=precio,
+            fecha=fecha, fecha_creacion=_fecha_hora_cierre(fecha),
+            produccion=_entero(fila, 'produccion', n), entrada=_entero(fila, 'entrada', n),
+            baja=_entero(fila, 'baja', n), traspaso=_entero(fila, 'traspaso', n),
+            traspaso_destino=_texto(fila, 'traspaso_destino') or None, salida=_entero(fila, 'salida', n),
+        ))
+    return objetos
+
+# Tipo -> (modelo, constructor de objetos)
+TIPOS_HISTORIAL = {
+    'cierres': (CajaDiaria, _cierres),
+    'registros': (RegistroDiario, _registros),
+    'gastos': (GastoExtra, _gastos),
+}
+
+def importar_historial(tipo, filas, aplicar=True):
+    """Inserta en bloque los días que aún no existen; los ya cargados se omiten.
+
+    Así el mismo archivo se puede importar dos veces sin duplicar. Al terminar
+    se reconstruyen el resumen diario y el stock de las sucursales afectadas.
+    """
+    modelo, construir = TIPOS_HISTORIAL[tipo]
+    sucursales = {s.nombre: s.id for s in Sucursal.objects.all()}
+    objetos = construir(filas, sucursales)
+
+    dias = {(o.sucursal_id, o.fecha) for o in objetos}
+    existentes = _dias_existentes(modelo, dias)
+    # Los cierres no se archivan; los movimientos de un mes archivado se omiten
+    # (hay que restaurarlo antes con `manage.py archivar --restaurar`)
+    archivados = set() if modelo is CajaDiaria else _dias_archivados(dias) - existentes
+    omitidos = existentes | archivados
+    nuevos = [o for o in objetos if (o.sucursal_id, o.fecha) not in omitidos]
+    nombres = {i: nombre for nombre, i in sucursales.items()}
+    fechas = [o.fecha for o in nuevos]
+    diferencias = {
+        'filas_nuevas': len(nuevos),
+        'dias_nuevos': len(dias - omitidos),
+        'desde': min(fechas) if fechas else None,
+        'hasta': max(fechas) if fechas else None,
+        'dias_omitidos': sorted(f"{nombres[s]} {f}" for s, f in existentes),
+        'dias_omitidos_archivados': sorted(f"{nombres[s]} {f}" for s, f in archivados),
+    }
+    if not aplicar or not nuevos:
+        return diferencias
+
+    campos_fecha = [RegistroDiario._meta.get_field('fecha_creacion')] if modelo is RegistroDiario else []
+    with transaction.atomic(), fechas_manuales(*campos_fecha):
+        modelo.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+        if modelo is RegistroDiario:
+            # Igual que la planilla: cada salida también es una venta
+            VentaSalteña.objects.bulk_create([
+                VentaSalteña(producto=r.producto.nombre, venta=r.salida, precio_unitario=r.precio_unitario,
+                             sucursal_id=r.sucursal_id, fecha=r.fecha)
+                for r in nuevos if r.salida > 0
+            ], batch_size=TAMANO_LOTE)
+            reconstruir_resumen(diferencias['desde'], diferencias['hasta'])
+            for sucursal_id in sorted({r.sucursal_id for r in nuevos}):
+                recalcular_sucursal(sucursal_id)
+    return diferencias
@@ -0,0 +1,181 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Muestras recientes que se guardan por vista (en memoria de cada worker)
+MUESTRAS_POR_VISTA = 200
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+_estadisticas = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_VISTA))
+_candado = threading.Lock()
+
+
+class Medicion:
+    """Tiempos (ms) y número de consultas acumulados durante una petición."""
+    def __init__(self):
+        self.tiempos = defaultdict(float)
+        self.consultas = 0
+
+
+@contextmanager
+def medir(clave):
+    """Suma al tramo 'clave' el tiempo del bloque; no hace nada fuera de una petición."""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.tiempos[clave] += (time.perf_counter() - inicio) * 1000
+
+def _contar_consulta(execute, sql, params, many, context):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.tiempos['db'] += (time.perf_counter() - inicio) * 1000
+
+def instalar_contador_consultas(sender, connection, **kwargs):
+    """Receptor de connection_created: cada conexión cuenta sus consultas.
+
+    Bajo ASGI el ORM async consulta desde otros hilos (con su propia conexión);
+    el ContextVar viaja con sync_to_async, así que se suman a la misma petición.
+    """
+    if _contar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar_consulta)
+
+
+# --- 1. PLANTILLAS ---
+
+def instalar_medicion_plantillas():
+    """Mide el render de cada plantilla de primer nivel (las inclusiones quedan dentro)."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_medido', False):
+        return
+    render_original = Template.render
+
+    def render(self, *args, **kwargs):
+        with medir('plantilla'):
+            return render_original(self, *args, **kwargs)
+    render._medido = True
+    Template.render = render
+
+
+# --- 2. ESTADÍSTICAS EN MEMORIA ---
+
+def registrar_muestra(vista, total, medicion):
+    with _candado:
+        _estadisticas[vista].append((total, medicion.consultas, dict(medicion.tiempos)))
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+def resumen_estadisticas():
+    """Por vista: muestras, promedio y percentiles de tiempo, consultas y tramos."""
+    with _candado:
+        copia = {vista: list(muestras) for vista, muestras in _estadisticas.items()}
+
+    filas = []
+    for vista, muestras in sorted(copia.items()):
+        totales = [m[0] for m in muestras]
+        n = len(muestras)
+        filas.append({
+            'vista': vista,
+            'muestras': n,
+            'promedio_ms': sum(totales) / n,
+            'p50_ms': _percentil(totales, 0.5),
+            'p95_ms': _percentil(totales, 0.95),
+            'consultas': sum(m[1] for m in muestras) / n,
+            'db_ms': sum(m[2].get('db', 0) for m in muestras) / n,
+            'plantilla_ms': sum(m[2].get('plantilla', 0) for m in muestras) / n,
+            'pdf_ms': sum(m[2].get('pdf', 0) for m in muestras) / n,
+        })
+    return filas
+
+
+# --- 3. MIDDLEWARE ---
+
+def cabecera_server_timing(total, medicion):
+    partes = [f'total;dur={total:.1f}', f'db;dur={medicion.tiempos.get("db", 0):.1f};desc="{medicion.consultas} consultas"']
+    for clave in ('plantilla', 'pdf'):
+        if clave in medicion.tiempos:
+            partes.append(f'{clave};dur={medicion.tiempos[clave]:.1f}')
+    return ', '.join(partes)
+
+class InstrumentacionMiddleware:
+    """Tiempo total, consultas, tiempo de BD, plantillas y WeasyPrint por petición.
+
+    Se activa con INSTRUMENTACION = True. Publica la cabecera Server-Timing,
+    una línea de log JSON y alimenta la página de estadísticas del personal.
+    Funciona igual con WSGI y con ASGI (vistas async).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # La conexión del hilo puede ser anterior a la señal (p. ej. tras migrate)
+        instalar_contador_consultas(None, connection)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._publicar(request, response, medicion, inicio)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._publicar(request, response, medicion, inicio)
+
+    def _publicar(self, request, response, medicion, inicio):
+        total = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        vista = match.view_name if match else 'sin_vista'
+        registrar_muestra(vista, total, medicion)
+
+        response['Server-Timing'] = cabecera_server_timing(total, medicion)
+        logger.info(json.dumps({
+            'vista': vista,
+            'metodo': request.method,
+            'estado': response.status_code,
+            'total_ms': round(total, 1),
+            'consultas': medicion.consultas,
+            **{f'{clave}_ms': round(valor, 1) for clave, valor in medicion.tiempos.items()},
+        }))
+        return response
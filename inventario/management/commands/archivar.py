@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventario.archivo import archivar_mes, limite_archivo, meses_pendientes, restaurar_mes
+from inventario.models import Sucursal
+
+
+class Command(BaseCommand):
+    help = ("Pasa los registros, ventas y gastos de los meses anteriores al horizonte al archivo comprimido "
+            "(los cierres y el resumen diario se quedan). No corre en el deploy: ejecutarlo a mano o como tarea "
+            "programada, primero con --simular. Para importar o corregir un mes archivado, restaurarlo antes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, help="Meses completos que se quedan en las tablas (por defecto, ARCHIVO_MESES)")
+        parser.add_argument('--sucursal', type=int, action='append', help="ID de sucursal (se puede repetir; por defecto, todas)")
+        parser.add_argument('--restaurar', metavar='AAAA-MM', help="Devuelve ese mes del archivo a las tablas")
+        parser.add_argument('--simular', action='store_true', help="Solo lista los meses que se archivarían")
+
+    def handle(self, *args, **options):
+        nombres = dict(Sucursal.objects.values_list('id', 'nombre'))
+        if options['restaurar']:
+            self._restaurar(options['restaurar'], options['sucursal'] or sorted(nombres), nombres)
+            return
+
+        limite = limite_archivo(meses=options['meses'])
+        pendientes = meses_pendientes(limite, options['sucursal'])
+        self.stdout.write(f"Se archiva lo anterior al {limite}: {len(pendientes)} meses de sucursal pendientes.")
+
+        filas = tamano = 0
+        for sucursal_id, mes in pendientes:
+            if options['simular']:
+                self.stdout.write(f"  {nombres[sucursal_id]} {mes:%Y-%m}")
+                continue
+            archivo = archivar_mes(sucursal_id, mes)
+            filas += archivo.registros + archivo.ventas + archivo.gastos
+            tamano += len(archivo.datos)
+            self.stdout.write(
+                f"  {nombres[sucursal_id]} {mes:%Y-%m}: {archivo.registros} registros, {archivo.ventas} ventas, "
+                f"{archivo.gastos} gastos ({len(archivo.datos) / 1024:.1f} KB)"
+            )
+        if not options['simular']:
+            self.stdout.write(self.style.SUCCESS(f"¡Listo! {filas} filas archivadas en {tamano / 1024:.1f} KB."))
+
+    def _restaurar(self, valor, sucursal_ids, nombres):
+        try:
+            mes = parse_date(f"{valor}-01") if len(valor) == 7 else None
+        except ValueError:
+            mes = None
+        if not mes:
+            raise CommandError(f"Mes inválido para --restaurar (AAAA-MM): {valor}")
+
+        restaurados = 0
+        for sucursal_id in sucursal_ids:
+            archivo = restaurar_mes(sucursal_id, mes)
+            if archivo:
+                restaurados += 1
+                self.stdout.write(
+                    f"  {nombres.get(sucursal_id, sucursal_id)} {mes:%Y-%m}: {archivo.registros} registros, "
+                    f"{archivo.ventas} ventas, {archivo.gastos} gastos"
+                )
+        self.stdout.write(self.style.SUCCESS(f"¡Listo! {restaurados} meses restaurados."))
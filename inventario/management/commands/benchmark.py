@@ -0,0 +1,163 @@
+import json
+import platform
+import statistics
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario import render_pdf
+from inventario.catalogo import catalogo_sucursal
+from inventario.models import Sucursal, CajaDiaria, RegistroDiario
+from inventario.reportes import HOJAS_PDF, generar_reporte, html_cierre
+
+# Máximo de consultas por operación; si se supera, el benchmark falla.
+# No dependen del tamaño del historial ni del número de productos.
+LIMITES_CONSULTAS = {
+    'guardar_registro': 30,
+    'lista_productos': 6,
+    'historial_ventas': 6,
+    'ver_planilla_html': 8,
+    'generar_pdf': 8,
+    'pdf_css_en_linea': 0,
+    'pdf_css_procesado': 0,
+}
+
+
+class Command(BaseCommand):
+    help = "Mide las vistas principales (tiempo y consultas) y emite el resultado en JSON para comparar corridas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--sucursal', type=int, help="Sucursal a medir (por defecto, la que tiene más cierres)")
+        parser.add_argument('--usuario', help="Usuario con el que se hacen las peticiones (por defecto, el primer superusuario)")
+        parser.add_argument('--salida', help="Archivo donde guardar el JSON (por defecto, la salida estándar)")
+
+    def handle(self, *args, **options):
+        sucursal = self._sucursal(options['sucursal'])
+        cierre = CajaDiaria.objects.filter(sucursal=sucursal).select_related('sucursal').order_by('-fecha', '-id').first()
+        if cierre is None:
+            raise CommandError("La sucursal no tiene cierres; ejecute antes 'generar_datos_sinteticos'.")
+
+        usuarios = User.objects.filter(username=options['usuario']) if options['usuario'] else User.objects.filter(is_superuser=True)
+        usuario = usuarios.order_by('id').first()
+        if usuario is None:
+            raise CommandError("No hay un usuario con el que iniciar sesión.")
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        operaciones = {
+            'guardar_registro': lambda: cliente.post(reverse('guardar_registro'), self._planilla(sucursal)),
+            'lista_productos': lambda: cliente.get(reverse('lista_productos'), {'sucursal_id': sucursal.id}),
+            'historial_ventas': lambda: cliente.get(reverse('historial_ventas'), {'sucursal_id': sucursal.id}),
+            'ver_planilla_html': lambda: cliente.get(reverse('ver_planilla'), {'caja_id': cierre.id}),
+            'generar_pdf': lambda: generar_reporte(cierre),
+        }
+
+        resultados = self._medir_hojas(cierre, options['repeticiones'])
+        # Todo se deshace al final: los cierres de prueba no quedan en la base
+        with transaction.atomic():
+            for nombre, operacion in operaciones.items():
+                resultados[nombre] = self._medir(nombre, operacion, options['repeticiones'])
+            transaction.set_rollback(True)
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_datos': connection.vendor,
+            },
+            'datos': {
+                'sucursal_id': sucursal.id,
+                'cierres': CajaDiaria.objects.count(),
+                'registros': RegistroDiario.objects.count(),
+            },
+            'repeticiones': options['repeticiones'],
+            'resultados': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto)
+        else:
+            self.stdout.write(texto)
+
+        fallidas = [n for n, r in resultados.items() if r['estado'] == 'falla']
+        if fallidas:
+            raise CommandError(f"Superaron el límite de consultas o fallaron: {', '.join(fallidas)}")
+
+    def _sucursal(self, sucursal_id):
+        sucursales = Sucursal.objects.all()
+        if sucursal_id:
+            sucursales = sucursales.filter(id=sucursal_id)
+        sucursal = sucursales.annotate(cierres=Count('cajadiaria')).order_by('-cierres', 'id').first()
+        if sucursal is None:
+            raise CommandError("No hay una sucursal con datos para medir.")
+        return sucursal
+
+    def _planilla(self, sucursal):
+        """Formulario de cierre típico: venta, entrada y baja en cada producto."""
+        datos = {
+            'sucursal_id': sucursal.id,
+            'caja_efectivo': '500', 'caja_qr': '120', 'caja_tarjeta': '0',
+            'personal_turno': ['Benchmark'],
+            'gasto_desc[]': ['Pasajes'], 'gasto_monto[]': ['10'],
+        }
+        for p in catalogo_sucursal(sucursal.id):
+            datos[f's_{p.id}'] = '12'
+            datos[f'e_{p.id}'] = '3'
+            datos[f'b_{p.id}'] = '1'
+        return datos
+
+    def _medir_hojas(self, cierre, repeticiones):
+        """Mismo cierre renderizado en este proceso con la hoja en un <style>
+        (se procesa en cada PDF, como antes) y con la hoja ya procesada."""
+        rutas = {nombre: finders.find(ruta) for nombre, ruta in HOJAS_PDF.items()}
+        try:
+            render_pdf.iniciar(rutas)
+        except (ImportError, OSError) as e:
+            return {nombre: {'estado': 'omitido', 'error': str(e)} for nombre in ('pdf_css_en_linea', 'pdf_css_procesado')}
+
+        html = html_cierre(cierre)
+        with open(rutas['cierre'], encoding='utf-8') as archivo:
+            html_en_linea = html.replace('<head>', f"<head><style>{archivo.read()}</style>", 1)
+        return {
+            'pdf_css_en_linea': self._medir('pdf_css_en_linea', lambda: render_pdf.renderizar(html_en_linea), repeticiones),
+            'pdf_css_procesado': self._medir('pdf_css_procesado', lambda: render_pdf.renderizar(html, ('cierre',)), repeticiones),
+        }
+
+    def _medir(self, nombre, operacion, repeticiones):
+        tiempos, consultas = [], []
+        try:
+            for _ in range(repeticiones):
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    respuesta = operacion()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+                if getattr(respuesta, 'status_code', 200) >= 400:
+                    return {'estado': 'falla', 'error': f"HTTP {respuesta.status_code}"}
+        except (ImportError, OSError, BrokenProcessPool) as e:
+            # WeasyPrint necesita Pango instalado en el sistema; en el pool de
+            # render su falta llega como un pool roto
+            return {'estado': 'omitido', 'error': str(e) or type(e).__name__}
+
+        limite = LIMITES_CONSULTAS[nombre]
+        return {
+            'estado': 'ok' if max(consultas) <= limite else 'falla',
+            'ms_min': round(min(tiempos), 2),
+            'ms_mediana': round(statistics.median(tiempos), 2),
+            'ms_max': round(max(tiempos), 2),
+            'consultas': max(consultas),
+            'limite_consultas': limite,
+        }
@@ -0,0 +1,56 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventario.conciliacion import detectar_anomalias
+
+
+class Command(BaseCommand):
+    help = "Marca los días con diferencias de caja anómalas y los equipos de turno con faltantes repetidos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD (por defecto, hace un año)")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD (por defecto, hoy)")
+        parser.add_argument('--sucursal', type=int, action='append', help="ID de sucursal (se puede repetir; por defecto, todas)")
+        parser.add_argument('--json', action='store_true', help="Emite el resultado completo en JSON")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        fechas = {'desde': hoy - datetime.timedelta(days=365), 'hasta': hoy}
+        for clave in ('desde', 'hasta'):
+            valor = options[clave]
+            if valor:
+                try:
+                    fechas[clave] = parse_date(valor)
+                except ValueError:
+                    fechas[clave] = None
+                if not fechas[clave]:
+                    raise CommandError(f"Fecha inválida para --{clave}: {valor}")
+
+        inicio = time.perf_counter()
+        datos = detectar_anomalias(fechas['desde'], fechas['hasta'], options['sucursal'])
+        milisegundos = (time.perf_counter() - inicio) * 1000
+
+        if options['json']:
+            self.stdout.write(json.dumps(datos, cls=DjangoJSONEncoder, indent=2, ensure_ascii=False))
+            return
+
+        for s in datos['por_sucursal']:
+            self.stdout.write(
+                f"{s['sucursal']}: {s['cierres']} cierres, diferencia {s['diferencia']:.2f} Bs, "
+                f"{s['faltantes']} faltantes, {s['dias_anomalos']} días anómalos"
+            )
+        for d in datos['dias']:
+            self.stdout.write(f"  ! {d['fecha']} {d['sucursal']} ({d['personal']}): {d['diferencia']:.2f} Bs — {'; '.join(d['motivos'])}")
+        for e in datos['equipos']:
+            if e['sospechoso']:
+                self.stdout.write(self.style.WARNING(
+                    f"Equipo a revisar: {e['personal']} ({e['faltantes']} faltantes en {e['cierres']} cierres, "
+                    f"{e['diferencia']:.2f} Bs)"
+                ))
+        self.stdout.write(self.style.SUCCESS(f"¡Listo! {len(datos['dias'])} días anómalos ({milisegundos:.0f} ms)."))
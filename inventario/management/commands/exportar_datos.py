@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventario.exportar import TABLAS_EXPORTABLES, lineas_csv
+
+
+class Command(BaseCommand):
+    help = "Exporta cierres, registros, ventas y gastos a archivos CSV (respaldo nocturno)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tabla', choices=sorted(TABLAS_EXPORTABLES), action='append',
+                            help="Tabla a exportar; se puede repetir (por defecto, todas)")
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD")
+        parser.add_argument('--salida', default='.', help="Carpeta donde se escriben los CSV")
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for clave in ('desde', 'hasta'):
+            valor = options[clave]
+            try:
+                fechas[clave] = parse_date(valor) if valor else None
+            except ValueError:
+                fechas[clave] = None
+            if valor and not fechas[clave]:
+                raise CommandError(f"Fecha inválida para --{clave}: {valor}")
+
+        os.makedirs(options['salida'], exist_ok=True)
+        for tabla in options['tabla'] or sorted(TABLAS_EXPORTABLES):
+            ruta = os.path.join(options['salida'], f"{tabla}_{fechas['desde'] or 'inicio'}_{fechas['hasta'] or 'hoy'}.csv")
+            with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+                lineas = 0
+                for linea in lineas_csv(tabla, fechas['desde'], fechas['hasta']):
+                    archivo.write(linea)
+                    lineas += 1
+            self.stdout.write(f"{tabla}: {lineas - 1} filas -> {ruta}")
+        self.stdout.write(self.style.SUCCESS("¡Listo!"))
@@ -0,0 +1,119 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventario.catalogo import CATALOGO_INICIAL, SUCURSALES_INICIALES, datos_categoria
+from inventario.importar import fechas_manuales
+from inventario.models import (
+    Sucursal, Categoria, Producto, RegistroDiario, CajaDiaria, VentaSalteña, GastoExtra
+)
+from inventario.resumen import reconstruir_resumen
+from inventario.stock import recalcular_sucursal
+
+GASTOS_TIPICOS = ['Pasajes', 'Gas', 'Bolsas', 'Servilletas', 'Hielo', 'Limpieza']
+PERSONAL = [f"Persona {i}" for i in range(1, 11)]
+
+
+class Command(BaseCommand):
+    help = "Genera años de cierres sintéticos (registros, cajas, ventas y gastos) para pruebas de rendimiento."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sucursales', type=int, default=3, help="Cantidad de sucursales")
+        parser.add_argument('--dias', type=int, default=365, help="Días de historial hacia atrás desde ayer")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla para que los datos sean reproducibles")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por inserción masiva")
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        sucursales, productos = self._catalogo(options['sucursales'])
+        hasta = timezone.localdate() - datetime.timedelta(days=1)
+        desde = hasta - datetime.timedelta(days=options['dias'] - 1)
+
+        campos_fecha = [RegistroDiario._meta.get_field('fecha_creacion')]
+        lote = options['lote']
+        registros, cajas, ventas, gastos = [], [], [], []
+        totales = {'registros': 0, 'cajas': 0, 'ventas': 0, 'gastos': 0}
+
+        def volcar():
+            RegistroDiario.objects.bulk_create(registros, batch_size=lote)
+            CajaDiaria.objects.bulk_create(cajas, batch_size=lote)
+            VentaSalteña.objects.bulk_create(ventas, batch_size=lote)
+            GastoExtra.objects.bulk_create(gastos, batch_size=lote)
+            for clave, filas in (('registros', registros), ('cajas', cajas), ('ventas', ventas), ('gastos', gastos)):
+                totales[clave] += len(filas)
+                filas.clear()
+
+        with fechas_manuales(*campos_fecha), transaction.atomic():
+            dia = desde
+            while dia <= hasta:
+                # Cierre a las 20:00 de La Paz
+                cierre = timezone.make_aware(datetime.datetime.combine(dia, datetime.time(20, 0)))
+                fin_de_semana = dia.weekday() >= 5
+                for sucursal in sucursales:
+                    venta_bs = Decimal('0.00')
+                    for p in productos:
+                        base = 40 if p.categoria.grupo == Categoria.Grupo.SALTENA else 8
+                        salida = max(0, int(azar.gauss(base * (1.4 if fin_de_semana else 1.0), base * 0.3)))
+                        produccion = salida + azar.randint(0, 6) if p.categoria.grupo == Categoria.Grupo.SALTENA else 0
+                        baja = max(0, produccion - salida - azar.randint(0, 3))
+                        registros.append(RegistroDiario(
+                            producto=p, sucursal=sucursal, fecha=dia, fecha_creacion=cierre,
+                            produccion=produccion, entrada=azar.randint(0, 10), baja=baja, salida=salida,
+                            precio_unitario=p.precio_unitario,
+                        ))
+                        if salida:
+                            ventas.append(VentaSalteña(
+                                producto=p.nombre, venta=salida, precio_unitario=p.precio_unitario,
+                                sucursal=sucursal, fecha=dia,
+                            ))
+                            venta_bs += salida * p.precio_unitario
+
+                    gasto_bs = Decimal('0.00')
+                    for _ in range(azar.randint(0, 2)):
+                        monto = Decimal(azar.randint(5, 60))
+                        gasto_bs += monto
+                        gastos.append(GastoExtra(descripcion=azar.choice(GASTOS_TIPICOS), monto=monto, sucursal=sucursal, fecha=dia))
+
+                    # Caja con pequeñas diferencias (a veces faltantes)
+                    esperado = venta_bs - gasto_bs
+                    real = esperado + Decimal(azar.choice([0, 0, 0, 0, -5, 5, -10, -20]))
+                    qr = (real * Decimal(azar.uniform(0.1, 0.4))).quantize(Decimal('0.01'))
+                    cajas.append(CajaDiaria(
+                        sucursal=sucursal, fecha=dia, efectivo=real - qr, qr=qr, tarjetero=0,
+                        personal_turno=", ".join(azar.sample(PERSONAL, 3)),
+                    ))
+
+                if len(registros) >= lote:
+                    volcar()
+                dia += datetime.timedelta(days=1)
+            volcar()
+
+        self.stdout.write("Reconstruyendo resumen diario y stock...")
+        reconstruir_resumen(desde, hasta)
+        for sucursal in sucursales:
+            recalcular_sucursal(sucursal.id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"¡Listo! {desde} a {hasta}: {totales['cajas']} cierres, {totales['registros']} registros, "
+            f"{totales['ventas']} ventas, {totales['gastos']} gastos."
+        ))
+
+    def _catalogo(self, cantidad):
+        """Sucursales (las del cuaderno y más si se piden) con el catálogo de cargar_datos.py."""
+        nombres = SUCURSALES_INICIALES + [f"SUCURSAL {i}" for i in range(len(SUCURSALES_INICIALES) + 1, cantidad + 1)]
+        sucursales = [Sucursal.objects.get_or_create(nombre=n)[0] for n in nombres[:cantidad]]
+
+        productos = []
+        for nombre_cat, items in CATALOGO_INICIAL.items():
+            categoria, _ = Categoria.objects.get_or_create(nombre=nombre_cat, defaults=datos_categoria(nombre_cat))
+            for nombre_prod, precio in items:
+                producto, _ = Producto.objects.get_or_create(
+                    nombre=nombre_prod, categoria=categoria, defaults={'precio_unitario': Decimal(str(precio))}
+                )
+                producto.sucursal.add(*sucursales)
+                productos.append(producto)
+        return sucursales, productos
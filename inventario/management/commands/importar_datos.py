@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importar import TIPOS_HISTORIAL, importar_catalogo, importar_historial, leer_archivo
+
+# Elementos de cada lista de diferencias que se muestran
+MAXIMO_DETALLE = 10
+
+
+class Command(BaseCommand):
+    help = "Importa catálogo o historial (cierres, registros, gastos) desde CSV o JSON en una sola transacción."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['catalogo'] + sorted(TIPOS_HISTORIAL))
+        parser.add_argument('archivo', help="Archivo .csv (como los de exportar_datos) o .json")
+        parser.add_argument('--simular', action='store_true', help="Muestra las diferencias sin escribir nada")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        aplicar = not options['simular']
+        try:
+            filas = leer_archivo(options['archivo'])
+            if options['tipo'] == 'catalogo':
+                diferencias = importar_catalogo(filas, aplicar)
+            else:
+                diferencias = importar_historial(options['tipo'], filas, aplicar)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for clave, valor in diferencias.items():
+            if isinstance(valor, list):
+                self.stdout.write(f"{clave}: {len(valor)}")
+                marca = '=' if 'omitidos' in clave else '+'
+                for item in valor[:MAXIMO_DETALLE]:
+                    self.stdout.write(f"  {marca} {item}")
+                if len(valor) > MAXIMO_DETALLE:
+                    self.stdout.write(f"  ... y {len(valor) - MAXIMO_DETALLE} más")
+            else:
+                self.stdout.write(f"{clave}: {valor}")
+
+        segundos = time.perf_counter() - inicio
+        if aplicar:
+            self.stdout.write(self.style.SUCCESS(f"¡Listo! {len(filas)} filas procesadas en {segundos:.1f} s."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Simulación: no se guardó nada ({len(filas)} filas leídas)."))
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from inventario.instrumentacion import instalar_medicion_plantillas, resumen_estadisticas
+
+
+class Command(BaseCommand):
+    help = "Ejecuta una ruta varias veces y muestra tiempo, consultas, BD, plantilla y PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help="Ruta con parámetros, p. ej. '/historial/?sucursal_id=1'")
+        parser.add_argument('--veces', type=int, default=5)
+        parser.add_argument('--usuario', help="Usuario con el que se hace la petición (por defecto, el primer superusuario)")
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.filter(username=options['usuario']) if options['usuario'] else User.objects.filter(is_superuser=True)
+        usuario = usuarios.order_by('id').first()
+        if usuario is None:
+            raise CommandError("No hay un usuario con el que iniciar sesión.")
+
+        instalar_medicion_plantillas()
+        cliente = Client()
+        cliente.force_login(usuario)
+        with override_settings(INSTRUMENTACION=True):
+            for i in range(options['veces']):
+                respuesta = cliente.get(options['ruta'])
+                self.stdout.write(f"#{i + 1} [{respuesta.status_code}] {respuesta.get('Server-Timing', '')}")
+
+        for fila in resumen_estadisticas():
+            self.stdout.write(self.style.SUCCESS(
+                f"{fila['vista']}: prom {fila['promedio_ms']:.1f} ms | p95 {fila['p95_ms']:.1f} ms | "
+                f"{fila['consultas']:.1f} consultas | BD {fila['db_ms']:.1f} ms | "
+                f"plantilla {fila['plantilla_ms']:.1f} ms | PDF {fila['pdf_ms']:.1f} ms"
+            ))
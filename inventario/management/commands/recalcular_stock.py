@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventario.models import Sucursal
+from inventario.stock import recalcular_sucursal
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el saldo de stock y las fotos periódicas a partir de todo el historial."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sucursal', type=int, help="ID de una sola sucursal (por defecto, todas)")
+
+    def handle(self, *args, **options):
+        sucursales = Sucursal.objects.all()
+        if options['sucursal']:
+            sucursales = sucursales.filter(id=options['sucursal'])
+
+        for sucursal in sucursales:
+            recalcular_sucursal(sucursal.id)
+            self.stdout.write(f"Stock recalculado: {sucursal.nombre}")
+        self.stdout.write(self.style.SUCCESS("¡Listo!"))
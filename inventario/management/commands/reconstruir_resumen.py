@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventario.resumen import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = "Rellena o reconstruye la tabla de resumen diario a partir de los registros."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD (por defecto, el primer registro)")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD (por defecto, el último registro)")
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for clave in ('desde', 'hasta'):
+            valor = options[clave]
+            if valor:
+                try:
+                    fechas[clave] = parse_date(valor)
+                except ValueError:
+                    fechas[clave] = None
+                if not fechas[clave]:
+                    raise CommandError(f"Fecha inválida para --{clave}: {valor}")
+
+        total = reconstruir_resumen(fechas.get('desde'), fechas.get('hasta'))
+        self.stdout.write(self.style.SUCCESS(f"¡Listo! {total} filas de resumen."))
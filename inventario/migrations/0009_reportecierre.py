@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_cajadiaria_personal_turno_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteCierre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(upload_to='reportes/')),
+                ('hash_contenido', models.CharField(max_length=64)),
+                ('generado', models.DateTimeField(auto_now=True)),
+                ('caja', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reporte_pdf', to='inventario.cajadiaria')),
+            ],
+        ),
+    ]
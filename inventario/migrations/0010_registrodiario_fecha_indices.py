@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:19
+
+import datetime
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def rellenar_fecha(apps, schema_editor):
+    # Los cierres antiguos se fecharon con TIME_ZONE='UTC'; se usa la misma
+    # fecha UTC para que sigan coincidiendo con su CajaDiaria, gastos y ventas.
+    RegistroDiario = apps.get_model('inventario', 'RegistroDiario')
+    RegistroDiario.objects.update(fecha=TruncDate('fecha_creacion', tzinfo=datetime.timezone.utc))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_reportecierre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrodiario',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(rellenar_fecha, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cajadiaria',
+            index=models.Index(fields=['sucursal', 'fecha'], name='caja_sucursal_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gastoextra',
+            index=models.Index(fields=['sucursal', 'fecha'], name='gasto_sucursal_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrodiario',
+            index=models.Index(fields=['sucursal', 'fecha'], name='registro_sucursal_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventasalteña',
+            index=models.Index(fields=['sucursal', 'fecha'], name='venta_sucursal_fecha_idx'),
+        ),
+    ]
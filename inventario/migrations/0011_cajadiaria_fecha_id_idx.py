@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_registrodiario_fecha_indices'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cajadiaria',
+            index=models.Index(fields=['fecha', 'id'], name='caja_fecha_id_idx'),
+        ),
+    ]
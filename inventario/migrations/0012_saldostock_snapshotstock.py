@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_cajadiaria_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='inventario.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='inventario.sucursal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'sucursal'), name='saldo_producto_sucursal_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.sucursal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sucursal', 'fecha'], name='snapshot_sucursal_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'sucursal', 'fecha'), name='snapshot_producto_sucursal_fecha_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:23
+
+import django.db.models.deletion
+import django.utils.timezone
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalizar(nombre):
+    sin_tildes = unicodedata.normalize('NFKD', nombre or '').encode('ascii', 'ignore').decode()
+    return ' '.join(sin_tildes.upper().split())
+
+
+def migrar_traspasos_texto(apps, schema_editor):
+    # Los traspasos antiguos solo guardaban el nombre del destino ('Méndez Arcos'
+    # frente a 'MENDEZ ARCOS'); se enlazan a la sucursal comparando sin tildes.
+    Sucursal = apps.get_model('inventario', 'Sucursal')
+    RegistroDiario = apps.get_model('inventario', 'RegistroDiario')
+    Traspaso = apps.get_model('inventario', 'Traspaso')
+
+    sucursales = {_normalizar(s.nombre): s.id for s in Sucursal.objects.all()}
+    pendientes = RegistroDiario.objects.filter(traspaso__gt=0).exclude(traspaso_destino__isnull=True).exclude(traspaso_destino='')
+    lote = []
+    for reg in pendientes.iterator(chunk_size=2000):
+        destino_id = sucursales.get(_normalizar(reg.traspaso_destino))
+        if destino_id and destino_id != reg.sucursal_id:
+            lote.append(Traspaso(
+                producto_id=reg.producto_id, origen_id=reg.sucursal_id, destino_id=destino_id,
+                cantidad=reg.traspaso, fecha=reg.fecha, registro_origen_id=reg.id, recibido=True,
+            ))
+        if len(lote) >= 2000:
+            Traspaso.objects.bulk_create(lote)
+            lote = []
+    Traspaso.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_saldostock_snapshotstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Traspaso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('fecha', models.DateField(default=django.utils.timezone.localdate)),
+                ('recibido', models.BooleanField(default=False)),
+                ('fecha_recepcion', models.DateTimeField(blank=True, null=True)),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='traspasos_recibidos', to='inventario.sucursal')),
+                ('origen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='traspasos_enviados', to='inventario.sucursal')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.producto')),
+                ('registro_destino', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='traspasos_recibidos', to='inventario.registrodiario')),
+                ('registro_origen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='traspasos_enviados', to='inventario.registrodiario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['destino', 'fecha', 'recibido'], name='traspaso_destino_fecha_idx'), models.Index(fields=['origen', 'fecha'], name='traspaso_origen_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(migrar_traspasos_texto, migrations.RunPython.noop),
+    ]
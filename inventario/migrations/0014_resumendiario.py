@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_traspaso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('produccion', models.IntegerField(default=0)),
+                ('entrada', models.IntegerField(default=0)),
+                ('baja', models.IntegerField(default=0)),
+                ('traspaso', models.IntegerField(default=0)),
+                ('salida', models.IntegerField(default=0)),
+                ('ventas_bs', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.categoria')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventario.sucursal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'sucursal'], name='resumen_fecha_sucursal_idx')],
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'fecha', 'producto'), name='resumen_sucursal_fecha_producto_uniq')],
+            },
+        ),
+    ]
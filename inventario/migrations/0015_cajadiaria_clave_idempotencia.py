@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_resumendiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cajadiaria',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0015_cajadiaria_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cajadiaria',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
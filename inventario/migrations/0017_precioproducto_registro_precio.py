@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+LOTE = 2000
+
+
+def congelar_precios(apps, schema_editor):
+    # Precio inicial de cada producto desde el primer registro. Los registros toman
+    # el precio que quedó en su VentaSalteña (esa sí guardaba el precio del día) y,
+    # si no tienen venta, el precio actual del producto.
+    Producto = apps.get_model('inventario', 'Producto')
+    PrecioProducto = apps.get_model('inventario', 'PrecioProducto')
+    RegistroDiario = apps.get_model('inventario', 'RegistroDiario')
+    VentaSalteña = apps.get_model('inventario', 'VentaSalteña')
+    ResumenDiario = apps.get_model('inventario', 'ResumenDiario')
+
+    productos = {p.id: p for p in Producto.objects.all()}
+    desde = RegistroDiario.objects.aggregate(f=Min('fecha'))['f'] or django.utils.timezone.localdate()
+    PrecioProducto.objects.bulk_create([
+        PrecioProducto(producto_id=p.id, precio_unitario=p.precio_unitario, vigente_desde=desde) for p in productos.values()
+    ])
+
+    vendidos = {
+        (sucursal_id, fecha, nombre): precio
+        for sucursal_id, fecha, nombre, precio in VentaSalteña.objects.values_list(
+            'sucursal_id', 'fecha', 'producto', 'precio_unitario').iterator(chunk_size=LOTE)
+    }
+    lote = []
+    for r in RegistroDiario.objects.only('id', 'producto_id', 'sucursal_id', 'fecha').iterator(chunk_size=LOTE):
+        producto = productos[r.producto_id]
+        r.precio_unitario = vendidos.get((r.sucursal_id, r.fecha, producto.nombre), producto.precio_unitario)
+        lote.append(r)
+        if len(lote) >= LOTE:
+            RegistroDiario.objects.bulk_update(lote, ['precio_unitario'])
+            lote = []
+    RegistroDiario.objects.bulk_update(lote, ['precio_unitario'])
+
+    # El resumen diario se recalcula con los precios congelados
+    monto = DecimalField(max_digits=12, decimal_places=2)
+    ventas = RegistroDiario.objects.filter(
+        sucursal_id=OuterRef('sucursal_id'), fecha=OuterRef('fecha'), producto_id=OuterRef('producto_id')
+    ).values('producto_id').annotate(
+        t=Sum(ExpressionWrapper(F('salida') * F('precio_unitario'), output_field=monto))
+    ).values('t')
+    ResumenDiario.objects.update(ventas_bs=Coalesce(Subquery(ventas, output_field=monto), Value(0), output_field=monto))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0016_cajadiaria_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrodiario',
+            name='precio_unitario',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='PrecioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vigente_desde', models.DateField(default=django.utils.timezone.localdate)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios', to='inventario.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'vigente_desde'), name='precio_producto_desde_uniq')],
+            },
+        ),
+        migrations.RunPython(congelar_precios, migrations.RunPython.noop),
+    ]
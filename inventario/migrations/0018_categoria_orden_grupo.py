@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+# Copia fija de inventario.catalogo.datos_categoria: (texto en el nombre, grupo, orden)
+GRUPOS = [
+    ('SALTE', 'saltena', 10),
+    ('JUGO', 'jugo', 40),
+    ('CALIENTE', 'caliente', 30),
+    ('BEBIDA', 'bebida', 20),
+]
+
+
+def asignar_grupos(apps, schema_editor):
+    # Las salteñas siguen primero; el resto queda ordenado por grupo y nombre
+    Categoria = apps.get_model('inventario', 'Categoria')
+    categorias = list(Categoria.objects.all())
+    for categoria in categorias:
+        nombre = categoria.nombre.upper()
+        categoria.grupo, categoria.orden = next(
+            ((grupo, orden) for texto, grupo, orden in GRUPOS if texto in nombre), ('otro', 100)
+        )
+    Categoria.objects.bulk_update(categorias, ['grupo', 'orden'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0017_precioproducto_registro_precio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='grupo',
+            field=models.CharField(choices=[('saltena', 'Salteñas'), ('bebida', 'Bebidas'), ('caliente', 'Bebidas calientes'), ('jugo', 'Jugos'), ('otro', 'Otros')], default='otro', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='orden',
+            field=models.PositiveSmallIntegerField(default=100),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['orden', 'nombre'], name='categoria_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['grupo'], name='categoria_grupo_idx'),
+        ),
+        migrations.RunPython(asignar_grupos, migrations.RunPython.noop),
+    ]
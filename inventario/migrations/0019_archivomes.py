@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0018_categoria_orden_grupo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('datos', models.BinaryField()),
+                ('registros', models.PositiveIntegerField(default=0)),
+                ('ventas', models.PositiveIntegerField(default=0)),
+                ('gastos', models.PositiveIntegerField(default=0)),
+                ('gastos_por_dia', models.JSONField(default=dict)),
+                ('archivado', models.DateTimeField(auto_now=True)),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='inventario.sucursal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'mes'), name='archivo_sucursal_mes_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0019_archivomes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cajadiaria',
+            name='hash_datos',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0020_cajadiaria_hash_datos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cajadiaria',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='gastoextra',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AlterField(
+            model_name='ventasalteña',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -1,5 +1,10 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # 1. GESTIÓN DE TIENDAS Y SUCURSALES
 class Sucursal(models.Model):
@@ -15,7 +20,24 @@ class Sucursal(models.Model):
 
 # 2. PRODUCTOS Y CATEGORÍAS
 class Categoria(models.Model):
+    # Grupo con el que se cuentan las unidades en los tableros de la planilla y del PDF
+    class Grupo(models.TextChoices):
+        SALTENA = 'saltena', 'Salteñas'
+        BEBIDA = 'bebida', 'Bebidas'
+        CALIENTE = 'caliente', 'Bebidas calientes'
+        JUGO = 'jugo', 'Jugos'
+        OTRO = 'otro', 'Otros'
+
     nombre = models.CharField(max_length=50)
+    # Posición en la planilla y en los reportes (menor primero; a igual orden, por nombre)
+    orden = models.PositiveSmallIntegerField(default=100)
+    grupo = models.CharField(max_length=10, choices=Grupo.choices, default=Grupo.OTRO)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['orden', 'nombre'], name='categoria_orden_idx'),
+            models.Index(fields=['grupo'], name='categoria_grupo_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -29,11 +51,25 @@ class Producto(models.Model):
     def __str__(self):
         return self.nombre
 
+# 2.1 HISTORIAL DE PRECIOS (cada precio rige desde su fecha hasta el siguiente)
+class PrecioProducto(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='precios')
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    vigente_desde = models.DateField(default=timezone.localdate)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['producto', 'vigente_desde'], name='precio_producto_desde_uniq')]
+
+    def __str__(self):
+        return f"{self.producto} {self.precio_unitario} Bs desde {self.vigente_desde}"
+
 # 3. REGISTRO DE INVENTARIO DIARIO (Actualizado para el PDF)
 class RegistroDiario(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Fecha de negocio (hora de La Paz) para buscar sin convertir fecha_creacion
+    fecha = models.DateField(default=timezone.localdate)
     produccion = models.IntegerField(default=0)
     entrada = models.IntegerField(default=0)
     baja = models.IntegerField(default=0)
@@ -41,16 +77,60 @@ class RegistroDiario(models.Model):
     # NUEVO: Guarda el nombre completo de la sucursal destino
     traspaso_destino = models.CharField(max_length=100, blank=True, null=True) 
     salida = models.IntegerField(default=0)
+    # Precio con el que se vendió ese día; los reportes no leen el precio vigente
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['sucursal', 'fecha'], name='registro_sucursal_fecha_idx')]
+
+# 3.1 TRASPASOS ENTRE SUCURSALES (salida en origen + entrada en destino)
+class Traspaso(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    origen = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='traspasos_enviados')
+    destino = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='traspasos_recibidos')
+    cantidad = models.IntegerField(default=0)
+    fecha = models.DateField(default=timezone.localdate)
+    registro_origen = models.ForeignKey(
+        RegistroDiario, on_delete=models.SET_NULL, null=True, blank=True, related_name='traspasos_enviados'
+    )
+    registro_destino = models.ForeignKey(
+        RegistroDiario, on_delete=models.SET_NULL, null=True, blank=True, related_name='traspasos_recibidos'
+    )
+    recibido = models.BooleanField(default=False)
+    fecha_recepcion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['destino', 'fecha', 'recibido'], name='traspaso_destino_fecha_idx'),
+            models.Index(fields=['origen', 'fecha'], name='traspaso_origen_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad} {self.producto} {self.origen} → {self.destino} ({self.fecha})"
 
 # 4. CIERRE DE CAJA FINANCIERO (Actualizado para Personal)
 class CajaDiaria(models.Model):
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
-    fecha = models.DateField(auto_now_add=True)
+    # Día de negocio del cierre: uno guardado sin conexión trae el suyo
+    fecha = models.DateField(default=timezone.localdate)
     efectivo = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     qr = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     tarjetero = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     # NUEVO: Guarda los nombres de los trabajadores seleccionados
     personal_turno = models.CharField(max_length=255, blank=True, null=True) 
+    # Clave generada por la planilla: un reintento del mismo envío no duplica el cierre
+    clave_idempotencia = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    # Hash de los datos enviados con esa clave: la misma clave con otros datos es un conflicto
+    hash_datos = models.CharField(max_length=64, blank=True, default='')
+    # Cambia cuando cambia el cierre o cualquier movimiento de su día (Last-Modified del API)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sucursal', 'fecha'], name='caja_sucursal_fecha_idx'),
+            # Paginación del historial por (fecha, id)
+            models.Index(fields=['fecha', 'id'], name='caja_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Cierre {self.sucursal.nombre} - {self.fecha}"
@@ -66,7 +146,10 @@ class VentaSalteña(models.Model):
     venta = models.IntegerField(default=0)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate)
+
+    class Meta:
+        indexes = [models.Index(fields=['sucursal', 'fecha'], name='venta_sucursal_fecha_idx')]
 
     @property
     def total_bs(self):
@@ -76,7 +159,92 @@ class GastoExtra(models.Model):
     descripcion = models.CharField(max_length=200, verbose_name="Descripción")
     monto = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Monto (Bs)")
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate)
+
+    class Meta:
+        indexes = [models.Index(fields=['sucursal', 'fecha'], name='gasto_sucursal_fecha_idx')]
 
     def __str__(self):
-        return f"{self.descripcion} (-{self.monto} Bs)"
\ No newline at end of file
+        return f"{self.descripcion} (-{self.monto} Bs)"
+
+# 6. REPORTES PDF PRE-GENERADOS
+class ReporteCierre(models.Model):
+    caja = models.OneToOneField(CajaDiaria, on_delete=models.CASCADE, related_name='reporte_pdf')
+    archivo = models.FileField(upload_to='reportes/')
+    hash_contenido = models.CharField(max_length=64)
+    generado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"PDF {self.caja}"
+
+
+# 7. STOCK ACUMULADO (Saldo actual y fotos periódicas)
+class SaldoStock(models.Model):
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='saldos')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='saldos')
+    cantidad = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['producto', 'sucursal'], name='saldo_producto_sucursal_uniq')]
+
+    def __str__(self):
+        return f"{self.producto} @ {self.sucursal}: {self.cantidad}"
+
+class SnapshotStock(models.Model):
+    """Saldo de un producto al final de 'fecha'; punto de partida para consultas históricas."""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['producto', 'sucursal', 'fecha'], name='snapshot_producto_sucursal_fecha_uniq')]
+        indexes = [models.Index(fields=['sucursal', 'fecha'], name='snapshot_sucursal_fecha_idx')]
+
+
+# 8. RESUMEN DIARIO PRE-CALCULADO (para reportes semanales y mensuales)
+class ResumenDiario(models.Model):
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
+    produccion = models.IntegerField(default=0)
+    entrada = models.IntegerField(default=0)
+    baja = models.IntegerField(default=0)
+    traspaso = models.IntegerField(default=0)
+    salida = models.IntegerField(default=0)
+    ventas_bs = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['sucursal', 'fecha', 'producto'], name='resumen_sucursal_fecha_producto_uniq')]
+        indexes = [models.Index(fields=['fecha', 'sucursal'], name='resumen_fecha_sucursal_idx')]
+
+
+# 9. ARCHIVO DE MESES ANTIGUOS (registros, ventas y gastos comprimidos por sucursal y mes)
+class ArchivoMes(models.Model):
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='archivos')
+    # Primer día del mes archivado
+    mes = models.DateField()
+    # JSON comprimido con zlib: {'registros': [...], 'ventas': [...], 'gastos': [...]}
+    datos = models.BinaryField()
+    registros = models.PositiveIntegerField(default=0)
+    ventas = models.PositiveIntegerField(default=0)
+    gastos = models.PositiveIntegerField(default=0)
+    # Total de gastos por día ('AAAA-MM-DD' -> monto): los reportes por rango no descomprimen
+    gastos_por_dia = models.JSONField(default=dict)
+    archivado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['sucursal', 'mes'], name='archivo_sucursal_mes_uniq')]
+
+    def __str__(self):
+        return f"Archivo {self.sucursal} {self.mes:%Y-%m}"
+
+    def contenido(self):
+        """Filas archivadas como diccionarios (fechas y montos en texto)."""
+        return json.loads(zlib.decompress(self.datos))
+
+    def guardar_contenido(self, contenido):
+        self.datos = zlib.compress(json.dumps(contenido, cls=DjangoJSONEncoder, separators=(',', ':')).encode(), 9)
+        self.registros, self.ventas, self.gastos = (len(contenido[t]) for t in ('registros', 'ventas', 'gastos'))
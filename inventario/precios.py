@@ -0,0 +1,43 @@
+import bisect
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import PrecioProducto, Producto
+
+
+def registrar_precio(producto, desde=None):
+    """Anota el precio actual del producto en su historial si cambió."""
+    desde = desde or timezone.localdate()
+    ultimo = PrecioProducto.objects.filter(producto=producto, vigente_desde__lte=desde).order_by('-vigente_desde').first()
+    if ultimo and ultimo.precio_unitario == producto.precio_unitario:
+        return
+    PrecioProducto.objects.update_or_create(
+        producto=producto, vigente_desde=desde, defaults={'precio_unitario': producto.precio_unitario}
+    )
+
+
+class HistorialPrecios:
+    """Historial de precios en memoria para poner precio a muchos registros sin una consulta por fila."""
+
+    def __init__(self, producto_ids):
+        self._desde = defaultdict(list)
+        self._precios = defaultdict(list)
+        for producto_id, desde, precio in PrecioProducto.objects.filter(
+            producto_id__in=producto_ids
+        ).order_by('vigente_desde').values_list('producto_id', 'vigente_desde', 'precio_unitario'):
+            self._desde[producto_id].append(desde)
+            self._precios[producto_id].append(precio)
+        self._actual = dict(Producto.objects.filter(id__in=producto_ids).values_list('id', 'precio_unitario'))
+
+    def precio(self, producto_id, fecha):
+        """Precio vigente en 'fecha' (antes del primer precio anotado, ese primero)."""
+        precios = self._precios[producto_id]
+        if not precios:
+            return self._actual.get(producto_id)
+        i = bisect.bisect_right(self._desde[producto_id], fecha)
+        return precios[max(i - 1, 0)]
+
+
+def precio_en_fecha(producto_id, fecha):
+    return HistorialPrecios([producto_id]).precio(producto_id, fecha)
@@ -0,0 +1,119 @@
+"""Producción sugerida por sucursal, producto y día de la semana.
+
+La demanda de cada día de la semana se estima con las ventas (salida) de las
+últimas SEMANAS_HISTORIA semanas, con más peso para las recientes. El catálogo
+completo de todas las sucursales se calcula en una sola pasada de NumPy y queda
+en caché hasta el día siguiente (solo usa días ya cerrados).
+"""
+import datetime
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import CajaDiaria, ResumenDiario
+
+SEMANAS_HISTORIA = 8
+# Peso de cada semana respecto de la siguiente más reciente
+DECAIMIENTO = 0.8
+# Desvíos que se suman a la demanda media para no quedarse sin salteñas
+FACTOR_SEGURIDAD = 0.5
+# Días de la semana cerrados que hacen falta para sugerir algo
+MIN_DIAS = 3
+
+PRONOSTICO_TIMEOUT = 60 * 60 * 24
+
+
+def calcular_pronosticos(hoy):
+    """{sucursal_id: {producto_id: [7 sugerencias, de lunes a domingo]}} con la
+    historia anterior a 'hoy'. Cada sugerencia es {'unidades', 'sobrante'} o None."""
+    desde = hoy - datetime.timedelta(weeks=SEMANAS_HISTORIA)
+    rango = {'fecha__gte': desde, 'fecha__lt': hoy}
+
+    # Los días cerrados son las observaciones: un producto sin fila ese día vendió 0
+    cerrados = list(CajaDiaria.objects.filter(**rango).values_list('sucursal_id', 'fecha').distinct().order_by())
+    filas = list(ResumenDiario.objects.filter(**rango).values_list(
+        'sucursal_id', 'producto_id', 'fecha', 'salida', 'baja').order_by())
+    if not cerrados or not filas:
+        return {}
+
+    hoy64 = np.datetime64(hoy, 'D')
+
+    def dia_y_peso(fechas):
+        dias = np.array(fechas, dtype='datetime64[D]')
+        # 1970-01-01 fue jueves: así 0 es lunes, como date.weekday()
+        semana = (dias.astype(np.int64) + 3) % 7
+        return semana, DECAIMIENTO ** ((hoy64 - dias).astype(np.int64) // 7)
+
+    sucursal_ids = np.unique([c[0] for c in cerrados])
+    c_sucursal, c_fecha = zip(*cerrados)
+    c_s = np.searchsorted(sucursal_ids, c_sucursal)
+    c_dia, c_peso = dia_y_peso(c_fecha)
+    pesos = np.zeros((len(sucursal_ids), 7))
+    dias_cerrados = np.zeros((len(sucursal_ids), 7))
+    np.add.at(pesos, (c_s, c_dia), c_peso)
+    np.add.at(dias_cerrados, (c_s, c_dia), 1)
+
+    # Filas de resumen de sucursales sin cierre en el rango (p. ej. solo traspasos) no cuentan
+    f_sucursal, f_producto, f_fecha, salida, baja = zip(*filas)
+    f_sucursal, salida, baja = np.array(f_sucursal), np.array(salida), np.array(baja)
+    validas = np.isin(f_sucursal, sucursal_ids)
+    producto_ids, f_p = np.unique(f_producto, return_inverse=True)
+    f_s = np.searchsorted(sucursal_ids, f_sucursal)
+    f_dia, f_peso = dia_y_peso(f_fecha)
+
+    # Sumas ponderadas por (sucursal, producto, día de la semana) en un bincount cada una
+    forma = (len(sucursal_ids), len(producto_ids), 7)
+    par = (f_s * len(producto_ids) + f_p)[validas]
+    grupo = par * 7 + f_dia[validas]
+    peso = f_peso[validas]
+    salida, baja = salida[validas].astype(float), baja[validas].astype(float)
+    suma = np.bincount(grupo, weights=peso * salida, minlength=np.prod(forma)).reshape(forma)
+    cuadrados = np.bincount(grupo, weights=peso * salida ** 2, minlength=np.prod(forma)).reshape(forma)
+    sobras = np.bincount(grupo, weights=peso * baja, minlength=np.prod(forma)).reshape(forma)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = pesos[:, None, :]
+        media = suma / total
+        desvio = np.sqrt(np.maximum(cuadrados / total - media ** 2, 0.0))
+        unidades = np.ceil(media + FACTOR_SEGURIDAD * desvio)
+        sobrante = sobras / total
+    suficiente = np.broadcast_to(dias_cerrados[:, None, :] >= MIN_DIAS, forma)
+
+    # Solo los pares (sucursal, producto) que tienen historia
+    resultado = {}
+    for s, p in zip(*np.divmod(np.unique(par), len(producto_ids))):
+        resultado.setdefault(int(sucursal_ids[s]), {})[int(producto_ids[p])] = [
+            {'unidades': int(unidades[s, p, d]), 'sobrante': round(float(sobrante[s, p, d]), 1)}
+            if suficiente[s, p, d] else None
+            for d in range(7)
+        ]
+    return resultado
+
+
+def _clave(fecha):
+    return f"pronostico:{fecha.isoformat()}"
+
+def recalcular_pronosticos(fecha):
+    """Calcula los pronósticos del día y los deja en caché."""
+    datos = calcular_pronosticos(fecha)
+    cache.set(_clave(fecha), datos, PRONOSTICO_TIMEOUT)
+    return datos
+
+def pronosticos(fecha=None):
+    """calcular_pronosticos del día, cacheado: la historia no cambia hasta mañana."""
+    fecha = fecha or timezone.localdate()
+    datos = cache.get(_clave(fecha))
+    if datos is None:
+        datos = recalcular_pronosticos(fecha)
+    return datos
+
+def produccion_sugerida(sucursal_id, fecha=None):
+    """{producto_id: {'unidades', 'sobrante'}} de la sucursal para el día de la semana de 'fecha'."""
+    fecha = fecha or timezone.localdate()
+    dia = fecha.weekday()
+    return {
+        producto_id: semana[dia]
+        for producto_id, semana in pronosticos(fecha).get(int(sucursal_id), {}).items()
+        if semana[dia] is not None
+    }
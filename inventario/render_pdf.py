@@ -0,0 +1,31 @@
+"""Render de PDF en los procesos del pool de reportes.
+
+Este módulo no importa Django: los procesos se crean con 'spawn' y solo cargan
+WeasyPrint, una vez por proceso, junto con su configuración de fuentes y las
+hojas de estilo de los reportes ya procesadas.
+"""
+
+_fuentes = None
+_hojas = {}
+
+
+def iniciar(hojas=None):
+    """Inicializador del proceso: deja WeasyPrint importado, las fuentes listas
+    y cada hoja de 'hojas' ({nombre: ruta del .css}) procesada una sola vez."""
+    global _fuentes
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    _fuentes = FontConfiguration()
+    _hojas.clear()
+    for nombre, ruta in (hojas or {}).items():
+        _hojas[nombre] = CSS(filename=ruta, font_config=_fuentes)
+
+
+def renderizar(html_string, hojas=()):
+    """HTML ya renderizado -> bytes PDF, con las hojas procesadas en iniciar()."""
+    from weasyprint import HTML
+
+    return HTML(string=html_string).write_pdf(
+        stylesheets=[_hojas[nombre] for nombre in hojas], font_config=_fuentes
+    )
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Max, Sum
+from django.template.loader import render_to_string
+
+from . import render_pdf
+from .archivo import movimientos_archivados, registros_por_producto
+from .catalogo import catalogo_sucursal
+from .instrumentacion import medir
+from .models import Categoria, RegistroDiario, CajaDiaria, GastoExtra, ReporteCierre
+from .resumen import VENTA_BS
+
+logger = logging.getLogger(__name__)
+
+# Cola local de generación: un solo hilo para no competir por CPU con las peticiones
+_cola_pdf = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reportes-pdf')
+
+# Pool de procesos de render (se crea al primer PDF): WeasyPrint usa CPU y
+# en procesos aparte aprovecha todos los núcleos sin bloquear las peticiones
+_pool_render = None
+_candado_pool = threading.Lock()
+
+# Hojas de estilo que los procesos de render cargan al iniciar (nombre -> estático)
+HOJAS_PDF = {'cierre': 'inventario/css/reporte_cierre.css'}
+
+# Máximo de cierres que se pueden descargar juntos en una petición
+MAX_CIERRES_LOTE = 200
+
+
+# --- 1. DATOS DEL REPORTE ---
+
+def contexto_cierre(cierre):
+    """Arma el contexto del reporte diario (Salteñas primero)."""
+    productos = catalogo_sucursal(cierre.sucursal_id)
+
+    # Un producto puede tener varias filas en el día (p. ej. su cierre más la
+    # entrada de un traspaso recibido): se suman en SQL en lugar de pisarse.
+    # Las ventas usan el precio guardado en el registro, así el reporte no cambia
+    registros = {r['producto_id']: {
+        'entrada': r['t_entrada'], 'baja': r['t_baja'], 'traspaso': r['t_traspaso'],
+        'traspaso_destino': r['destino'] or None, 'salida': r['t_salida'], 'ventas_bs': r['t_ventas'] or 0,
+    } for r in RegistroDiario.objects.filter(
+        sucursal=cierre.sucursal,
+        fecha=cierre.fecha
+    ).values('producto_id').annotate(
+        t_entrada=Sum('entrada'), t_baja=Sum('baja'), t_traspaso=Sum('traspaso'),
+        t_salida=Sum('salida'), destino=Max('traspaso_destino'), t_ventas=Sum(VENTA_BS),
+    )}
+
+    # Lista ya evaluada: el contexto se puede renderizar fuera del hilo de la BD
+    gastos_extras = list(GastoExtra.objects.filter(sucursal=cierre.sucursal, fecha=cierre.fecha))
+
+    # Sin movimientos en las tablas: el cierre puede ser de un mes ya archivado
+    if not registros and not gastos_extras:
+        dia = (cierre.sucursal_id, cierre.fecha)
+        archivado = movimientos_archivados({dia}).get(dia)
+        if archivado:
+            registros = registros_por_producto(archivado['registros'])
+            gastos_extras = [GastoExtra(sucursal_id=cierre.sucursal_id, **g) for g in archivado['gastos']]
+
+    filas = []
+    total_ventas = 0
+    unidades_grupo = defaultdict(int) # Contadores para el tablero final
+
+    for p in productos:
+        reg = registros.get(p.id)
+        v_bs = reg['ventas_bs'] if reg else 0
+        total_ventas += v_bs
+
+        # Conteo por grupo de la categoría
+        unidades_grupo[p.categoria.grupo] += reg['salida'] if reg else 0
+
+        filas.append({
+            'producto': p,
+            'reg': reg,
+            'total_fila_bs': v_bs
+        })
+
+    # Cálculos consolidados
+    total_gastos = sum(g.monto for g in gastos_extras)
+    total_caja_real = cierre.efectivo + cierre.qr + cierre.tarjetero
+    diferencia = total_caja_real - (total_ventas - total_gastos)
+
+    return {
+        'cierre': cierre,
+        'filas': filas,
+        'gastos_extras': gastos_extras,
+        'tS': unidades_grupo[Categoria.Grupo.SALTENA], 'tJ': unidades_grupo[Categoria.Grupo.JUGO],
+        'total_ventas': total_ventas,
+        'total_gastos': total_gastos,
+        'total_caja': total_caja_real,
+        'diferencia': diferencia,
+    }
+
+
+# --- 2. RENDERIZADO Y ALMACENAMIENTO ---
+
+def nombre_descarga(cierre):
+    return f"Reporte_{cierre.sucursal.nombre}_{cierre.fecha}.pdf"
+
+def _pool():
+    global _pool_render
+    with _candado_pool:
+        if _pool_render is None:
+            # 'spawn': los procesos no heredan conexiones a la BD ni hilos del worker
+            _pool_render = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PDF_PROCESOS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=render_pdf.iniciar,
+                initargs=({nombre: finders.find(ruta) for nombre, ruta in HOJAS_PDF.items()},),
+            )
+        return _pool_render
+
+def _encargar_pdf(html_string, hojas=()):
+    """Envía el HTML al pool; si un proceso murió, el pool se rehace en el próximo pedido."""
+    global _pool_render
+    try:
+        return _pool().submit(render_pdf.renderizar, html_string, hojas)
+    except BrokenProcessPool:
+        with _candado_pool:
+            _pool_render = None
+        return _pool().submit(render_pdf.renderizar, html_string, hojas)
+
+def html_a_pdf(html_string, hojas=()):
+    """Convierte HTML ya renderizado en bytes PDF (en el pool de procesos).
+    'hojas' son nombres de HOJAS_PDF, que el proceso ya tiene procesadas."""
+    with medir('pdf'):
+        return _encargar_pdf(html_string, hojas).result()
+
+async def ahtml_a_pdf(html_string, hojas=()):
+    """html_a_pdf sin bloquear el event loop."""
+    with medir('pdf'):
+        return await asyncio.wrap_future(_encargar_pdf(html_string, hojas))
+
+def html_cierre(cierre):
+    return render_to_string('inventario/pdf_template.html', contexto_cierre(cierre))
+
+def generar_reporte(cierre):
+    """Renderiza el PDF del cierre y lo guarda con el hash de su contenido."""
+    return guardar_reporte(cierre, html_a_pdf(html_cierre(cierre), ('cierre',)))
+
+def guardar_reporte(cierre, pdf):
+    hash_contenido = hashlib.sha256(pdf).hexdigest()
+
+    # Si cambió el contenido se reemplaza el archivo anterior
+    ReporteCierre.objects.filter(caja=cierre).delete()
+    reporte = ReporteCierre(caja=cierre, hash_contenido=hash_contenido)
+    reporte.archivo.save(f"cierre_{cierre.id}_{hash_contenido[:16]}.pdf", ContentFile(pdf), save=False)
+    reporte.save()
+    return reporte
+
+def obtener_reporte(cierre):
+    """Devuelve el PDF guardado del cierre o lo genera si no existe."""
+    reporte = ReporteCierre.objects.filter(caja=cierre).first()
+    if reporte and reporte.archivo.storage.exists(reporte.archivo.name):
+        return reporte
+    return generar_reporte(cierre)
+
+async def aobtener_reporte(cierre):
+    """Versión async de obtener_reporte: la BD con el ORM async y el PDF en el pool de render."""
+    reporte = await ReporteCierre.objects.filter(caja=cierre).afirst()
+    if reporte and await sync_to_async(reporte.archivo.storage.exists)(reporte.archivo.name):
+        return reporte
+    pdf = await ahtml_a_pdf(await sync_to_async(html_cierre)(cierre), ('cierre',))
+    return await sync_to_async(guardar_reporte)(cierre, pdf)
+
+def invalidar_reportes(sucursal_id, fecha):
+    """Borra los PDF guardados de los cierres de una sucursal en una fecha."""
+    ReporteCierre.objects.filter(caja__sucursal_id=sucursal_id, caja__fecha=fecha).delete()
+
+
+# --- 3. LOTES (varios cierres en un solo PDF o ZIP) ---
+
+def reportes_en_lote(cierres):
+    """PDF de cada cierre: los guardados se reutilizan y los que faltan se
+    renderizan en paralelo mientras se arma el HTML de los siguientes."""
+    guardados = {r.caja_id: r for r in ReporteCierre.objects.filter(caja__in=[c.id for c in cierres])}
+    pdfs, pendientes = {}, {}
+    for cierre in cierres:
+        reporte = guardados.get(cierre.id)
+        if reporte and reporte.archivo.storage.exists(reporte.archivo.name):
+            with reporte.archivo.open('rb') as archivo:
+                pdfs[cierre.id] = archivo.read()
+        else:
+            pendientes[cierre.id] = _encargar_pdf(html_cierre(cierre), ('cierre',))
+
+    with medir('pdf'):
+        for cierre in cierres:
+            if cierre.id in pendientes:
+                pdfs[cierre.id] = pendientes[cierre.id].result()
+                guardar_reporte(cierre, pdfs[cierre.id])
+    return [(cierre, pdfs[cierre.id]) for cierre in cierres]
+
+def unir_pdfs(pdfs):
+    """Un solo PDF con las páginas de todos, en orden."""
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for pdf in pdfs:
+        escritor.append(io.BytesIO(pdf))
+    salida = io.BytesIO()
+    escritor.write(salida)
+    return salida.getvalue()
+
+def zip_de_reportes(reportes):
+    """ZIP con un PDF por cierre (sin comprimir: los PDF ya lo están)."""
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for cierre, pdf in reportes:
+            archivo_zip.writestr(f"{cierre.fecha}_{cierre.sucursal.nombre}_{cierre.id}.pdf", pdf)
+    return salida.getvalue()
+
+
+# --- 4. GENERACIÓN EN SEGUNDO PLANO ---
+
+def _generar_en_segundo_plano(caja_id):
+    try:
+        cierre = CajaDiaria.objects.select_related('sucursal').filter(id=caja_id).first()
+        if cierre:
+            obtener_reporte(cierre)
+    except Exception:
+        logger.exception("No se pudo pre-generar el PDF del cierre %s", caja_id)
+    finally:
+        # El hilo tiene su propia conexión; se cierra para no dejarla colgada
+        connection.close()
+
+def encolar_reporte(caja_id):
+    """Programa la generación del PDF sin bloquear la petición actual."""
+    _cola_pdf.submit(_generar_en_segundo_plano, caja_id)
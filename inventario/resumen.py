@@ -0,0 +1,69 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Q, Sum, DecimalField, ExpressionWrapper
+
+from .models import ArchivoMes, RegistroDiario, ResumenDiario
+
+# Con el precio guardado en cada registro, no con el precio vigente del producto
+VENTA_BS = ExpressionWrapper(F('salida') * F('precio_unitario'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _filas_resumen(registros):
+    """Agrupa los registros diarios por (sucursal, fecha, producto) en SQL."""
+    return [
+        ResumenDiario(
+            sucursal_id=r['sucursal_id'], fecha=r['fecha'], producto_id=r['producto_id'],
+            categoria_id=r['producto__categoria_id'],
+            produccion=r['t_produccion'], entrada=r['t_entrada'], baja=r['t_baja'],
+            traspaso=r['t_traspaso'], salida=r['t_salida'], ventas_bs=r['t_ventas'] or 0,
+        )
+        for r in registros.values('sucursal_id', 'fecha', 'producto_id', 'producto__categoria_id').annotate(
+            t_produccion=Sum('produccion'), t_entrada=Sum('entrada'), t_baja=Sum('baja'),
+            t_traspaso=Sum('traspaso'), t_salida=Sum('salida'), t_ventas=Sum(VENTA_BS),
+        ).order_by()
+    ]
+
+
+# --- 1. ACTUALIZACIÓN INCREMENTAL (un día de una sucursal) ---
+
+def actualizar_resumen(sucursal_id, fecha):
+    """Recalcula el resumen de un solo día; se llama en cada cierre."""
+    filas = _filas_resumen(RegistroDiario.objects.filter(sucursal_id=sucursal_id, fecha=fecha))
+    with transaction.atomic():
+        ResumenDiario.objects.filter(sucursal_id=sucursal_id, fecha=fecha).delete()
+        ResumenDiario.objects.bulk_create(filas)
+
+
+# --- 2. RECONSTRUCCIÓN POR RANGO ---
+
+def reconstruir_resumen(desde=None, hasta=None, dias_por_lote=31):
+    """Reconstruye el resumen en tramos de fechas para no cargar todo el historial a la vez."""
+    registros = RegistroDiario.objects.all()
+    if desde is None or hasta is None:
+        limites = registros.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+        if limites['primera'] is None:
+            return 0
+        desde = desde or limites['primera']
+        hasta = hasta or limites['ultima']
+
+    # El resumen de los meses archivados ya no se puede rehacer: se conserva
+    archivados = Q()
+    for sucursal_id, mes in ArchivoMes.objects.filter(mes__lte=hasta).values_list('sucursal_id', 'mes'):
+        siguiente = (mes + datetime.timedelta(days=32)).replace(day=1)
+        archivados |= Q(sucursal_id=sucursal_id, fecha__gte=mes, fecha__lt=siguiente)
+    resumenes = ResumenDiario.objects.all()
+    if archivados:
+        registros, resumenes = registros.exclude(archivados), resumenes.exclude(archivados)
+
+    total = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + datetime.timedelta(days=dias_por_lote - 1), hasta)
+        filas = _filas_resumen(registros.filter(fecha__gte=inicio, fecha__lte=fin))
+        with transaction.atomic():
+            resumenes.filter(fecha__gte=inicio, fecha__lte=fin).delete()
+            ResumenDiario.objects.bulk_create(filas, batch_size=1000)
+        total += len(filas)
+        inicio = fin + datetime.timedelta(days=1)
+    return total
@@ -0,0 +1,88 @@
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Categoria, Producto, RegistroDiario, CajaDiaria, VentaSalteña, GastoExtra, ReporteCierre, Sucursal
+from .catalogo import invalidar_catalogo
+from .cierres import marcar_modificados
+from .precios import precio_en_fecha, registrar_precio
+from .resumen import actualizar_resumen
+from .stock import ajustar_saldo, desplazar_snapshots, movimiento_neto
+
+
+# --- 1. CIERRES MODIFICADOS (PDF guardado y marca de tiempo) ---
+
+@receiver([post_save, post_delete], sender=CajaDiaria)
+def invalidar_por_caja(sender, instance, **kwargs):
+    marcar_modificados(instance.sucursal_id, instance.fecha)
+
+@receiver([post_save, post_delete], sender=RegistroDiario)
+def invalidar_por_registro(sender, instance, **kwargs):
+    marcar_modificados(instance.sucursal_id, instance.fecha)
+
+@receiver([post_save, post_delete], sender=VentaSalteña)
+@receiver([post_save, post_delete], sender=GastoExtra)
+def invalidar_por_movimiento(sender, instance, **kwargs):
+    marcar_modificados(instance.sucursal_id, instance.fecha)
+
+@receiver(post_delete, sender=ReporteCierre)
+def borrar_archivo_reporte(sender, instance, **kwargs):
+    instance.archivo.delete(save=False)
+
+
+# --- 2. INVALIDACIÓN DEL CATÁLOGO CACHEADO ---
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_catalogo_por_cambio(sender, **kwargs):
+    invalidar_catalogo()
+
+@receiver(m2m_changed, sender=Producto.sucursal.through)
+def invalidar_catalogo_por_sucursales(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_catalogo()
+
+
+# --- 3. HISTORIAL DE PRECIOS (los registros guardan el precio del día; los reportes no cambian) ---
+
+@receiver(post_save, sender=Producto)
+def anotar_precio(sender, instance, **kwargs):
+    registrar_precio(instance)
+
+@receiver(pre_save, sender=RegistroDiario)
+def fijar_precio_registro(sender, instance, **kwargs):
+    if instance.precio_unitario is None:
+        instance.precio_unitario = precio_en_fecha(instance.producto_id, instance.fecha)
+
+
+# --- 4. SALDO DE STOCK Y RESUMEN DIARIO (ediciones sueltas; guardar_registro lo aplica en bloque) ---
+
+@receiver(pre_save, sender=RegistroDiario)
+def recordar_registro_anterior(sender, instance, **kwargs):
+    instance._anterior = RegistroDiario.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+@receiver(post_save, sender=RegistroDiario)
+def actualizar_saldo_por_registro(sender, instance, **kwargs):
+    anterior = getattr(instance, '_anterior', None)
+    if anterior:
+        ajustar_saldo(anterior.producto_id, anterior.sucursal_id, -movimiento_neto(anterior))
+        desplazar_snapshots(anterior.sucursal_id, anterior.fecha, {anterior.producto_id: -movimiento_neto(anterior)})
+        if (anterior.sucursal_id, anterior.fecha) != (instance.sucursal_id, instance.fecha):
+            actualizar_resumen(anterior.sucursal_id, anterior.fecha)
+    ajustar_saldo(instance.producto_id, instance.sucursal_id, movimiento_neto(instance))
+    desplazar_snapshots(instance.sucursal_id, instance.fecha, {instance.producto_id: movimiento_neto(instance)})
+    actualizar_resumen(instance.sucursal_id, instance.fecha)
+
+def _borrado_en_cascada(origin):
+    """El registro se borra junto con su producto, su categoría o su sucursal: sus saldos,
+    fotos y resúmenes ya se borraron en la misma operación y no se recrean."""
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return modelo in (Categoria, Producto, Sucursal)
+
+@receiver(post_delete, sender=RegistroDiario)
+def descontar_saldo_por_registro(sender, instance, origin=None, **kwargs):
+    if _borrado_en_cascada(origin):
+        return
+    ajustar_saldo(instance.producto_id, instance.sucursal_id, -movimiento_neto(instance))
+    desplazar_snapshots(instance.sucursal_id, instance.fecha, {instance.producto_id: -movimiento_neto(instance)})
+    actualizar_resumen(instance.sucursal_id, instance.fecha)
@@ -0,0 +1,32 @@
+// Avisos de la planilla con el modal de Bootstrap: avisar(titulo, texto, tipo).
+(function () {
+    const ICONOS = {
+        success: 'bi-check-circle-fill text-success',
+        info: 'bi-info-circle-fill text-primary',
+        warning: 'bi-exclamation-triangle-fill text-warning',
+        error: 'bi-x-circle-fill text-danger',
+    };
+    let aviso = null;
+
+    function crear() {
+        const div = document.createElement('div');
+        div.className = 'modal fade';
+        div.tabIndex = -1;
+        div.innerHTML = `<div class="modal-dialog modal-dialog-centered"><div class="modal-content text-center p-4" style="border-radius: 22px;">
+            <i class="bi aviso-icono" style="font-size: 3.5rem;"></i>
+            <h4 class="fw-bold mt-2 aviso-titulo"></h4>
+            <p class="text-muted aviso-texto"></p>
+            <button type="button" class="btn fw-bold text-white px-5 mx-auto" style="background: #FF8C00; border-radius: 12px;" data-bs-dismiss="modal">OK</button>
+        </div></div>`;
+        document.body.appendChild(div);
+        return { div: div, modal: new bootstrap.Modal(div) };
+    }
+
+    window.avisar = function (titulo, texto, tipo) {
+        aviso = aviso || crear();
+        aviso.div.querySelector('.aviso-icono').className = 'bi aviso-icono ' + (ICONOS[tipo] || ICONOS.info);
+        aviso.div.querySelector('.aviso-titulo').textContent = titulo;
+        aviso.div.querySelector('.aviso-texto').textContent = texto;
+        aviso.modal.show();
+    };
+})();
@@ -0,0 +1,182 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import ArchivoMes, RegistroDiario, SaldoStock, SnapshotStock, Sucursal
+
+# Cada cuántos días se guarda una foto del saldo de cada sucursal
+SNAPSHOT_CADA_DIAS = 7
+
+# Movimiento neto de un registro diario, como expresión SQL
+MOVIMIENTO_NETO = F('produccion') + F('entrada') - F('baja') - F('traspaso') - F('salida')
+
+
+def movimiento_neto(reg):
+    return reg.produccion + reg.entrada - reg.baja - reg.traspaso - reg.salida
+
+
+# --- 1. SALDO ACTUAL ---
+
+def aplicar_movimientos(registros):
+    """Suma al saldo de cada producto los movimientos del cierre (dentro de su transacción)."""
+    hoy = timezone.localdate()
+    cambios = defaultdict(int)
+    # Un cierre de días anteriores (encolado sin conexión) también mueve las fotos posteriores
+    atrasados = defaultdict(lambda: defaultdict(int))
+    for r in registros:
+        cambios[(r.producto_id, r.sucursal_id)] += movimiento_neto(r)
+        if r.fecha < hoy:
+            atrasados[(r.sucursal_id, r.fecha)][r.producto_id] += movimiento_neto(r)
+    sucursales = sorted({sucursal_id for _, sucursal_id in cambios})
+
+    # Bloquear las sucursales (siempre en orden de id) serializa los cierres
+    # simultáneos de un mismo local sin riesgo de interbloqueo con los traspasos
+    list(Sucursal.objects.select_for_update().filter(id__in=sucursales).order_by('id').values_list('id'))
+
+    ahora = timezone.now()
+    saldos = {
+        (s.producto_id, s.sucursal_id): s
+        for s in SaldoStock.objects.filter(sucursal_id__in=sucursales, producto_id__in={p for p, _ in cambios})
+    }
+    actualizados, nuevos = [], []
+    for (producto_id, sucursal_id), cantidad in cambios.items():
+        saldo = saldos.get((producto_id, sucursal_id))
+        if saldo:
+            saldo.cantidad += cantidad
+            saldo.actualizado = ahora
+            actualizados.append(saldo)
+        else:
+            nuevos.append(SaldoStock(producto_id=producto_id, sucursal_id=sucursal_id, cantidad=cantidad, actualizado=ahora))
+    SaldoStock.objects.bulk_update(actualizados, ['cantidad', 'actualizado'])
+    SaldoStock.objects.bulk_create(nuevos)
+    for (sucursal_id, fecha), por_producto in atrasados.items():
+        desplazar_snapshots(sucursal_id, fecha, por_producto)
+
+    # Foto periódica para que las consultas por fecha recorran una cola acotada
+    recientes = set(SnapshotStock.objects.filter(
+        sucursal_id__in=sucursales, fecha__gt=hoy - datetime.timedelta(days=SNAPSHOT_CADA_DIAS)
+    ).values_list('sucursal_id', flat=True).distinct())
+    for sucursal_id in sucursales:
+        if sucursal_id not in recientes:
+            tomar_snapshot(sucursal_id, hoy - datetime.timedelta(days=1))
+
+def ajustar_saldo(producto_id, sucursal_id, cantidad):
+    """Ajuste puntual del saldo (ediciones sueltas de un registro)."""
+    if not cantidad:
+        return
+    actualizados = SaldoStock.objects.filter(producto_id=producto_id, sucursal_id=sucursal_id).update(
+        cantidad=F('cantidad') + cantidad, actualizado=timezone.now()
+    )
+    if not actualizados:
+        SaldoStock.objects.create(producto_id=producto_id, sucursal_id=sucursal_id, cantidad=cantidad)
+
+def stock_actual(sucursal_id):
+    """Saldo actual por producto: una sola lectura de la tabla de saldos."""
+    return dict(SaldoStock.objects.filter(sucursal_id=sucursal_id).values_list('producto_id', 'cantidad'))
+
+
+# --- 2. SALDO A UNA FECHA ---
+
+def saldo_en_fecha(sucursal_id, fecha):
+    """Saldo por producto al final de 'fecha': última foto más los movimientos posteriores."""
+    ultima = SnapshotStock.objects.filter(sucursal_id=sucursal_id, fecha__lte=fecha).aggregate(f=Max('fecha'))['f']
+
+    saldos = defaultdict(int)
+    movimientos = RegistroDiario.objects.filter(sucursal_id=sucursal_id, fecha__lte=fecha)
+    if ultima:
+        saldos.update(SnapshotStock.objects.filter(sucursal_id=sucursal_id, fecha=ultima).values_list('producto_id', 'cantidad'))
+        movimientos = movimientos.filter(fecha__gt=ultima)
+
+    for producto_id, neto in movimientos.values('producto_id').annotate(neto=Sum(MOVIMIENTO_NETO)).values_list('producto_id', 'neto'):
+        saldos[producto_id] += neto
+
+    # Un día dentro de un mes archivado: la foto de fin de mes queda después,
+    # así que los movimientos desde la última foto se leen del archivo
+    if fecha < timezone.localdate().replace(day=1):
+        archivo = ArchivoMes.objects.filter(sucursal_id=sucursal_id, mes=fecha.replace(day=1)).first()
+        desde, hasta = (ultima.isoformat() if ultima else ''), fecha.isoformat()
+        for r in archivo.contenido()['registros'] if archivo else ():
+            if desde < r['fecha'] <= hasta:
+                saldos[r['producto_id']] += r['produccion'] + r['entrada'] - r['baja'] - r['traspaso'] - r['salida']
+    return dict(saldos)
+
+def tomar_snapshot(sucursal_id, fecha):
+    """Guarda (o reemplaza) la foto del saldo de la sucursal al final de 'fecha'."""
+    fotos = [
+        SnapshotStock(producto_id=producto_id, sucursal_id=sucursal_id, fecha=fecha, cantidad=cantidad)
+        for producto_id, cantidad in saldo_en_fecha(sucursal_id, fecha).items()
+    ]
+    SnapshotStock.objects.filter(sucursal_id=sucursal_id, fecha=fecha).delete()
+    SnapshotStock.objects.bulk_create(fotos)
+    return len(fotos)
+
+def desplazar_snapshots(sucursal_id, desde, cambios):
+    """Un movimiento de 'desde' editado o cargado tarde ({producto_id: cantidad}):
+    se suma a las fotos posteriores en lugar de descartarlas."""
+    cambios = {producto_id: cantidad for producto_id, cantidad in cambios.items() if cantidad}
+    fotos = SnapshotStock.objects.filter(sucursal_id=sucursal_id, fecha__gte=desde)
+    fechas = set(fotos.values_list('fecha', flat=True).distinct()) if cambios else None
+    if not fechas:
+        return
+    existentes = set(fotos.filter(producto_id__in=cambios).values_list('fecha', 'producto_id'))
+    for producto_id, cantidad in cambios.items():
+        fotos.filter(producto_id=producto_id).update(cantidad=F('cantidad') + cantidad)
+    # Un producto sin fila en la foto tenía saldo 0 en esa fecha
+    SnapshotStock.objects.bulk_create([
+        SnapshotStock(producto_id=producto_id, sucursal_id=sucursal_id, fecha=fecha, cantidad=cantidad)
+        for fecha in fechas for producto_id, cantidad in cambios.items() if (fecha, producto_id) not in existentes
+    ])
+
+
+# --- 3. RECONSTRUCCIÓN COMPLETA ---
+
+def recalcular_sucursal(sucursal_id):
+    """Reconstruye saldo y fotos semanales de la sucursal a partir de todo el historial."""
+    with transaction.atomic():
+        list(Sucursal.objects.select_for_update().filter(id=sucursal_id).values_list('id'))
+        fotos = SnapshotStock.objects.filter(sucursal_id=sucursal_id)
+        registros = RegistroDiario.objects.filter(sucursal_id=sucursal_id)
+        saldos = defaultdict(int)
+
+        # Los meses archivados ya no tienen registros: se parte de la foto al final del último
+        ultimo_mes = ArchivoMes.objects.filter(sucursal_id=sucursal_id).aggregate(m=Max('mes'))['m']
+        if ultimo_mes:
+            corte = (ultimo_mes + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+            saldos.update(fotos.filter(fecha=corte).values_list('producto_id', 'cantidad'))
+            fotos = fotos.filter(fecha__gt=corte)
+            registros = registros.filter(fecha__gt=corte)
+
+        fotos.delete()
+        SaldoStock.objects.filter(sucursal_id=sucursal_id).delete()
+        movimientos = list(registros.values('fecha', 'producto_id').annotate(neto=Sum(MOVIMIENTO_NETO))
+                           .values_list('fecha', 'producto_id', 'neto').order_by('fecha'))
+
+        # Una foto cada SNAPSHOT_CADA_DIAS días hacia atrás desde ayer, en una sola pasada
+        fechas = []
+        if movimientos:
+            fecha = timezone.localdate() - datetime.timedelta(days=1)
+            while fecha >= movimientos[0][0]:
+                fechas.append(fecha)
+                fecha -= datetime.timedelta(days=SNAPSHOT_CADA_DIAS)
+        nuevas = []
+        i = 0
+        for fecha in reversed(fechas):
+            while i < len(movimientos) and movimientos[i][0] <= fecha:
+                saldos[movimientos[i][1]] += movimientos[i][2]
+                i += 1
+            nuevas.extend(
+                SnapshotStock(producto_id=producto_id, sucursal_id=sucursal_id, fecha=fecha, cantidad=cantidad)
+                for producto_id, cantidad in saldos.items()
+            )
+        for _, producto_id, neto in movimientos[i:]:
+            saldos[producto_id] += neto
+        SnapshotStock.objects.bulk_create(nuevas, batch_size=1000)
+
+        ahora = timezone.now()
+        SaldoStock.objects.bulk_create([
+            SaldoStock(producto_id=producto_id, sucursal_id=sucursal_id, cantidad=cantidad, actualizado=ahora)
+            for producto_id, cantidad in saldos.items()
+        ])
@@ -0,0 +1,48 @@
+// Service worker de la planilla: permite abrirla y llenarla sin conexión.
+// v3: descarta copias de la página de login guardadas por versiones anteriores
+const CACHE = 'cardelfi-planilla-v3';
+
+// Solo se guardan respuestas correctas del propio sitio: una sesión vencida
+// redirige al login y un 500 tampoco debe reemplazar a la planilla guardada
+function guardable(resp) {
+    return resp.ok && !resp.redirected && resp.type === 'basic';
+}
+
+function guardar(req, resp) {
+    if (guardable(resp)) {
+        const copia = resp.clone();
+        caches.open(CACHE).then(cache => cache.put(req, copia));
+    }
+    return resp;
+}
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(claves => Promise.all(claves.filter(c => c !== CACHE).map(c => caches.delete(c))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const req = event.request;
+    if (req.method !== 'GET') return;
+    const url = new URL(req.url);
+
+    // Planilla (con su catálogo): red primero, copia guardada si no hay señal
+    if (url.origin === self.location.origin && url.pathname === "{% url 'lista_productos' %}") {
+        event.respondWith(
+            fetch(req).then(resp => guardar(req, resp)).catch(() => caches.match(req))
+        );
+        return;
+    }
+
+    // Estilos, scripts y fuentes: caché primero
+    if (['style', 'script', 'font'].includes(req.destination)) {
+        event.respondWith(
+            caches.match(req).then(guardada => guardada || fetch(req).then(resp => guardar(req, resp)))
+        );
+    }
+});
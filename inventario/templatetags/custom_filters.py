@@ -6,4 +6,9 @@ def multiply(value, arg):
     try:
         return float(value) * float(arg)
     except (ValueError, TypeError):
-        return 0
\ No newline at end of file
+        return 0
+
+
+@register.filter
+def get_item(diccionario, clave):
+    return diccionario.get(clave) if diccionario else None
@@ -1,3 +1,1107 @@
-from django.test import TestCase
+import csv
+import datetime
+import hashlib
+import io
+import json
+import math
+import statistics
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+
+from . import render_pdf, reportes
+from .admin import ArchivoMesAdmin
+from .archivo import archivar, limite_archivo, meses_pendientes, restaurar_mes
+from .catalogo import catalogo_sucursal, datos_categoria
+from .conciliacion import MONTO_MINIMO, UMBRAL_Z, VENTANA_DIAS, detectar_anomalias
+from .consolidado import reporte_consolidado
+from .exportar import TABLAS_EXPORTABLES, lineas_csv
+from .importar import importar_catalogo, importar_historial
+from .management.commands.benchmark import LIMITES_CONSULTAS
+from .models import (
+    ArchivoMes, CajaDiaria, Categoria, GastoExtra, PrecioProducto, Producto, RegistroDiario, ReporteCierre, ResumenDiario,
+    SaldoStock, SnapshotStock, Sucursal, VentaSalteña
+)
+from .precios import HistorialPrecios
+from .pronostico import DECAIMIENTO, FACTOR_SEGURIDAD, calcular_pronosticos
+from .reportes import contexto_cierre, obtener_reporte, reportes_en_lote
+from .resumen import reconstruir_resumen
+from .stock import MOVIMIENTO_NETO, saldo_en_fecha, stock_actual
+
+# Caché en memoria y estáticos sin manifiesto: las pruebas no dependen de collectstatic
+CONFIGURACION_PRUEBAS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+
+
+def saldos_sumados(sucursal_id, fecha):
+    """Saldo al final de 'fecha' sumando todos los registros, sin fotos ni saldos guardados."""
+    filas = (RegistroDiario.objects.filter(sucursal_id=sucursal_id, fecha__lte=fecha)
+             .values('producto_id').annotate(total=Sum(MOVIMIENTO_NETO)).order_by())
+    return {f['producto_id']: f['total'] for f in filas if f['total']}
+
+def sin_ceros(saldos):
+    return {producto_id: cantidad for producto_id, cantidad in saldos.items() if cantidad}
+
+
+@override_settings(**CONFIGURACION_PRUEBAS)
+class ConDatosSinteticos(TestCase):
+    """Dos sucursales con DIAS días de cierres generados y un usuario con sesión iniciada."""
+    DIAS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generar_datos_sinteticos', sucursales=2, dias=cls.DIAS, stdout=io.StringIO())
+        cls.usuario = User.objects.create_user('prueba', password='prueba')
+        cls.sucursal, cls.otra = Sucursal.objects.order_by('id')[:2]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def planilla(self, sucursal=None, salida='12', **extra):
+        """Formulario de cierre con la misma venta, entrada y baja en cada producto."""
+        sucursal = sucursal or self.sucursal
+        datos = {
+            'sucursal_id': sucursal.id,
+            'caja_efectivo': '500', 'caja_qr': '120', 'caja_tarjeta': '0',
+            'personal_turno': ['Ana', 'Luis'],
+            'gasto_desc[]': ['Pasajes'], 'gasto_monto[]': ['10'],
+        }
+        for p in catalogo_sucursal(sucursal.id):
+            datos[f's_{p.id}'] = salida
+            datos[f'e_{p.id}'] = '3'
+            datos[f'b_{p.id}'] = '1'
+        datos.update(extra)
+        return datos
+
+
+# --- 1. CONSULTAS POR VISTA (no crecen con el historial ni con el catálogo) ---
+
+class ConsultasTests(ConDatosSinteticos):
+
+    def test_guardar_registro(self):
+        datos = self.planilla()
+        with self.assertNumQueries(21):
+            respuesta = self.client.post(reverse('guardar_registro'), datos)
+        self.assertEqual(respuesta.json()['status'], 'success')
+
+    def test_guardar_registro_no_depende_del_catalogo(self):
+        Producto.objects.filter(categoria__grupo=Categoria.Grupo.SALTENA).first().sucursal.remove(self.otra)
+        completa, reducida = self.planilla(), self.planilla(self.otra)
+        self.assertLess(len(reducida), len(completa))
+        with self.assertNumQueries(21):
+            self.client.post(reverse('guardar_registro'), completa)
+        with self.assertNumQueries(21):
+            self.client.post(reverse('guardar_registro'), reducida)
+
+    def test_api_cierres(self):
+        with self.assertNumQueries(5):
+            respuesta = self.client.get(reverse('api_cierres'), {'sucursal_id': self.sucursal.id, 'limite': 20})
+        datos = respuesta.json()
+        self.assertEqual(len(datos['resultados']), 20)
+        # La página siguiente cuesta lo mismo
+        with self.assertNumQueries(5):
+            self.client.get(reverse('api_cierres'), {'sucursal_id': self.sucursal.id, 'cursor': datos['siguiente']})
+
+    def test_api_cierre(self):
+        cierre = CajaDiaria.objects.filter(sucursal=self.sucursal).latest('fecha')
+        with self.assertNumQueries(5):
+            respuesta = self.client.get(reverse('api_cierre', args=[cierre.id]))
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_historial_ventas(self):
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(reverse('historial_ventas'), {'sucursal_id': self.sucursal.id})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_id_invalido_da_404(self):
+        self.assertEqual(self.client.get(reverse('ver_stock'), {'sucursal_id': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.post(reverse('confirmar_traspaso'), {'traspaso_id': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.post(reverse('guardar_registro'), {'sucursal_id': 'abc'}).status_code, 404)
+
+
+# --- 2. REINTENTOS IDEMPOTENTES ---
+
+class IdempotenciaTests(ConDatosSinteticos):
+
+    def guardar(self, datos, clave):
+        return self.client.post(reverse('guardar_registro'), datos, HTTP_IDEMPOTENCY_KEY=clave)
+
+    def test_misma_clave_y_datos_no_duplica(self):
+        antes = CajaDiaria.objects.count()
+        primera = self.guardar(self.planilla(), 'clave-1').json()
+        segunda = self.guardar(self.planilla(), 'clave-1').json()
+        self.assertFalse(primera['repetido'])
+        self.assertTrue(segunda['repetido'])
+        self.assertEqual(primera['caja_id'], segunda['caja_id'])
+        self.assertEqual(CajaDiaria.objects.count(), antes + 1)
+
+    def test_misma_clave_con_otros_datos_da_409(self):
+        self.guardar(self.planilla(), 'clave-2')
+        antes = CajaDiaria.objects.count()
+        respuesta = self.guardar(self.planilla(salida='7'), 'clave-2')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(CajaDiaria.objects.count(), antes)
+
+    def sincronizar(self, cierres):
+        return self.client.post(reverse('sincronizar_cierres'), json.dumps({'cierres': cierres}),
+                                content_type='application/json').json()['resultados']
+
+    def test_cola_sin_conexion(self):
+        ayer = timezone.localdate() - datetime.timedelta(days=1)
+        cierre = {
+            'clave': 'cola-1', 'sucursal_id': self.sucursal.id, 'fecha': ayer.isoformat(),
+            'campos': [[k, v] for k, valor in self.planilla().items() for v in (valor if isinstance(valor, list) else [str(valor)])],
+        }
+        invalido = {'clave': 'cola-2', 'sucursal_id': 'abc', 'campos': []}
+
+        ok, error = self.sincronizar([cierre, invalido])
+        self.assertEqual(ok['estado'], 'ok')
+        self.assertEqual(error['estado'], 'error')
+        caja = CajaDiaria.objects.get(id=ok['caja_id'])
+        # El cierre conserva su día de negocio
+        self.assertEqual(caja.fecha, ayer)
+        self.assertTrue(GastoExtra.objects.filter(sucursal=self.sucursal, fecha=ayer, descripcion='Pasajes').exists())
+
+        repetido, = self.sincronizar([cierre])
+        self.assertEqual(repetido['estado'], 'repetido')
+        self.assertEqual(repetido['caja_id'], caja.id)
+        self.assertEqual(CajaDiaria.objects.filter(clave_idempotencia='cola-1').count(), 1)
+
+
+    def test_service_worker_no_guarda_redirecciones(self):
+        respuesta = self.client.get(reverse('service_worker'))
+        self.assertEqual(respuesta['Cache-Control'], 'no-cache')
+        codigo = respuesta.content.decode()
+        self.assertIn(f'"{reverse("lista_productos")}"', codigo)
+        # Una sesión vencida (redirección al login) o un error no reemplazan la planilla guardada
+        self.assertIn("resp.ok && !resp.redirected && resp.type === 'basic'", codigo)
+        self.assertEqual(codigo.count('=> guardar(req, resp)'), 2)
+
+    def test_planilla_sin_recursos_externos(self):
+        # Todo lo que carga la planilla sale del propio sitio y queda en la caché del service worker
+        planilla = self.client.get(reverse('lista_productos'), {'sucursal_id': self.sucursal.id})
+        self.client.logout()
+        acceso = self.client.get(reverse('login'))
+        for respuesta in (planilla, acceso):
+            self.assertEqual(respuesta.status_code, 200)
+            html = respuesta.content.decode()
+            self.assertIn('inventario/vendor/inter/inter.css', html)
+            self.assertNotRegex(html, r'(src|href)="(https?:)?//')
+
+
+class PreciosTests(ConDatosSinteticos):
+
+    def test_cierre_atrasado_usa_el_precio_de_su_dia(self):
+        hoy = timezone.localdate()
+        ayer = hoy - datetime.timedelta(days=1)
+        p = catalogo_sucursal(self.sucursal.id)[0]
+        anterior = p.precio_unitario
+        PrecioProducto.objects.filter(producto=p).update(vigente_desde=hoy - datetime.timedelta(days=60))
+        p.precio_unitario = anterior + 5
+        p.save()
+
+        datos = {'sucursal_id': str(self.sucursal.id), f's_{p.id}': '4'}
+        resultado, = self.client.post(reverse('sincronizar_cierres'), json.dumps({'cierres': [{
+            'clave': 'atrasado', 'sucursal_id': self.sucursal.id, 'fecha': ayer.isoformat(),
+            'campos': [[k, v] for k, v in datos.items()],
+        }]}), content_type='application/json').json()['resultados']
+        self.assertEqual(resultado['estado'], 'ok')
+        self.client.post(reverse('guardar_registro'), datos)
+
+        for fecha, precio in ((ayer, anterior), (hoy, anterior + 5)):
+            registro = RegistroDiario.objects.filter(sucursal=self.sucursal, producto=p, fecha=fecha).latest('id')
+            self.assertEqual(registro.precio_unitario, precio)
+            venta = VentaSalteña.objects.filter(sucursal=self.sucursal, producto=p.nombre, fecha=fecha).latest('id')
+            self.assertEqual(venta.precio_unitario, precio)
+
+
+    def test_cambio_de_precio_no_altera_ventas_pasadas(self):
+        hoy = timezone.localdate()
+        cierre = CajaDiaria.objects.select_related('sucursal').get(sucursal=self.sucursal, fecha=hoy - datetime.timedelta(days=3))
+        antes = contexto_cierre(cierre)['total_ventas']
+        consolidado = reporte_consolidado(hoy - datetime.timedelta(days=30), hoy)['totales']
+
+        for p in Producto.objects.all():
+            p.precio_unitario += 2
+            p.save()
+        self.assertEqual(PrecioProducto.objects.filter(vigente_desde=hoy).count(), Producto.objects.count())
+        self.assertEqual(contexto_cierre(cierre)['total_ventas'], antes)
+        self.assertEqual(reporte_consolidado(hoy - datetime.timedelta(days=30), hoy)['totales'], consolidado)
+
+        # Guardar sin cambiar el precio no agrega otra fila
+        Producto.objects.first().save()
+        self.assertEqual(PrecioProducto.objects.filter(vigente_desde=hoy).count(), Producto.objects.count())
+
+    def test_historial_de_precios(self):
+        p = Producto.objects.first()
+        PrecioProducto.objects.filter(producto=p).delete()
+        for desde, precio in (('2026-01-01', '8'), ('2026-03-01', '9'), ('2026-06-01', '10')):
+            PrecioProducto.objects.create(producto=p, vigente_desde=desde, precio_unitario=precio)
+        historial = HistorialPrecios([p.id])
+        for fecha, precio in (('2025-12-31', '8'), ('2026-01-01', '8'), ('2026-02-28', '8'), ('2026-03-01', '9'),
+                              ('2026-05-31', '9'), ('2026-06-01', '10'), ('2027-01-01', '10')):
+            self.assertEqual(historial.precio(p.id, datetime.date.fromisoformat(fecha)), Decimal(precio), fecha)
+        # Un registro sin precio toma el de su fecha
+        registro = RegistroDiario.objects.create(producto=p, sucursal=self.sucursal, fecha=datetime.date(2026, 4, 2), salida=1)
+        self.assertEqual(registro.precio_unitario, Decimal('9'))
+
+
+# --- 3. SALDO DE STOCK Y RESUMEN DIARIO ---
+
+class StockResumenTests(ConDatosSinteticos):
+
+    def test_cierre_actualiza_saldo_y_resumen(self):
+        hoy = timezone.localdate()
+        antes = stock_actual(self.sucursal.id)
+        self.client.post(reverse('guardar_registro'), self.planilla(salida='5'))
+
+        despues = stock_actual(self.sucursal.id)
+        productos = catalogo_sucursal(self.sucursal.id)
+        for p in productos:
+            # +3 entrada -1 baja -5 salida
+            self.assertEqual(despues.get(p.id, 0), antes.get(p.id, 0) - 3)
+        self.assertEqual(sin_ceros(despues), saldos_sumados(self.sucursal.id, hoy))
+
+        resumen = ResumenDiario.objects.filter(sucursal=self.sucursal, fecha=hoy)
+        self.assertEqual(resumen.count(), len(productos))
+        self.assertEqual(resumen.aggregate(total=Sum('salida'))['total'], 5 * len(productos))
+        self.assertEqual(resumen.aggregate(total=Sum('ventas_bs'))['total'],
+                         sum(5 * p.precio_unitario for p in productos))
+
+    def test_edicion_desplaza_saldo_fotos_y_resumen(self):
+        hoy = timezone.localdate()
+        registro = RegistroDiario.objects.filter(
+            sucursal=self.sucursal, fecha=hoy - datetime.timedelta(days=20), salida__gt=0
+        ).first()
+        fotos = SnapshotStock.objects.filter(sucursal=self.sucursal, fecha__gt=registro.fecha)
+        self.assertTrue(fotos.exists())
+        saldo = SaldoStock.objects.get(sucursal=self.sucursal, producto=registro.producto).cantidad
+
+        registro.salida -= 4
+        registro.save()
+
+        self.assertEqual(SaldoStock.objects.get(sucursal=self.sucursal, producto=registro.producto).cantidad, saldo + 4)
+        for foto in fotos:
+            self.assertEqual(foto.cantidad, saldos_sumados(self.sucursal.id, foto.fecha).get(foto.producto_id, 0))
+        for dias in (25, 20, 10, 0):
+            fecha = hoy - datetime.timedelta(days=dias)
+            self.assertEqual(sin_ceros(saldo_en_fecha(self.sucursal.id, fecha)), saldos_sumados(self.sucursal.id, fecha))
+        resumen = ResumenDiario.objects.get(sucursal=self.sucursal, fecha=registro.fecha, producto=registro.producto)
+        self.assertEqual(resumen.salida, registro.salida)
+
+    def test_traspaso_llega_al_stock_destino(self):
+        hoy = timezone.localdate()
+        p = catalogo_sucursal(self.sucursal.id)[0]
+        origen, destino = stock_actual(self.sucursal.id).get(p.id, 0), stock_actual(self.otra.id).get(p.id, 0)
+        self.client.post(reverse('guardar_registro'), {
+            'sucursal_id': self.sucursal.id, f't_cant_{p.id}': '5', f't_suc_{p.id}': str(self.otra.id),
+        })
+
+        # La entrada en destino se guarda con el cierre de origen, sin esperar a nadie
+        self.assertEqual(stock_actual(self.sucursal.id).get(p.id, 0), origen - 5)
+        self.assertEqual(stock_actual(self.otra.id).get(p.id, 0), destino + 5)
+        self.assertEqual(sin_ceros(saldo_en_fecha(self.otra.id, hoy)), saldos_sumados(self.otra.id, hoy))
+        self.assertEqual(ResumenDiario.objects.get(sucursal=self.otra, fecha=hoy, producto=p).entrada, 5)
+
+        # La planilla destino lo muestra como pendiente y lo confirma
+        planilla = self.client.get(reverse('lista_productos'), {'sucursal_id': self.otra.id}).content.decode()
+        self.assertIn(reverse('ver_traspasos'), planilla)
+        self.assertIn(reverse('confirmar_traspaso'), planilla)
+        pendientes = self.client.get(reverse('ver_traspasos'), {'sucursal_id': self.otra.id}).json()['pendientes']
+        self.assertEqual([(t['producto'], t['cantidad']) for t in pendientes], [(p.nombre, 5)])
+        for _ in range(2):
+            self.client.post(reverse('confirmar_traspaso'), {'traspaso_id': pendientes[0]['id']})
+
+        recibidos = self.client.get(reverse('ver_traspasos'), {'sucursal_id': self.otra.id}).json()['recibidos']
+        self.assertEqual([t['id'] for t in recibidos], [pendientes[0]['id']])
+        # Confirmar no vuelve a sumar
+        self.assertEqual(stock_actual(self.otra.id).get(p.id, 0), destino + 5)
+        self.assertEqual(RegistroDiario.objects.filter(sucursal=self.otra, fecha=hoy, producto=p).count(), 1)
+
+
+    def test_borrar_producto_o_sucursal_no_deja_saldos(self):
+        producto = catalogo_sucursal(self.sucursal.id)[0]
+        otros = {p: c for p, c in stock_actual(self.sucursal.id).items() if p != producto.id}
+        producto.delete()
+        self.assertEqual(stock_actual(self.sucursal.id), otros)
+        self.assertFalse(SnapshotStock.objects.filter(producto_id=producto.id).exists())
+
+        self.otra.delete()
+        self.assertFalse(SaldoStock.objects.filter(sucursal_id=self.otra.id).exists())
+        self.assertFalse(ResumenDiario.objects.filter(sucursal_id=self.otra.id).exists())
+        # Sin filas que apunten a lo borrado (en Postgres fallaría el commit)
+        connection.check_constraints()
+
+
+# --- 4. EXPORTACIÓN EN STREAMING ---
+
+class ExportacionTests(ConDatosSinteticos):
+
+    def test_csv_con_wsgi(self):
+        respuesta = self.client.get(reverse('exportar_csv'), {'tabla': 'gastos'})
+        self.assertTrue(respuesta.streaming)
+        self.assertFalse(respuesta.is_async)
+        self.assertEqual(b''.join(respuesta.streaming_content).decode(), ''.join(lineas_csv('gastos')))
+
+    def test_csv_filtrado(self):
+        hoy = timezone.localdate()
+        desde, hasta = hoy - datetime.timedelta(days=10), hoy - datetime.timedelta(days=3)
+        respuesta = self.client.get(reverse('exportar_csv'), {
+            'tabla': 'registros', 'desde': desde.isoformat(), 'hasta': hasta.isoformat(), 'sucursal_id': self.otra.id,
+        })
+        self.assertIn(f'registros_{desde}_{hasta}.csv', respuesta['Content-Disposition'])
+        contenido = b''.join(respuesta.streaming_content).decode()
+        # BOM para Excel
+        self.assertTrue(contenido.startswith('\ufeff'))
+        encabezado, *filas = csv.reader(io.StringIO(contenido[1:]))
+        self.assertEqual(encabezado, ['id', 'fecha', 'sucursal', 'producto', 'produccion', 'entrada', 'baja', 'traspaso',
+                                      'traspaso_destino', 'salida', 'precio_unitario'])
+
+        registros = RegistroDiario.objects.filter(sucursal=self.otra, fecha__gte=desde, fecha__lte=hasta).order_by('fecha', 'id')
+        self.assertEqual([int(f[0]) for f in filas], [r.id for r in registros])
+        self.assertEqual({f[2] for f in filas}, {self.otra.nombre})
+        primero = registros.select_related('producto').first()
+        self.assertEqual(filas[0][3], primero.producto.nombre)
+        self.assertEqual(Decimal(filas[0][10]), primero.precio_unitario)
+
+    def test_tabla_desconocida(self):
+        self.assertEqual(self.client.get(reverse('exportar_csv'), {'tabla': 'auth_user'}).status_code, 400)
+
+    def test_comando_exporta_todas_las_tablas(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            call_command('exportar_datos', salida=carpeta, stdout=io.StringIO())
+            for tabla in TABLAS_EXPORTABLES:
+                with open(f'{carpeta}/{tabla}_inicio_hoy.csv', encoding='utf-8', newline='') as archivo:
+                    self.assertEqual(archivo.read(), ''.join(lineas_csv(tabla)))
+
+    @override_settings(ASGI=True)
+    async def test_csv_con_asgi_sale_por_bloques(self):
+        await self.async_client.aforce_login(self.usuario)
+        with mock.patch('inventario.exportar.LINEAS_POR_BLOQUE', 100):
+            respuesta = await self.async_client.get(reverse('exportar_csv'), {'tabla': 'registros'})
+            # Con un iterador síncrono Django juntaría todo el archivo antes de enviarlo
+            self.assertTrue(respuesta.is_async)
+            bloques = [bloque async for bloque in respuesta.streaming_content]
+        esperado = await sync_to_async(lambda: ''.join(lineas_csv('registros')))()
+        self.assertEqual(len(bloques), math.ceil(len(esperado.splitlines()) / 100))
+        self.assertEqual(b''.join(bloques).decode(), esperado)
+
+
+# --- 5. ARCHIVO DE MESES ANTIGUOS ---
+
+class ArchivoTests(ConDatosSinteticos):
+    # Más de dos meses: siempre queda al menos uno completo antes del horizonte
+    DIAS = 75
+
+    def filas(self, modelo):
+        return sorted(modelo.objects.values_list())
+
+    def test_archivar_y_restaurar(self):
+        limite = limite_archivo(meses=1)
+        pendientes = meses_pendientes(limite)
+        self.assertTrue(pendientes)
+
+        tablas = {modelo: self.filas(modelo) for modelo in (RegistroDiario, VentaSalteña, GastoExtra)}
+        csv = {tabla: ''.join(lineas_csv(tabla)) for tabla in ('registros', 'ventas', 'gastos')}
+        fechas = [limite - datetime.timedelta(days=d) for d in (1, 15)]
+        saldos = {(s.id, f): saldo_en_fecha(s.id, f) for s in (self.sucursal, self.otra) for f in fechas}
+        actuales = {s.id: stock_actual(s.id) for s in (self.sucursal, self.otra)}
+        resumen = sorted(ResumenDiario.objects.values_list('sucursal_id', 'fecha', 'producto_id', 'salida'))
+        recientes = sorted(RegistroDiario.objects.filter(fecha__gte=limite).values_list())
+
+        archivar(limite)
+        self.assertEqual(ArchivoMes.objects.count(), len(pendientes))
+        self.assertFalse(RegistroDiario.objects.filter(fecha__lt=limite).exists())
+        self.assertEqual(self.filas(RegistroDiario), recientes)
+        # El borrado no pasa por las señales: el saldo y el resumen no cambian
+        self.assertEqual({s: stock_actual(s) for s in actuales}, actuales)
+        self.assertEqual(sorted(ResumenDiario.objects.values_list('sucursal_id', 'fecha', 'producto_id', 'salida')), resumen)
+        for (sucursal_id, fecha), saldo in saldos.items():
+            self.assertEqual(saldo_en_fecha(sucursal_id, fecha), saldo)
+        # Las exportaciones siguen incluyendo los meses archivados
+        for tabla, contenido in csv.items():
+            self.assertEqual(''.join(lineas_csv(tabla)), contenido)
+
+        for sucursal_id, mes in pendientes:
+            restaurar_mes(sucursal_id, mes)
+        self.assertFalse(ArchivoMes.objects.exists())
+        for modelo, filas in tablas.items():
+            self.assertEqual(self.filas(modelo), filas)
+
+
+    def test_admin_no_borra_archivos(self):
+        archivar(limite_archivo(meses=1))
+        request = RequestFactory().get('/admin/')
+        request.user = User.objects.create_superuser('admin', password='admin')
+        modelo_admin = ArchivoMesAdmin(ArchivoMes, admin.site)
+        for permiso in (modelo_admin.has_add_permission(request), modelo_admin.has_change_permission(request),
+                        modelo_admin.has_delete_permission(request, ArchivoMes.objects.first())):
+            self.assertFalse(permiso)
+
+
+# --- 6. CONCILIACIÓN Y PRONÓSTICO ---
+
+@override_settings(**CONFIGURACION_PRUEBAS)
+class MatematicaTests(TestCase):
+    VENTAS_DIA = Decimal('1000')
+    # Diferencias de caja de los días normales (Bs)
+    RUIDO = [0, 5, -5, 3, -3, 2, -2]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sucursal = Sucursal.objects.create(nombre='PRUEBA')
+        cls.categoria = Categoria.objects.create(nombre='SALTEÑAS', orden=1, grupo=Categoria.Grupo.SALTENA)
+        cls.producto = Producto.objects.create(nombre='CARNE', categoria=cls.categoria, precio_unitario=Decimal('10'))
+
+    def dia(self, fecha, caja=None, salida=0, personal='Ana'):
+        """Un día cerrado: 'salida' unidades vendidas y la caja dada (por defecto, cuadrada)."""
+        ventas = salida * self.producto.precio_unitario
+        ResumenDiario.objects.create(sucursal=self.sucursal, fecha=fecha, producto=self.producto,
+                                     categoria=self.categoria, salida=salida, ventas_bs=ventas)
+        CajaDiaria.objects.create(sucursal=self.sucursal, fecha=fecha, personal_turno=personal,
+                                  efectivo=ventas if caja is None else caja)
+
+    def test_anomalias(self):
+        inicio = datetime.date(2026, 3, 1)
+        diferencias = [self.RUIDO[i % len(self.RUIDO)] for i in range(40)]
+        atipico, racha = 35, (37, 38, 39)
+        diferencias[atipico] = -400
+        for i in racha:
+            diferencias[i] = -30
+        for i, diferencia in enumerate(diferencias):
+            self.dia(inicio + datetime.timedelta(days=i), self.VENTAS_DIA + diferencia, salida=100,
+                     personal='Luis' if i in racha else 'Ana')
+
+        desde = inicio + datetime.timedelta(days=VENTANA_DIAS + 1)
+        resultado = detectar_anomalias(desde, inicio + datetime.timedelta(days=39))
+        dias = {d['fecha']: d for d in resultado['dias']}
+
+        # z contra los cierres de los 28 días anteriores (desvío muestral)
+        previos = diferencias[atipico - VENTANA_DIAS:atipico]
+        z = (-400 - statistics.mean(previos)) / statistics.stdev(previos)
+        dia_atipico = dias[inicio + datetime.timedelta(days=atipico)]
+        self.assertAlmostEqual(dia_atipico['z'], round(z, 2))
+        self.assertLessEqual(dia_atipico['z'], -UMBRAL_Z)
+        self.assertEqual(dia_atipico['diferencia'], -400)
+
+        # El tercer faltante seguido (>= MONTO_MINIMO) se marca aunque su z sea moderado
+        self.assertGreaterEqual(30, MONTO_MINIMO)
+        tercero = dias[inicio + datetime.timedelta(days=racha[-1])]
+        self.assertEqual(tercero['racha'], 3)
+        self.assertIn('3 faltantes seguidos', tercero['motivos'])
+        # Ningún día normal aparece
+        normales = [inicio + datetime.timedelta(days=i) for i, d in enumerate(diferencias) if abs(d) <= 5]
+        self.assertFalse(set(normales) & set(dias))
+
+        por_sucursal, = resultado['por_sucursal']
+        self.assertEqual(por_sucursal['cierres'], 40 - VENTANA_DIAS - 1)
+        self.assertEqual(por_sucursal['faltantes'], 4)
+
+    def test_pronostico(self):
+        hoy = datetime.date(2026, 6, 1)
+        self.assertEqual(hoy.weekday(), 0)
+        # Lunes: ocho semanas alternando 10 y 20 unidades; martes: solo dos cierres
+        lunes = {hoy - datetime.timedelta(weeks=k): 10 if k % 2 else 20 for k in range(1, 9)}
+        for fecha, salida in lunes.items():
+            self.dia(fecha, salida=salida)
+        for k in (1, 2):
+            self.dia(hoy - datetime.timedelta(weeks=k) + datetime.timedelta(days=1), salida=50)
+
+        semana = calcular_pronosticos(hoy)[self.sucursal.id][self.producto.id]
+
+        pesos = {fecha: DECAIMIENTO ** ((hoy - fecha).days // 7) for fecha in lunes}
+        total = sum(pesos.values())
+        media = sum(pesos[f] * s for f, s in lunes.items()) / total
+        desvio = math.sqrt(sum(pesos[f] * s * s for f, s in lunes.items()) / total - media ** 2)
+        self.assertEqual(semana[0]['unidades'], math.ceil(media + FACTOR_SEGURIDAD * desvio))
+        self.assertEqual(semana[0]['sobrante'], 0)
+        # Menos de MIN_DIAS cierres de ese día de la semana: sin sugerencia
+        self.assertIsNone(semana[1])
+        self.assertIsNone(semana[2])
+
+
+# --- 7. PDF DE CIERRES GUARDADOS ---
+
+@mock.patch('inventario.reportes.html_a_pdf', return_value=b'%PDF-1.4 prueba')
+class ReportesTests(ConDatosSinteticos):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.cierre = CajaDiaria.objects.select_related('sucursal').filter(sucursal=self.sucursal).latest('fecha')
+
+    def test_pdf_se_genera_una_vez(self, html_a_pdf):
+        reporte = obtener_reporte(self.cierre)
+        self.assertEqual(reporte.hash_contenido, hashlib.sha256(b'%PDF-1.4 prueba').hexdigest())
+        self.assertEqual(obtener_reporte(self.cierre).id, reporte.id)
+        html_a_pdf.assert_called_once()
+
+        # La descarga sirve el archivo guardado sin volver a renderizar
+        respuesta = self.client.get(reverse('generar_pdf_estilo_cuaderno'), {'caja_id': self.cierre.id})
+        self.assertEqual(respuesta['ETag'], f'"{reporte.hash_contenido}"')
+        self.assertEqual(b''.join(respuesta.streaming_content), b'%PDF-1.4 prueba')
+        respuesta.close()
+        html_a_pdf.assert_called_once()
+
+    def test_cambio_del_dia_invalida_el_pdf(self, html_a_pdf):
+        archivo = obtener_reporte(self.cierre).archivo
+        self.assertTrue(archivo.storage.exists(archivo.name))
+
+        gasto = GastoExtra.objects.filter(sucursal=self.sucursal, fecha=self.cierre.fecha).first()
+        gasto.monto += 1
+        gasto.save()
+        self.assertFalse(ReporteCierre.objects.filter(caja=self.cierre).exists())
+        self.assertFalse(archivo.storage.exists(archivo.name))
+
+        obtener_reporte(self.cierre)
+        self.assertEqual(html_a_pdf.call_count, 2)
+
+
+# --- 8. FECHA DE NEGOCIO E ÍNDICES POR (SUCURSAL, FECHA) ---
+
+class FechaNegocioTests(ConDatosSinteticos):
+
+    def test_cierre_nocturno_queda_en_su_dia(self):
+        dia = timezone.localdate() + datetime.timedelta(days=10)
+        # 23:00 en La Paz ya es el día siguiente en UTC
+        instante = datetime.datetime.combine(dia + datetime.timedelta(days=1), datetime.time(3), datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=instante):
+            caja_id = self.client.post(reverse('guardar_registro'), self.planilla()).json()['caja_id']
+
+        cierre = CajaDiaria.objects.select_related('sucursal').get(id=caja_id)
+        self.assertEqual(cierre.fecha, dia)
+        productos = catalogo_sucursal(self.sucursal.id)
+        self.assertEqual(RegistroDiario.objects.filter(sucursal=self.sucursal, fecha=dia).count(), len(productos))
+        self.assertTrue(GastoExtra.objects.filter(sucursal=self.sucursal, fecha=dia).exists())
+
+        with CaptureQueriesContext(connection) as consultas:
+            contexto = contexto_cierre(cierre)
+        self.assertEqual(contexto['total_ventas'], sum(12 * p.precio_unitario for p in productos))
+        # Se filtra por la columna, sin convertir fecha_creacion a fecha
+        self.assertFalse([c['sql'] for c in consultas if 'fecha_creacion' in c['sql']])
+
+    def test_indices_por_sucursal_y_fecha(self):
+        for modelo in (RegistroDiario, CajaDiaria, VentaSalteña, GastoExtra):
+            with connection.cursor() as cursor:
+                restricciones = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+            indices = [r['columns'] for r in restricciones.values() if r['index']]
+            self.assertIn(['sucursal_id', 'fecha'], indices, modelo.__name__)
+
+
+# --- 9. HISTORIAL POR PÁGINAS (keyset por fecha e id) ---
+
+class HistorialTests(ConDatosSinteticos):
+
+    def paginas(self, **filtros):
+        """Ids de cada página siguiendo el enlace 'siguiente' hasta el final."""
+        paginas, consulta = [], filtros
+        while consulta is not None:
+            respuesta = self.client.get(reverse('historial_ventas'), consulta)
+            paginas.append([c.id for c in respuesta.context['cierres']])
+            siguiente = respuesta.context['siguiente']
+            consulta = QueryDict(siguiente) if siguiente else None
+        return paginas
+
+    @mock.patch('inventario.views.CIERRES_POR_PAGINA', 30)
+    def test_paginas_cubren_todos_los_cierres(self):
+        esperado = list(CajaDiaria.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        paginas = self.paginas()
+        self.assertEqual([len(p) for p in paginas[:-1]], [30] * (len(paginas) - 1))
+        self.assertEqual([i for p in paginas for i in p], esperado)
+
+        # Un cierre nuevo no mueve las páginas siguientes, como pasaría con OFFSET
+        cursor = QueryDict(self.client.get(reverse('historial_ventas')).context['siguiente'])
+        self.client.post(reverse('guardar_registro'), self.planilla())
+        self.assertEqual([c.id for c in self.client.get(reverse('historial_ventas'), cursor).context['cierres']],
+                         paginas[1])
+
+    @mock.patch('inventario.views.CIERRES_POR_PAGINA', 10)
+    def test_filtros_se_mantienen_entre_paginas(self):
+        hoy = timezone.localdate()
+        desde, hasta = hoy - datetime.timedelta(days=30), hoy - datetime.timedelta(days=5)
+        esperado = list(CajaDiaria.objects.filter(sucursal=self.otra, fecha__gte=desde, fecha__lte=hasta)
+                        .order_by('-fecha', '-id').values_list('id', flat=True))
+        paginas = self.paginas(sucursal_id=self.otra.id, desde=desde.isoformat(), hasta=hasta.isoformat())
+        self.assertGreater(len(paginas), 1)
+        self.assertEqual([i for p in paginas for i in p], esperado)
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        primera = [c.id for c in self.client.get(reverse('historial_ventas')).context['cierres']]
+        for cursor in ('basura', '2026-13-40_5', '2026-01-01_x'):
+            respuesta = self.client.get(reverse('historial_ventas'), {'cursor': cursor})
+            self.assertEqual([c.id for c in respuesta.context['cierres']], primera)
+
+# --- 10. CATÁLOGO CACHEADO POR SUCURSAL ---
+
+class CatalogoTests(ConDatosSinteticos):
+
+    def test_segunda_lectura_sin_consultas(self):
+        with self.assertNumQueries(1):
+            catalogo_sucursal(self.sucursal.id)
+        with self.assertNumQueries(0):
+            productos = catalogo_sucursal(self.sucursal.id)
+            # La categoría viene en la misma consulta
+            [p.categoria.nombre for p in productos]
+
+    def test_cambios_invalidan_el_catalogo(self):
+        producto = catalogo_sucursal(self.sucursal.id)[0]
+        producto.precio_unitario += 1
+        producto.save()
+        self.assertEqual(catalogo_sucursal(self.sucursal.id)[0].precio_unitario, producto.precio_unitario)
+
+        categoria = producto.categoria
+        categoria.nombre = 'RENOMBRADA'
+        categoria.save()
+        self.assertEqual(catalogo_sucursal(self.sucursal.id)[0].categoria.nombre, 'RENOMBRADA')
+
+        catalogo_sucursal(self.otra.id)
+        producto.sucursal.remove(self.otra)
+        self.assertNotIn(producto.id, [p.id for p in catalogo_sucursal(self.otra.id)])
+        self.assertIn(producto.id, [p.id for p in catalogo_sucursal(self.sucursal.id)])
+
+        producto.delete()
+        self.assertNotIn(producto.id, [p.id for p in catalogo_sucursal(self.sucursal.id)])
+
+
+# --- 11. RESUMEN DIARIO PRE-CALCULADO ---
+
+class ResumenTests(ConDatosSinteticos):
+
+    def resumen(self):
+        return sorted(ResumenDiario.objects.values_list(
+            'sucursal_id', 'fecha', 'producto_id', 'categoria_id', 'produccion', 'entrada', 'baja', 'traspaso', 'salida',
+            'ventas_bs'))
+
+    def sumado(self):
+        """El mismo resumen agrupando los registros en Python."""
+        filas = {}
+        for r in RegistroDiario.objects.select_related('producto'):
+            clave = (r.sucursal_id, r.fecha, r.producto_id, r.producto.categoria_id)
+            fila = filas.setdefault(clave, [0, 0, 0, 0, 0, Decimal('0')])
+            for i, valor in enumerate((r.produccion, r.entrada, r.baja, r.traspaso, r.salida, r.salida * r.precio_unitario)):
+                fila[i] += valor
+        return sorted(clave + tuple(fila) for clave, fila in filas.items())
+
+    def test_incremental_igual_a_reconstruir(self):
+        ayer = timezone.localdate() - datetime.timedelta(days=1)
+        p = catalogo_sucursal(self.sucursal.id)[0]
+        self.client.post(reverse('guardar_registro'), self.planilla(**{
+            f't_cant_{p.id}': '2', f't_suc_{p.id}': str(self.otra.id),
+        }))
+        registro = RegistroDiario.objects.filter(sucursal=self.otra, fecha=ayer, salida__gt=0).first()
+        registro.salida -= 1
+        registro.save()
+        RegistroDiario.objects.filter(sucursal=self.otra, fecha=ayer).exclude(id=registro.id).first().delete()
+
+        incremental = self.resumen()
+        self.assertEqual(incremental, self.sumado())
+        ResumenDiario.objects.all().delete()
+        # Por tramos de una semana (los bordes de los tramos no pierden ni repiten días)
+        reconstruir_resumen(dias_por_lote=7)
+        self.assertEqual(self.resumen(), incremental)
+
+    def test_reconstruir_un_rango(self):
+        hoy = timezone.localdate()
+        desde, hasta = hoy - datetime.timedelta(days=20), hoy - datetime.timedelta(days=10)
+        completo = self.resumen()
+        ResumenDiario.objects.filter(fecha__gte=desde - datetime.timedelta(days=2)).delete()
+
+        call_command('reconstruir_resumen', desde=desde.isoformat(), hasta=hasta.isoformat(), stdout=io.StringIO())
+        # Solo se rehace el rango pedido
+        self.assertEqual(self.resumen(), [f for f in completo if f[1] < desde - datetime.timedelta(days=2) or desde <= f[1] <= hasta])
+
+
+# --- 12. REPORTE CONSOLIDADO ---
+
+class ConsolidadoTests(ConDatosSinteticos):
+
+    def totales(self, desde, hasta, sucursales):
+        """Ventas, gastos y caja sumados fila por fila, sin el resumen diario."""
+        rango = {'fecha__gte': desde, 'fecha__lte': hasta, 'sucursal__in': sucursales}
+        return {
+            'ventas': sum(r.salida * r.precio_unitario for r in RegistroDiario.objects.filter(**rango)),
+            'unidades': sum(RegistroDiario.objects.filter(**rango).values_list('salida', flat=True)),
+            'gastos': sum(GastoExtra.objects.filter(**rango).values_list('monto', flat=True)),
+            'caja': sum(c.efectivo + c.qr + c.tarjetero for c in CajaDiaria.objects.filter(**rango)),
+        }
+
+    def test_totales_por_sucursal_y_rango(self):
+        hoy = timezone.localdate()
+        desde, hasta = hoy - datetime.timedelta(days=25), hoy - datetime.timedelta(days=5)
+        datos = reporte_consolidado(desde, hasta, [self.otra.id])
+        self.assertEqual([s.id for s in datos['sucursales']], [self.otra.id])
+
+        esperado = self.totales(desde, hasta, [self.otra])
+        esperado['diferencia'] = esperado['caja'] - (esperado['ventas'] - esperado['gastos'])
+        self.assertEqual(datos['totales'], esperado)
+        self.assertEqual(len(datos['por_dia']), 21)
+        self.assertEqual(sum(d['ventas'] for d in datos['por_dia']), esperado['ventas'])
+        self.assertEqual(sum(c['ventas'] for c in datos['por_categoria']), esperado['ventas'])
+
+        # Sin filtro entran todas las sucursales
+        todas = reporte_consolidado(desde, hasta)
+        self.assertEqual(todas['totales']['ventas'], self.totales(desde, hasta, [self.sucursal, self.otra])['ventas'])
+
+    def test_json_con_consultas_fijas(self):
+        hoy = timezone.localdate()
+        for dias in (5, 35):
+            with self.assertNumQueries(8):
+                respuesta = self.client.get(reverse('reporte_consolidado'), {
+                    'formato': 'json', 'desde': (hoy - datetime.timedelta(days=dias)).isoformat(), 'hasta': hoy.isoformat(),
+                })
+            datos = respuesta.json()
+            self.assertEqual(len(datos['por_sucursal']), 2)
+            self.assertEqual(Decimal(datos['totales']['ventas']),
+                             self.totales(hoy - datetime.timedelta(days=dias), hoy, [self.sucursal, self.otra])['ventas'])
+
+
+# --- 13. API JSON CON GET CONDICIONAL ---
+
+class ApiTests(ConDatosSinteticos):
+
+    def test_etag_y_last_modified_dan_304(self):
+        url = reverse('api_cierres')
+        primera = self.client.get(url, {'sucursal_id': self.sucursal.id})
+        self.assertEqual(primera.status_code, 200)
+
+        igual = self.client.get(url, {'sucursal_id': self.sucursal.id}, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(igual.status_code, 304)
+        self.assertEqual(igual.content, b'')
+        igual = self.client.get(url, {'sucursal_id': self.sucursal.id}, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified'])
+        self.assertEqual(igual.status_code, 304)
+
+        # Un gasto editado cambia el cierre de su día: la respuesta ya no es la misma
+        cierre = CajaDiaria.objects.get(id=primera.json()['resultados'][0]['id'])
+        gasto = GastoExtra.objects.filter(sucursal=self.sucursal, fecha=cierre.fecha).first()
+        gasto.monto += 1
+        gasto.save()
+        self.assertGreater(CajaDiaria.objects.get(id=cierre.id).actualizado, cierre.actualizado)
+        nueva = self.client.get(url, {'sucursal_id': self.sucursal.id}, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], primera['ETag'])
+
+    def test_catalogo_con_campos_elegidos(self):
+        url = reverse('api_productos', args=[self.sucursal.id])
+        respuesta = self.client.get(url, {'campos': 'id,precio_unitario'})
+        esperado = [{'id': p.id, 'precio_unitario': str(p.precio_unitario)} for p in catalogo_sucursal(self.sucursal.id)]
+        self.assertEqual(respuesta.json()['resultados'], esperado)
+        self.assertEqual(self.client.get(url, {'campos': 'id,precio_unitario'}, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+        self.assertEqual(self.client.get(reverse('api_productos', args=[0])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+# --- 14. INSTRUMENTACIÓN POR VISTA ---
+
+@override_settings(INSTRUMENTACION=True)
+class InstrumentacionTests(ConDatosSinteticos):
+
+    def test_server_timing_y_log(self):
+        with CaptureQueriesContext(connection) as consultas, self.assertLogs('inventario.instrumentacion', 'INFO') as log:
+            respuesta = self.client.get(reverse('ver_stock'), {'sucursal_id': self.sucursal.id})
+        self.assertRegex(respuesta['Server-Timing'], rf'^total;dur=[\d.]+, db;dur=[\d.]+;desc="{len(consultas)} consultas"$')
+        linea = json.loads(log.records[-1].getMessage())
+        self.assertEqual((linea['vista'], linea['estado'], linea['consultas']), ('ver_stock', 200, len(consultas)))
+
+    def test_vista_async_cuenta_consultas_y_plantilla(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('historial_ventas'))
+        self.assertIn(f'desc="{len(consultas)} consultas"', respuesta['Server-Timing'])
+        self.assertRegex(respuesta['Server-Timing'], r', plantilla;dur=[\d.]+$')
+
+    def test_estadisticas_solo_personal(self):
+        self.client.get(reverse('ver_stock'), {'sucursal_id': self.sucursal.id})
+        self.assertEqual(self.client.get(reverse('estadisticas_rendimiento')).status_code, 302)
+        self.usuario.is_staff = True
+        self.usuario.save()
+        filas = self.client.get(reverse('estadisticas_rendimiento')).context['filas']
+        self.assertIn('ver_stock', [f['vista'] for f in filas])
+
+    @override_settings(INSTRUMENTACION=False)
+    def test_desactivada(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('ver_stock'), {'sucursal_id': self.sucursal.id}))
+
+
+# --- 15. CARGA MASIVA DE CATÁLOGO E HISTORIAL ---
+
+@override_settings(**CONFIGURACION_PRUEBAS)
+class ImportacionTests(TestCase):
+    CATALOGO = [
+        {'sucursal': 'NORTE', 'categoria': 'SALTEÑAS', 'producto': 'CARNE', 'precio_unitario': '8.50'},
+        {'sucursal': 'SUR', 'categoria': 'SALTEÑAS', 'producto': 'CARNE', 'precio_unitario': '8.50'},
+        {'sucursal': 'NORTE', 'categoria': 'JUGOS', 'producto': 'PAPAYA', 'precio_unitario': '12'},
+    ]
+
+    def test_catalogo(self):
+        diferencias = importar_catalogo(self.CATALOGO, aplicar=False)
+        self.assertEqual(diferencias['sucursales_nuevas'], ['NORTE', 'SUR'])
+        self.assertEqual(diferencias['productos_nuevos'], ['JUGOS / PAPAYA', 'SALTEÑAS / CARNE'])
+        self.assertEqual(diferencias['asignaciones_nuevas'], 3)
+        self.assertFalse(Producto.objects.exists())
+
+        importar_catalogo(self.CATALOGO)
+        carne = Producto.objects.get(nombre='CARNE')
+        self.assertEqual(sorted(carne.sucursal.values_list('nombre', flat=True)), ['NORTE', 'SUR'])
+        self.assertEqual((carne.categoria.grupo, carne.categoria.orden), (Categoria.Grupo.SALTENA, 10))
+        self.assertEqual(PrecioProducto.objects.get(producto=carne).precio_unitario, Decimal('8.50'))
+
+        # El mismo archivo otra vez no cambia nada
+        self.assertEqual(importar_catalogo(self.CATALOGO), {
+            'sucursales_nuevas': [], 'categorias_nuevas': [], 'productos_nuevos': [], 'precios_cambiados': [],
+            'asignaciones_nuevas': 0,
+        })
+
+        caro = [dict(fila, precio_unitario='9') for fila in self.CATALOGO]
+        # La carga inicial del despliegue respeta los precios cambiados en el admin
+        importar_catalogo(caro, solo_nuevos=True)
+        self.assertEqual(Producto.objects.get(id=carne.id).precio_unitario, Decimal('8.50'))
+        self.assertEqual(importar_catalogo(caro)['precios_cambiados'], ['JUGOS / PAPAYA: 12.00 -> 9.00',
+                                                                        'SALTEÑAS / CARNE: 8.50 -> 9.00'])
+        self.assertEqual(Producto.objects.get(id=carne.id).precio_unitario, Decimal('9'))
+
+    def test_historial_omite_dias_ya_cargados(self):
+        importar_catalogo(self.CATALOGO)
+        norte = Sucursal.objects.get(nombre='NORTE')
+        carne = Producto.objects.get(nombre='CARNE')
+        PrecioProducto.objects.filter(producto=carne).update(vigente_desde=datetime.date(2025, 1, 1))
+
+        def fila(fecha, salida):
+            return {'fecha': fecha, 'sucursal': 'NORTE', 'producto': 'CARNE', 'entrada': '20', 'salida': salida}
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = f'{carpeta}/registros.csv'
+            with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+                escritor = csv.DictWriter(archivo, ['fecha', 'sucursal', 'producto', 'entrada', 'salida'])
+                escritor.writeheader()
+                escritor.writerows([fila('2025-03-01', '5'), fila('2025-03-02', '7')])
+            salida = io.StringIO()
+            call_command('importar_datos', 'registros', ruta, simular=True, stdout=salida)
+            self.assertIn('filas_nuevas: 2', salida.getvalue())
+            self.assertFalse(RegistroDiario.objects.exists())
+            call_command('importar_datos', 'registros', ruta, stdout=io.StringIO())
+
+        # Precio del día desde el historial, venta, resumen y stock ya calculados
+        registro = RegistroDiario.objects.get(fecha=datetime.date(2025, 3, 1))
+        self.assertEqual(registro.precio_unitario, Decimal('8.50'))
+        self.assertEqual(VentaSalteña.objects.filter(sucursal=norte).count(), 2)
+        self.assertEqual(ResumenDiario.objects.get(fecha=datetime.date(2025, 3, 2)).ventas_bs, Decimal('59.50'))
+        self.assertEqual(stock_actual(norte.id), {carne.id: 28})
+
+        diferencias = importar_historial('registros', [fila('2025-03-02', '7'), fila('2025-03-03', '1')])
+        self.assertEqual(diferencias['filas_nuevas'], 1)
+        self.assertEqual(diferencias['dias_omitidos'], ['NORTE 2025-03-02'])
+        self.assertEqual(stock_actual(norte.id), {carne.id: 47})
+
+        with self.assertRaisesMessage(ValueError, "Fila 1: el producto 'POLLO' no existe"):
+            importar_historial('registros', [dict(fila('2025-03-04', '1'), producto='POLLO')])
+
+
+# --- 16. PDF EN LOTE Y POOL DE RENDER ---
+
+def pdf_en_blanco(*args):
+    """Un PDF válido de una página, en un futuro ya resuelto como los del pool."""
+    escritor = PdfWriter()
+    escritor.add_blank_page(width=200, height=200)
+    salida = io.BytesIO()
+    escritor.write(salida)
+    futuro = Future()
+    futuro.set_result(salida.getvalue())
+    return futuro
+
+
+@mock.patch('inventario.reportes._encargar_pdf', side_effect=pdf_en_blanco)
+class LotesTests(ConDatosSinteticos):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        hoy = timezone.localdate()
+        self.rango = {'desde': (hoy - datetime.timedelta(days=2)).isoformat(), 'hasta': hoy.isoformat()}
+        self.cierres = list(CajaDiaria.objects.select_related('sucursal').filter(
+            fecha__gte=self.rango['desde'], fecha__lte=self.rango['hasta']).order_by('fecha', 'sucursal__nombre', 'id'))
+
+    def test_lote_reutiliza_los_guardados(self, encargar):
+        guardado = obtener_reporte(self.cierres[0])
+        reportes = reportes_en_lote(self.cierres)
+        self.assertEqual([c.id for c, _ in reportes], [c.id for c in self.cierres])
+        self.assertEqual(encargar.call_count, len(self.cierres))
+        # Los que faltaban quedan guardados para la próxima descarga
+        self.assertEqual(ReporteCierre.objects.filter(caja__in=self.cierres).count(), len(self.cierres))
+        self.assertEqual(ReporteCierre.objects.get(caja=self.cierres[0]).id, guardado.id)
+
+    def test_descarga_pdf_y_zip(self, encargar):
+        respuesta = self.client.get(reverse('descargar_lote'), self.rango)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertEqual(len(PdfReader(io.BytesIO(respuesta.content)).pages), len(self.cierres))
+
+        respuesta = self.client.get(reverse('descargar_lote'), {**self.rango, 'formato': 'zip'})
+        with zipfile.ZipFile(io.BytesIO(respuesta.content)) as archivo:
+            self.assertEqual(archivo.namelist(), [f"{c.fecha}_{c.sucursal.nombre}_{c.id}.pdf" for c in self.cierres])
+        # La segunda descarga usa los PDF guardados por la primera
+        self.assertEqual(encargar.call_count, len(self.cierres))
+
+    def test_rango_vacio_o_demasiado_grande(self, encargar):
+        self.assertEqual(self.client.get(reverse('descargar_lote'), {'desde': '2000-01-01', 'hasta': '2000-01-31'}).status_code, 404)
+        with mock.patch('inventario.views.MAX_CIERRES_LOTE', len(self.cierres) - 1):
+            self.assertEqual(self.client.get(reverse('descargar_lote'), self.rango).status_code, 400)
+        encargar.assert_not_called()
+
+
+class PoolRenderTests(SimpleTestCase):
+
+    def test_pool_roto_se_rehace(self):
+        roto, nuevo = mock.Mock(), mock.Mock()
+        roto.submit.side_effect = BrokenProcessPool
+        with mock.patch('inventario.reportes._pool_render', roto), \
+                mock.patch('inventario.reportes.ProcessPoolExecutor', return_value=nuevo) as crear:
+            self.assertIs(reportes._encargar_pdf('<p>hola</p>', ('cierre',)), nuevo.submit.return_value)
+            self.assertIs(reportes._pool_render, nuevo)
+        crear.assert_called_once()
+        nuevo.submit.assert_called_once_with(render_pdf.renderizar, '<p>hola</p>', ('cierre',))
+        # Cada proceso recibe la hoja del reporte para procesarla al iniciar
+        hojas, = crear.call_args.kwargs['initargs']
+        self.assertTrue(hojas['cierre'].endswith('reporte_cierre.css'))
+
+
+# --- 17. HOJA DE ESTILO DEL PDF PROCESADA UNA VEZ ---
+
+class HojaPdfTests(ConDatosSinteticos):
+
+    def test_html_del_pdf_sin_estilos(self):
+        cierre = CajaDiaria.objects.select_related('sucursal').filter(sucursal=self.sucursal).latest('fecha')
+        # El PDF recibe la hoja ya procesada; solo la vista web la enlaza
+        html = reportes.html_cierre(cierre)
+        self.assertNotIn('<style', html)
+        self.assertNotIn('reporte_cierre.css', html)
+        web = self.client.get(reverse('ver_planilla'), {'caja_id': cierre.id}).content.decode()
+        self.assertIn('inventario/css/reporte_cierre.css', web)
+
+        with mock.patch('inventario.reportes.html_a_pdf', return_value=b'%PDF') as html_a_pdf, \
+                override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())):
+            reportes.generar_reporte(cierre)
+        html_a_pdf.assert_called_once_with(html, ('cierre',))
+
+    def test_hoja_procesada_al_iniciar_el_proceso(self):
+        weasyprint, fuentes = mock.Mock(), mock.Mock()
+        modulos = {'weasyprint': weasyprint, 'weasyprint.text': mock.Mock(fonts=fuentes), 'weasyprint.text.fonts': fuentes}
+        self.addCleanup(render_pdf._hojas.clear)
+        with mock.patch.dict(sys.modules, modulos), mock.patch.object(render_pdf, '_fuentes', None):
+            render_pdf.iniciar({'cierre': '/ruta/reporte_cierre.css'})
+            for _ in range(3):
+                render_pdf.renderizar('<p>hola</p>', ('cierre',))
+
+            configuracion = fuentes.FontConfiguration.return_value
+            weasyprint.CSS.assert_called_once_with(filename='/ruta/reporte_cierre.css', font_config=configuracion)
+            self.assertEqual(weasyprint.HTML.return_value.write_pdf.call_count, 3)
+            weasyprint.HTML.return_value.write_pdf.assert_called_with(
+                stylesheets=[weasyprint.CSS.return_value], font_config=configuracion)
+
+
+# --- 18. ORDEN Y GRUPO DE LAS CATEGORÍAS ---
+
+class CategoriasTests(ConDatosSinteticos):
+
+    def test_orden_de_la_planilla_y_los_reportes(self):
+        ultima = Categoria.objects.order_by('-orden', 'nombre').first()
+        ultima.orden = 1
+        ultima.save()
+        with CaptureQueriesContext(connection) as consultas:
+            productos = catalogo_sucursal(self.sucursal.id)
+        # Se ordena por el índice (orden, nombre), sin buscar texto en el nombre
+        self.assertNotIn('LIKE', consultas[0]['sql'].upper())
+        claves = [(p.categoria.orden, p.categoria.nombre, p.nombre) for p in productos]
+        self.assertEqual(claves, sorted(claves))
+        self.assertEqual(productos[0].categoria, ultima)
+
+        hoy = timezone.localdate()
+        por_categoria = reporte_consolidado(hoy - datetime.timedelta(days=7), hoy)['por_categoria']
+        self.assertEqual(por_categoria[0]['categoria'], ultima.nombre)
+        self.assertEqual([c['categoria'] for c in por_categoria],
+                         [c.nombre for c in Categoria.objects.filter(productos__isnull=False).distinct().order_by('orden', 'nombre')])
+
+    def test_grupo_define_los_contadores(self):
+        especiales = Categoria.objects.create(nombre='ESPECIALES', orden=15, grupo=Categoria.Grupo.SALTENA)
+        producto = Producto.objects.create(nombre='PICANTE', categoria=especiales, precio_unitario=Decimal('10'))
+        producto.sucursal.add(self.sucursal)
+        caja_id = self.client.post(reverse('guardar_registro'), self.planilla(salida='2')).json()['caja_id']
+
+        contexto = contexto_cierre(CajaDiaria.objects.select_related('sucursal').get(id=caja_id))
+        saltenas = [p for p in catalogo_sucursal(self.sucursal.id) if p.categoria.grupo == Categoria.Grupo.SALTENA]
+        self.assertIn(producto, saltenas)
+        self.assertEqual(contexto['tS'], 2 * len(saltenas))
+        # Nombre nuevo sin grupo elegido: se deduce del nombre
+        self.assertEqual(datos_categoria('Jugos de temporada'), {'grupo': Categoria.Grupo.JUGO, 'orden': 40})
+        self.assertEqual(datos_categoria('POSTRES'), {'grupo': Categoria.Grupo.OTRO, 'orden': 100})
+
+
+# --- 19. DATOS SINTÉTICOS Y BENCHMARK ---
+
+class DatosSinteticosTests(ConDatosSinteticos):
+
+    def test_historial_generado(self):
+        ayer = timezone.localdate() - datetime.timedelta(days=1)
+        fechas = CajaDiaria.objects.filter(sucursal=self.sucursal).values_list('fecha', flat=True)
+        self.assertEqual((min(fechas), max(fechas), len(fechas)), (ayer - datetime.timedelta(days=self.DIAS - 1), ayer, self.DIAS))
+        self.assertEqual(RegistroDiario.objects.filter(sucursal=self.sucursal).count(),
+                         self.DIAS * len(catalogo_sucursal(self.sucursal.id)))
+        # Saldo y resumen ya calculados al terminar
+        self.assertEqual(stock_actual(self.sucursal.id), saldos_sumados(self.sucursal.id, ayer))
+        self.assertEqual(ResumenDiario.objects.filter(sucursal=self.sucursal).count(),
+                         RegistroDiario.objects.filter(sucursal=self.sucursal).count())
+
+    def test_misma_semilla_mismos_datos(self):
+        def generar(semilla):
+            with transaction.atomic():
+                call_command('generar_datos_sinteticos', sucursales=3, dias=3, semilla=semilla, stdout=io.StringIO())
+                huella = sorted(RegistroDiario.objects.filter(sucursal__nombre='SAN PEDRO').values_list(
+                    'fecha', 'producto__nombre', 'produccion', 'entrada', 'baja', 'salida'))
+                transaction.set_rollback(True)
+            return huella
+        self.assertEqual(generar(7), generar(7))
+        self.assertNotEqual(generar(7), generar(8))
+
+    @mock.patch('inventario.render_pdf.iniciar', side_effect=ImportError('sin WeasyPrint'))
+    @mock.patch('inventario.reportes._encargar_pdf', side_effect=pdf_en_blanco)
+    def test_benchmark(self, encargar, iniciar):
+        User.objects.create_superuser('admin', password='admin')
+        cierres = CajaDiaria.objects.count()
+        with tempfile.TemporaryDirectory() as carpeta:
+            with override_settings(MEDIA_ROOT=carpeta):
+                call_command('benchmark', repeticiones=2, salida=f'{carpeta}/informe.json', stdout=io.StringIO())
+            with open(f'{carpeta}/informe.json', encoding='utf-8') as archivo:
+                informe = json.load(archivo)
+
+        resultados = informe['resultados']
+        self.assertEqual(set(resultados), set(LIMITES_CONSULTAS))
+        for nombre in ('guardar_registro', 'lista_productos', 'historial_ventas', 'ver_planilla_html', 'generar_pdf'):
+            self.assertEqual(resultados[nombre]['estado'], 'ok', nombre)
+            self.assertLessEqual(resultados[nombre]['consultas'], LIMITES_CONSULTAS[nombre])
+        self.assertEqual(resultados['pdf_css_procesado']['estado'], 'omitido')
+        # Los cierres de la medición no quedan guardados
+        self.assertEqual(CajaDiaria.objects.count(), cierres)
+        self.assertEqual(informe['datos']['cierres'], cierres)
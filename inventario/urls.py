@@ -13,9 +13,25 @@ urlpatterns = [
 
     # --- ACCIONES DE LA PLANILLA (GUARDAR Y PDF) ---
     path('guardar/', views.guardar_registro, name='guardar_registro'),
+    path('sincronizar/', views.sincronizar_cierres, name='sincronizar_cierres'),
+    path('sw.js', views.service_worker, name='service_worker'),
     path('generar-pdf/', views.generar_pdf_estilo_cuaderno, name='generar_pdf_estilo_cuaderno'),
+    path('reportes/lote/', views.descargar_lote, name='descargar_lote'),
     
     # --- REPORTES Y CONSULTAS ---
     path('historial/', views.historial_ventas, name='historial_ventas'),
     path('ver-planilla/', views.ver_planilla_html, name='ver_planilla'),
+    path('reportes/consolidado/', views.reporte_consolidado_view, name='reporte_consolidado'),
+    path('reportes/anomalias/', views.reporte_anomalias, name='reporte_anomalias'),
+    path('exportar/', views.exportar_csv, name='exportar_csv'),
+    path('stock/', views.ver_stock, name='ver_stock'),
+    path('estadisticas/', views.estadisticas_rendimiento, name='estadisticas_rendimiento'),
+    path('traspasos/', views.ver_traspasos, name='ver_traspasos'),
+    path('traspasos/confirmar/', views.confirmar_traspaso, name='confirmar_traspaso'),
+
+    # --- API JSON ---
+    path('api/sucursales/', views.api_sucursales, name='api_sucursales'),
+    path('api/sucursales/<int:sucursal_id>/productos/', views.api_productos, name='api_productos'),
+    path('api/cierres/', views.api_cierres, name='api_cierres'),
+    path('api/cierres/<int:caja_id>/', views.api_cierre, name='api_cierre'),
 ]
\ No newline at end of file
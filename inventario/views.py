@@ -1,18 +1,45 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import datetime
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse
+from django.http import QueryDict, FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
-from django.db.models import Sum, Case, When, Value, IntegerField
+from django.db import transaction
+from django.db.models import Sum, F, Q
+from django.utils.dateparse import parse_date
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.core.serializers.json import DjangoJSONEncoder
 
 # Importación de modelos
 from .models import (
     Producto, RegistroDiario, Sucursal, 
-    CajaDiaria, Gasto, VentaSalteña, GastoExtra, Categoria
+    CajaDiaria, Gasto, VentaSalteña, GastoExtra, Categoria, Traspaso
+)
+
+from .archivo import movimientos_archivados
+from .catalogo import catalogo_sucursal
+from .cierres import ClaveEnConflicto, fecha_de_cierre, limpiar_clave, recibir_traspaso, registrar_cierre
+from .pronostico import produccion_sugerida
+from .stock import stock_actual, saldo_en_fecha
+from .conciliacion import detectar_anomalias
+from .consolidado import reporte_consolidado
+from .exportar import TABLAS_EXPORTABLES, lineas_csv, lineas_csv_async
+from .instrumentacion import resumen_estadisticas
+from .reportes import (
+    MAX_CIERRES_LOTE, ahtml_a_pdf, aobtener_reporte, contexto_cierre, nombre_descarga,
+    reportes_en_lote, unir_pdfs, zip_de_reportes,
 )
 
-# Importación de WeasyPrint
-from weasyprint import HTML
+# Las vistas de lectura más usadas son async: bajo ASGI (uvicorn) esperan a la
+# BD o al PDF sin ocupar un worker. Con WSGI Django las ejecuta igual.
 
 # --- 1. NAVEGACIÓN ---
 
@@ -23,169 +50,467 @@ def seleccionar_sucursal(request):
     return render(request, 'inventario/seleccion_sucursal.html', {'sucursales': sucursales})
 
 @login_required
-def lista_productos(request):
+async def lista_productos(request):
     """Vista de la planilla móvil con orden prioritario de Salteñas."""
     sucursal_id = request.GET.get('sucursal_id')
     if not sucursal_id:
         return redirect('seleccion_sucursal')
     
-    sucursal = get_object_or_404(Sucursal, id=sucursal_id)
+    sucursal = await aget_object_or_404(Sucursal, id=_leer_id(sucursal_id))
     
-    # Ordenamos con prioridad para que las SALTEÑAS salgan primero
-    productos = Producto.objects.filter(sucursal=sucursal).select_related('categoria').annotate(
-        prioridad=Case(
-            When(categoria__nombre__icontains='SALTE', then=Value(1)),
-            default=Value(2),
-            output_field=IntegerField(),
-        )
-    ).order_by('prioridad', 'categoria__nombre', 'nombre')
+    # Catálogo cacheado y ya ordenado por el orden de las categorías (SALTEÑAS primero)
+    productos = await sync_to_async(catalogo_sucursal)(sucursal.id)
+    # Producción sugerida para hoy según las ventas de las últimas semanas (cacheada por día)
+    sugeridos = await sync_to_async(produccion_sugerida)(sucursal.id)
     
     return render(request, 'inventario/lista.html', {
         'productos': productos, 
         'sucursal_activa': sucursal,
+        'sugeridos': sugeridos,
+        'sucursales_destino': [s async for s in Sucursal.objects.exclude(id=sucursal.id).order_by('nombre')],
     })
 
 # --- 2. REPORTES Y CONSULTAS ---
 
+CIERRES_POR_PAGINA = 50
+
+def _leer_fecha(valor, defecto=None):
+    """Fecha 'AAAA-MM-DD' de un parámetro GET; 'defecto' si falta o no es válida."""
+    try:
+        return parse_date(valor or '') or defecto
+    except ValueError:
+        return defecto
+
+def _leer_id(valor):
+    """Id numérico de un parámetro; None si falta o no es válido (get_object_or_404 da 404)."""
+    valor = (valor or '').strip()
+    return int(valor) if valor.isdigit() else None
+
+def _leer_cursor(valor):
+    """Convierte el cursor 'AAAA-MM-DD_id' en (fecha, id); None si no es válido."""
+    fecha_txt, _, id_txt = (valor or '').partition('_')
+    fecha = _leer_fecha(fecha_txt)
+    if not fecha or not id_txt.isdigit():
+        return None
+    return fecha, int(id_txt)
+
 @login_required
-def historial_ventas(request):
-    """Muestra todos los cierres guardados."""
-    cierres = CajaDiaria.objects.all().order_by('-fecha', '-id')
-    return render(request, 'inventario/historial.html', {'cierres': cierres})
+async def historial_ventas(request):
+    """Muestra los cierres guardados por páginas (keyset por fecha e id)."""
+    sucursal_id = request.GET.get('sucursal_id') or ''
+    desde = _leer_fecha(request.GET.get('desde'))
+    hasta = _leer_fecha(request.GET.get('hasta'))
+
+    # El total de caja se suma en SQL y la sucursal viene en el mismo JOIN
+    cierres = CajaDiaria.objects.select_related('sucursal').annotate(
+        total_caja=F('efectivo') + F('qr') + F('tarjetero')
+    ).order_by('-fecha', '-id')
+
+    if sucursal_id.isdigit():
+        cierres = cierres.filter(sucursal_id=sucursal_id)
+    if desde:
+        cierres = cierres.filter(fecha__gte=desde)
+    if hasta:
+        cierres = cierres.filter(fecha__lte=hasta)
+
+    cursor = _leer_cursor(request.GET.get('cursor'))
+    if cursor:
+        fecha, ultimo_id = cursor
+        cierres = cierres.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=ultimo_id))
+
+    # Se pide una fila extra solo para saber si hay otra página
+    pagina = [c async for c in cierres[:CIERRES_POR_PAGINA + 1]]
+    siguiente = None
+    if len(pagina) > CIERRES_POR_PAGINA:
+        pagina = pagina[:CIERRES_POR_PAGINA]
+        ultimo = pagina[-1]
+        params = request.GET.copy()
+        params['cursor'] = f"{ultimo.fecha.isoformat()}_{ultimo.id}"
+        siguiente = params.urlencode()
+
+    primera = request.GET.copy()
+    primera.pop('cursor', None)
+
+    return render(request, 'inventario/historial.html', {
+        'cierres': pagina,
+        'sucursales': [s async for s in Sucursal.objects.order_by('nombre')],
+        'sucursal_id': sucursal_id,
+        'desde': desde,
+        'hasta': hasta,
+        'siguiente': siguiente,
+        'primera': primera.urlencode() if cursor else None,
+    })
 
 @login_required
-def ver_planilla_html(request):
+async def ver_planilla_html(request):
     """Visualización previa del reporte en formato web."""
     caja_id = request.GET.get('caja_id')
-    cierre = get_object_or_404(CajaDiaria, id=caja_id)
-    return render(request, 'inventario/pdf_template.html', {'cierre': cierre, 'es_vista_web': True})
+    cierre = await aget_object_or_404(CajaDiaria.objects.select_related('sucursal'), id=_leer_id(caja_id))
+    context = await sync_to_async(contexto_cierre)(cierre)
+    context['es_vista_web'] = True
+    return render(request, 'inventario/pdf_template.html', context)
+
+@login_required
+def ver_stock(request):
+    """Stock por producto de una sucursal: saldo actual o al final de ?fecha=."""
+    sucursal = get_object_or_404(Sucursal, id=_leer_id(request.GET.get('sucursal_id')))
+    fecha = _leer_fecha(request.GET.get('fecha'))
+
+    saldos = saldo_en_fecha(sucursal.id, fecha) if fecha else stock_actual(sucursal.id)
+    return JsonResponse({
+        'sucursal': sucursal.nombre,
+        'fecha': fecha.isoformat() if fecha else None,
+        'stock': [
+            {'producto_id': p.id, 'producto': p.nombre, 'categoria': p.categoria.nombre, 'cantidad': saldos.get(p.id, 0)}
+            for p in catalogo_sucursal(sucursal.id)
+        ],
+    })
+
+def _traspaso_json(t):
+    return {
+        'id': t.id,
+        'producto': t.producto.nombre,
+        'origen': t.origen.nombre,
+        'destino': t.destino.nombre,
+        'cantidad': t.cantidad,
+        'fecha': t.fecha.isoformat(),
+        'recibido': t.recibido,
+    }
+
+@login_required
+def ver_traspasos(request):
+    """Traspasos enviados y recibidos por una sucursal en un día (por defecto hoy)."""
+    sucursal = get_object_or_404(Sucursal, id=_leer_id(request.GET.get('sucursal_id')))
+    fecha = _leer_fecha(request.GET.get('fecha'), timezone.localdate())
+
+    traspasos = Traspaso.objects.select_related('producto', 'origen', 'destino').order_by('id')
+    recibidos = [_traspaso_json(t) for t in traspasos.filter(destino=sucursal, fecha=fecha)]
+    return JsonResponse({
+        'sucursal': sucursal.nombre,
+        'fecha': fecha.isoformat(),
+        'enviados': [_traspaso_json(t) for t in traspasos.filter(origen=sucursal, fecha=fecha)],
+        'pendientes': [t for t in recibidos if not t['recibido']],
+        'recibidos': [t for t in recibidos if t['recibido']],
+    })
+
+@login_required
+@require_POST
+def confirmar_traspaso(request):
+    """La sucursal destino confirma que recibió la mercadería."""
+    traspaso = get_object_or_404(Traspaso, id=_leer_id(request.POST.get('traspaso_id')))
+    traspaso = recibir_traspaso(traspaso.id)
+    return JsonResponse({"status": "success", "traspaso": _traspaso_json(traspaso)})
+
+@login_required
+async def reporte_consolidado_view(request):
+    """Reporte de varias sucursales en un rango de fechas (?formato=html|json|pdf)."""
+    hoy = timezone.localdate()
+    desde = _leer_fecha(request.GET.get('desde'), hoy.replace(day=1))
+    hasta = _leer_fecha(request.GET.get('hasta'), hoy)
+    sucursal_ids = [int(x) for x in request.GET.getlist('sucursal_id') if x.isdigit()]
+
+    datos = await sync_to_async(reporte_consolidado)(desde, hasta, sucursal_ids)
+    formato = request.GET.get('formato', 'html')
+
+    if formato == 'json':
+        return JsonResponse({
+            'desde': desde, 'hasta': hasta,
+            'sucursales': [s.nombre for s in datos['sucursales']],
+            'por_dia': datos['por_dia'],
+            'por_sucursal': datos['por_sucursal'],
+            'por_categoria': datos['por_categoria'],
+            'totales': datos['totales'],
+        })
+
+    context = {
+        **datos,
+        'todas_sucursales': [s async for s in Sucursal.objects.order_by('nombre')],
+        'sucursal_ids': sucursal_ids,
+        'es_pdf': formato == 'pdf',
+    }
+    if formato == 'pdf':
+        pdf = await ahtml_a_pdf(render_to_string('inventario/consolidado.html', context))
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="Consolidado_{desde}_{hasta}.pdf"'
+        return response
+    return render(request, 'inventario/consolidado.html', context)
+
+@staff_member_required
+async def reporte_anomalias(request):
+    """Días con diferencias de caja fuera de lo normal y equipos con faltantes (?formato=html|json)."""
+    hoy = timezone.localdate()
+    desde = _leer_fecha(request.GET.get('desde'), hoy - datetime.timedelta(days=90))
+    hasta = _leer_fecha(request.GET.get('hasta'), hoy)
+    sucursal_ids = [int(x) for x in request.GET.getlist('sucursal_id') if x.isdigit()]
+
+    datos = await sync_to_async(detectar_anomalias)(desde, hasta, sucursal_ids)
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(datos)
+
+    return render(request, 'inventario/anomalias.html', {
+        **datos,
+        'todas_sucursales': [s async for s in Sucursal.objects.order_by('nombre')],
+        'sucursal_ids': sucursal_ids,
+    })
+
+@login_required
+def exportar_csv(request):
+    """Descarga en CSV una tabla completa en streaming (memoria constante)."""
+    tabla = request.GET.get('tabla', 'cierres')
+    if tabla not in TABLAS_EXPORTABLES:
+        return JsonResponse({"status": "error", "mensaje": f"Tabla desconocida: {tabla}"}, status=400)
+
+    desde = _leer_fecha(request.GET.get('desde'))
+    hasta = _leer_fecha(request.GET.get('hasta'))
+    sucursal_ids = [int(x) for x in request.GET.getlist('sucursal_id') if x.isdigit()]
+
+    # Bajo ASGI el contenido tiene que ser asíncrono para salir por partes
+    lineas = (lineas_csv_async if settings.ASGI else lineas_csv)(tabla, desde, hasta, sucursal_ids)
+    response = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{tabla}_{desde or "inicio"}_{hasta or "hoy"}.csv"'
+    return response
+
+@staff_member_required
+def estadisticas_rendimiento(request):
+    """Tiempos recientes por vista en este proceso (solo personal)."""
+    return render(request, 'inventario/estadisticas.html', {'filas': resumen_estadisticas()})
 
 # --- 3. PROCESAMIENTO DE DATOS ---
 
 @login_required
+@require_POST
 def guardar_registro(request):
-    """Guarda Inventario, Ventas, Personal, Traspasos y Gastos."""
-    if request.method == "POST":
-        suc_id = request.POST.get('sucursal_id')
-        suc_obj = get_object_or_404(Sucursal, id=suc_id)
-        
-        # Captura de personal de turno (Checkboxes)
-        personal_seleccionado = request.POST.getlist('personal_turno')
-        nombres_personal = ", ".join(personal_seleccionado)
-
-        # 1. Guardar cierre financiero (Caja)
-        caja = CajaDiaria.objects.create(
-            sucursal=suc_obj,
-            efectivo=float(request.POST.get('caja_efectivo') or 0),
-            qr=float(request.POST.get('caja_qr') or 0),
-            tarjetero=float(request.POST.get('caja_tarjeta') or 0),
-            personal_turno=nombres_personal # Asegúrate de tener este campo en models.py
-        )
-
-        # 2. Guardar Movimientos por Producto
-        productos = Producto.objects.filter(sucursal=suc_obj)
-        for p in productos:
-            v_cant = int(request.POST.get(f's_{p.id}') or 0)
-            e_v = request.POST.get(f'e_{p.id}', 0)
-            b_v = request.POST.get(f'b_{p.id}', 0)
-            t_cant = request.POST.get(f't_cant_{p.id}', 0)
-            t_suc = request.POST.get(f't_suc_{p.id}', '')
-
-            if v_cant > 0:
-                VentaSalteña.objects.create(
-                    producto=p.nombre, 
-                    venta=v_cant,
-                    precio_unitario=p.precio_unitario, 
-                    sucursal=suc_obj
-                )
-            
-            # Guardar registro diario detallado
-            RegistroDiario.objects.create(
-                producto=p,
-                sucursal=suc_obj,
-                entrada=int(e_v or 0),
-                baja=int(b_v or 0),
-                traspaso=int(t_cant or 0),
-                traspaso_destino=t_suc, # Guarda el nombre completo de la sucursal
-                salida=v_cant
-            )
-
-        # 3. Guardar Gastos Extras
-        descs = request.POST.getlist('gasto_desc[]')
-        montos = request.POST.getlist('gasto_monto[]')
-        for d, m in zip(descs, montos):
-            if d and m:
-                GastoExtra.objects.create(
-                    descripcion=d, 
-                    monto=float(m), 
-                    sucursal=suc_obj
-                )
-
-        return JsonResponse({"status": "success", "caja_id": caja.id})
+    """Guarda el cierre de la planilla; los reintentos con la misma clave no duplican."""
+    suc_obj = get_object_or_404(Sucursal, id=_leer_id(request.POST.get('sucursal_id')))
+    clave = limpiar_clave(request.headers.get('Idempotency-Key') or request.POST.get('clave_idempotencia'))
+    try:
+        caja_id, repetido = registrar_cierre(suc_obj, request.POST, clave)
+    except ClaveEnConflicto:
+        return JsonResponse({"status": "error", "mensaje": "Esa clave ya se usó para otra planilla"}, status=409)
+    except ValueError as e:
+        return JsonResponse({"status": "error", "mensaje": str(e)}, status=400)
+    return JsonResponse({"status": "success", "caja_id": caja_id, "repetido": repetido})
+
+def _cierre_encolado(c, sucursales, hoy):
+    """(sucursal, datos, clave, fecha) de un cierre de la cola; ValueError si no es válido."""
+    if not isinstance(c, dict):
+        raise ValueError("Formato inválido")
+    clave = limpiar_clave(c.get('clave') if isinstance(c.get('clave'), str) else None)
+    if not clave:
+        raise ValueError("Falta la clave del cierre")
+    suc_id = str(c.get('sucursal_id'))
+    if not suc_id.isdigit() or int(suc_id) not in sucursales:
+        raise ValueError(f"Sucursal inválida: {c.get('sucursal_id')}")
+    campos = c.get('campos')
+    if not isinstance(campos, list) or not all(
+            isinstance(par, list) and len(par) == 2 and all(isinstance(x, str) for x in par) for par in campos):
+        raise ValueError("Campos inválidos")
+    datos = QueryDict(mutable=True)
+    for campo, valor in campos:
+        datos.appendlist(campo, valor)
+    return sucursales[int(suc_id)], datos, clave, fecha_de_cierre(c.get('fecha'), hoy)
+
+@login_required
+@require_POST
+def sincronizar_cierres(request):
+    """Recibe en un solo envío los cierres que la planilla guardó sin conexión.
+
+    Cada cierre se valida y se guarda por separado, con el día en que se cerró:
+    uno inválido se informa como 'error' y no frena al resto de la cola.
+    """
+    try:
+        cierres = json.loads(request.body)['cierres']
+    except (ValueError, KeyError, TypeError):
+        cierres = None
+    if not isinstance(cierres, list):
+        return JsonResponse({"status": "error", "mensaje": "Formato inválido"}, status=400)
+
+    ids = {int(c['sucursal_id']) for c in cierres if isinstance(c, dict) and str(c.get('sucursal_id')).isdigit()}
+    sucursales = Sucursal.objects.in_bulk(ids)
+    hoy = timezone.localdate()
+    resultados = []
+    for c in cierres:
+        resultado = {"clave": c.get('clave') if isinstance(c, dict) else None}
+        try:
+            suc_obj, datos, clave, fecha = _cierre_encolado(c, sucursales, hoy)
+            caja_id, repetido = registrar_cierre(suc_obj, datos, clave, fecha)
+        except ClaveEnConflicto:
+            resultado.update(estado="error", mensaje="Esa clave ya se usó para otra planilla")
+        except ValueError as e:
+            resultado.update(estado="error", mensaje=str(e))
+        else:
+            resultado.update(estado="repetido" if repetido else "ok", caja_id=caja_id, fecha=fecha)
+        resultados.append(resultado)
+    return JsonResponse({"status": "success", "resultados": resultados})
+
+def service_worker(request):
+    """Service worker servido desde la raíz para controlar la planilla."""
+    response = render(request, 'inventario/sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 # --- 4. GENERACIÓN DE PDF ---
 
 @login_required
-def generar_pdf_estilo_cuaderno(request):
-    """Genera, organiza y descarga automáticamente el reporte PDF."""
+async def generar_pdf_estilo_cuaderno(request):
+    """Descarga el reporte PDF del cierre, reutilizando el archivo ya generado."""
     caja_id = request.GET.get('caja_id')
-    cierre = get_object_or_404(CajaDiaria, id=caja_id)
-    
-    # 1. Datos para el reporte (Salteñas primero)
-    productos = Producto.objects.filter(sucursal=cierre.sucursal).annotate(
-        prioridad=Case(When(categoria__nombre__icontains='SALTE', then=Value(1)), default=Value(2), output_field=IntegerField())
-    ).order_by('prioridad', 'categoria__nombre', 'nombre')
-
-    registros = {r.producto_id: r for r in RegistroDiario.objects.filter(
-        sucursal=cierre.sucursal, 
-        fecha_creacion__date=cierre.fecha
-    )}
-    
-    gastos_extras = GastoExtra.objects.filter(sucursal=cierre.sucursal, fecha=cierre.fecha)
-
-    filas = []
-    total_ventas = 0
-    tS, tJ = 0, 0 # Contadores para el tablero final
-
-    for p in productos:
-        reg = registros.get(p.id)
-        v_bs = (reg.salida * p.precio_unitario) if reg else 0
-        total_ventas += v_bs
-        
-        # Lógica de conteo por tipo
-        cat_nombre = p.categoria.nombre.upper()
-        cant_sale = reg.salida if reg else 0
-        if 'SALTE' in cat_nombre: tS += cant_sale
-        elif 'JUGO' in cat_nombre: tJ += cant_sale
-
-        filas.append({
-            'producto': p, 
-            'reg': reg, 
-            'total_fila_bs': v_bs
-        })
+    cierre = await aget_object_or_404(CajaDiaria.objects.select_related('sucursal'), id=_leer_id(caja_id))
 
-    # 2. Cálculos consolidados
-    total_gastos = sum(g.monto for g in gastos_extras)
-    total_caja_real = cierre.efectivo + cierre.qr + cierre.tarjetero
-    diferencia = total_caja_real - (total_ventas - total_gastos)
+    # Solo se renderiza si el PDF aún no existe o fue invalidado
+    reporte = await aobtener_reporte(cierre)
 
-    context = {
-        'cierre': cierre,
-        'filas': filas,
-        'gastos_extras': gastos_extras,
-        'tS': tS, 'tJ': tJ,
-        'total_ventas': total_ventas,
-        'total_gastos': total_gastos,
-        'total_caja': total_caja_real,
-        'diferencia': diferencia,
-    }
+    response = FileResponse(reporte.archivo.open('rb'), as_attachment=True,
+                            filename=nombre_descarga(cierre), content_type='application/pdf')
+    response['ETag'] = f'"{reporte.hash_contenido}"'
+    return response
 
-    # 3. Renderizado y DESCARGA (attachment)
-    html_string = render_to_string('inventario/pdf_template.html', context)
-    pdf = HTML(string=html_string).write_pdf()
-    
-    response = HttpResponse(pdf, content_type='application/pdf')
-    nombre_archivo = f"Reporte_{cierre.sucursal.nombre}_{cierre.fecha}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-    
-    return response
\ No newline at end of file
+@login_required
+async def descargar_lote(request):
+    """Reportes de varios cierres (?desde, ?hasta, ?sucursal_id) en un PDF combinado o un ZIP."""
+    hoy = timezone.localdate()
+    desde = _leer_fecha(request.GET.get('desde'), hoy.replace(day=1))
+    hasta = _leer_fecha(request.GET.get('hasta'), hoy)
+    sucursal_ids = [int(x) for x in request.GET.getlist('sucursal_id') if x.isdigit()]
+    formato = 'zip' if request.GET.get('formato') == 'zip' else 'pdf'
+
+    cierres = CajaDiaria.objects.select_related('sucursal').filter(
+        fecha__gte=desde, fecha__lte=hasta
+    ).order_by('fecha', 'sucursal__nombre', 'id')
+    if sucursal_ids:
+        cierres = cierres.filter(sucursal_id__in=sucursal_ids)
+    cierres = [c async for c in cierres[:MAX_CIERRES_LOTE + 1]]
+    if not cierres:
+        return JsonResponse({"status": "error", "mensaje": "No hay cierres en ese rango"}, status=404)
+    if len(cierres) > MAX_CIERRES_LOTE:
+        return JsonResponse({"status": "error", "mensaje": f"Más de {MAX_CIERRES_LOTE} cierres; acote el rango"}, status=400)
+
+    reportes = await sync_to_async(reportes_en_lote)(cierres)
+    if formato == 'zip':
+        response = HttpResponse(zip_de_reportes(reportes), content_type='application/zip')
+    else:
+        response = HttpResponse(await sync_to_async(unir_pdfs)([pdf for _, pdf in reportes]), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="Reportes_{desde}_{hasta}.{formato}"'
+    return response
+
+
+# --- 5. API JSON (con ETag / Last-Modified y 304) ---
+
+API_POR_PAGINA = 50
+
+def _respuesta_api(request, datos, ultima_modificacion=None):
+    """Serializa 'datos' y responde 304 si el cliente ya tiene esta misma versión."""
+    cuerpo = json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)
+    etag = '"%s"' % hashlib.sha1(cuerpo.encode()).hexdigest()
+    ultima = int(ultima_modificacion.timestamp()) if ultima_modificacion else None
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=ultima)
+    if respuesta is None:
+        respuesta = HttpResponse(cuerpo, content_type='application/json')
+    respuesta['ETag'] = etag
+    if ultima:
+        respuesta['Last-Modified'] = http_date(ultima)
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+def _elegir_campos(request, filas):
+    """Aplica ?campos=a,b,c a cada objeto de la respuesta."""
+    campos = [c for c in (request.GET.get('campos') or '').split(',') if c]
+    if not campos:
+        return filas
+    return [{k: v for k, v in fila.items() if k in campos} for fila in filas]
+
+@login_required
+def api_sucursales(request):
+    sucursales = [{'id': s.id, 'nombre': s.nombre} for s in Sucursal.objects.order_by('nombre')]
+    return _respuesta_api(request, {'resultados': _elegir_campos(request, sucursales)})
+
+@login_required
+def api_productos(request, sucursal_id):
+    """Catálogo de la sucursal en el mismo orden que la planilla (Salteñas primero)."""
+    get_object_or_404(Sucursal, id=sucursal_id)
+    productos = [
+        {'id': p.id, 'nombre': p.nombre, 'categoria': p.categoria.nombre, 'precio_unitario': p.precio_unitario}
+        for p in catalogo_sucursal(sucursal_id)
+    ]
+    return _respuesta_api(request, {'resultados': _elegir_campos(request, productos)})
+
+def _cierres_json(cierres):
+    """Cierres con sus gastos y registros del día (dos consultas para toda la página)."""
+    if not cierres:
+        return []
+    sucursales = {c.sucursal_id for c in cierres}
+    fechas = [c.fecha for c in cierres]
+    rango = {'sucursal_id__in': sucursales, 'fecha__gte': min(fechas), 'fecha__lte': max(fechas)}
+
+    gastos, registros = {}, {}
+    for g in GastoExtra.objects.filter(**rango).order_by('id').values('sucursal_id', 'fecha', 'descripcion', 'monto'):
+        gastos.setdefault((g.pop('sucursal_id'), g.pop('fecha')), []).append(g)
+    for r in RegistroDiario.objects.filter(**rango).order_by('id').values(
+            'sucursal_id', 'fecha', 'producto_id', 'producto__nombre', 'produccion', 'entrada', 'baja', 'traspaso', 'salida',
+            'precio_unitario'):
+        r['producto'] = r.pop('producto__nombre')
+        registros.setdefault((r.pop('sucursal_id'), r.pop('fecha')), []).append(r)
+
+    # Los días sin movimientos en las tablas pueden estar archivados
+    archivados = movimientos_archivados({(c.sucursal_id, c.fecha) for c in cierres} - gastos.keys() - registros.keys())
+    if archivados:
+        nombres = dict(Producto.objects.values_list('id', 'nombre'))
+        for dia, movimientos in archivados.items():
+            gastos[dia] = [{'descripcion': g['descripcion'], 'monto': g['monto']} for g in movimientos['gastos']]
+            registros[dia] = [{
+                'producto_id': r['producto_id'], 'producto': nombres.get(r['producto_id']),
+                **{campo: r[campo] for campo in ('produccion', 'entrada', 'baja', 'traspaso', 'salida', 'precio_unitario')},
+            } for r in movimientos['registros']]
+
+    return [{
+        'id': c.id,
+        'sucursal_id': c.sucursal_id,
+        'sucursal': c.sucursal.nombre,
+        'fecha': c.fecha,
+        'efectivo': c.efectivo,
+        'qr': c.qr,
+        'tarjetero': c.tarjetero,
+        'total_caja': c.efectivo + c.qr + c.tarjetero,
+        'personal_turno': c.personal_turno,
+        'actualizado': c.actualizado,
+        'gastos': gastos.get((c.sucursal_id, c.fecha), []),
+        'registros': registros.get((c.sucursal_id, c.fecha), []),
+    } for c in cierres]
+
+@login_required
+def api_cierres(request):
+    """Cierres paginados por cursor (fecha, id), del más reciente al más antiguo."""
+    cierres = CajaDiaria.objects.select_related('sucursal').order_by('-fecha', '-id')
+    sucursal_id = request.GET.get('sucursal_id') or ''
+    if sucursal_id.isdigit():
+        cierres = cierres.filter(sucursal_id=sucursal_id)
+    desde = _leer_fecha(request.GET.get('desde'))
+    hasta = _leer_fecha(request.GET.get('hasta'))
+    if desde:
+        cierres = cierres.filter(fecha__gte=desde)
+    if hasta:
+        cierres = cierres.filter(fecha__lte=hasta)
+    cursor = _leer_cursor(request.GET.get('cursor'))
+    if cursor:
+        fecha, ultimo_id = cursor
+        cierres = cierres.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=ultimo_id))
+
+    limite = request.GET.get('limite') or ''
+    limite = min(int(limite), API_POR_PAGINA) if limite.isdigit() and int(limite) > 0 else API_POR_PAGINA
+    pagina = list(cierres[:limite + 1])
+    siguiente = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        siguiente = f"{pagina[-1].fecha.isoformat()}_{pagina[-1].id}"
+
+    ultima = max((c.actualizado for c in pagina), default=None)
+    return _respuesta_api(request, {
+        'resultados': _elegir_campos(request, _cierres_json(pagina)),
+        'siguiente': siguiente,
+    }, ultima)
+
+@login_required
+def api_cierre(request, caja_id):
+    cierre = get_object_or_404(CajaDiaria.objects.select_related('sucursal'), id=caja_id)
+    return _respuesta_api(request, _elegir_campos(request, _cierres_json([cierre]))[0], cierre.actualizado)